@@ -0,0 +1,381 @@
+"""
+Benchmark de los caminos críticos: carga de calendarios, parseo HTML, estadísticas,
+pronósticos y backtest.
+
+Cada escala de --scales genera, a partir de los calendario_*.csv del repositorio,
+una copia de cada liga con (escala - 1) temporadas sintéticas anteriores
+(synthetic_league: doble vuelta con goles de un Dixon-Coles ajustado a la
+temporada real) seguidas de la temporada real: la escala 1 son los archivos tal
+cual y la 1000 multiplica por mil los partidos. Por operación y escala se mide
+la mediana (y el mejor) de --repeat ejecuciones y la memoria pico de una
+ejecución aislada en un subproceso (incremento del pico de RSS, que incluye la
+memoria de polars). Las operaciones más pesadas tienen una escala máxima y no
+se miden por encima de ella.
+
+--save-baseline guarda los resultados como referencia; --compare los contrasta con
+una referencia guardada y marca como regresión toda operación cuya mediana de
+tiempo o memoria empeore más de --tolerance (saliendo con código 1). Ambas
+exigen al menos MIN_REPEAT repeticiones para que una ejecución suelta no decida.
+
+Los tiempos solo son comparables en la máquina donde se grabó la referencia: la
+referencia guarda su entorno (CPUs, arquitectura y versiones de Python, polars,
+numpy y lxml) y --compare se niega a comparar si el entorno actual es distinto
+(--ignore-environment compara igualmente, con un aviso). La referencia
+versionada (benchmarks/baseline.json) solo vale para la máquina descrita en su
+campo "environment"; en cualquier otra hay que grabar una propia con
+--save-baseline antes de comparar.
+
+    python benchmarks/hot_paths_benchmark.py --scales 1 10 100 --save-baseline benchmarks/baseline.json
+    python benchmarks/hot_paths_benchmark.py --scales 1 10 100 --compare benchmarks/baseline.json
+    python benchmarks/hot_paths_benchmark.py --scales 1000 --ops load_arrow predictor_build calculate_accuracy
+"""
+import argparse
+import gc
+import html
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import polars as pl
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import extract_calendar
+from extract_calendar import (
+    CalendarExtractor,
+    LIGAS,
+    StatisticsCalculator,
+    league_filename,
+    league_frame,
+    load_leagues,
+    read_calendar,
+    to_columnar,
+    write_calendar,
+    write_columnar,
+)
+from poisson_model import DixonColesPredictor, PoissonPredictor
+from synthetic_league import generate_seasons
+
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Llamadas sueltas a predict_match por medición
+PREDICT_MATCH_CALLS = 100
+# Por debajo de estas diferencias absolutas no se marca regresión (ruido de medición)
+NOISE_FLOOR_MS = 5.0
+NOISE_FLOOR_MB = 8.0
+# El parseo HTML (muchos objetos pequeños) y el optimizador de Dixon-Coles varían más entre ejecuciones
+NOISE_FLOORS_MS = {"parse_lxml": 50.0, "parse_html.parser": 150.0, "dixon_coles_build": 50.0}
+# Repeticiones mínimas para guardar o comparar una referencia
+MIN_REPEAT = 3
+
+
+def scaled_calendar(calendar, scale, seed=0):
+    """Calendario con (scale - 1) temporadas sintéticas anteriores y la temporada real al final"""
+    if scale <= 1:
+        return calendar
+    # Verdad de base: Dixon-Coles ajustado a la temporada real, así los equipos y los goles se le parecen
+    played = to_columnar(calendar).filter(pl.col("GA").is_not_null())
+    truth = DixonColesPredictor.fit_league(played)
+    first_year = played["Fecha"].min().year - (scale - 1)
+    history = generate_seasons(truth, scale - 1, first_year, seed)
+    return pl.concat([history, calendar])
+
+
+def render_page(calendar):
+    """Página HTML con la estructura de livefutbol (module-gameplan) para los partidos de `calendar`"""
+    parts = ['<html><body><div class="module-gameplan"><div>']
+    current_round = None
+    for row in calendar.iter_rows(named=True):
+        if row["Jornada"] != current_round:
+            current_round = row["Jornada"]
+            parts.append(f'<div class="round-head">{html.escape(current_round)}</div>')
+        score = "-:-" if row["GA"] is None else f"{row['GA']}:{row['GC']}"
+        parts.append(
+            f'<div class="match" data-datetime="{row["Fecha"]}T{row["Hora"]}:00Z">'
+            f'<div class="match-time">{row["Hora"]}</div>'
+            f'<div class="team-name-home">{html.escape(row["Local"])}</div>'
+            f'<div class="team-name-away">{html.escape(row["Visita"])}</div>'
+            f'<div class="match-result">{score}</div></div>'
+        )
+    parts.append("</div></div></body></html>")
+    return "".join(parts).encode("utf-8")
+
+
+def prepare_scale(scale, workdir, seed=0):
+    """Escribe los CSV (y sus Arrow) de todas las ligas a la escala pedida y devuelve el contexto de las operaciones"""
+    for index, nombre in enumerate(LIGAS):
+        source = os.path.join(DATA_DIR, league_filename(nombre))
+        if not os.path.exists(source):
+            continue
+        path = os.path.join(workdir, league_filename(nombre))
+        calendar = scaled_calendar(read_calendar(source), scale, seed + index)
+        write_calendar(calendar, path)
+        write_columnar(calendar, path)
+    return load_context(workdir)
+
+
+def load_context(workdir):
+    """Contexto de las operaciones: archivos de las ligas escritos en `workdir` y su frame unificado"""
+    archivos = {
+        nombre: os.path.join(workdir, league_filename(nombre))
+        for nombre in LIGAS
+        if os.path.exists(os.path.join(workdir, league_filename(nombre)))
+    }
+    return {"archivos": archivos, "frame": load_leagues(archivos)}
+
+
+def parse_page(page, backend):
+    extractor = CalendarExtractor("file://benchmark", parser=backend)
+    extractor.parse(page)
+    return extractor.data
+
+
+def predict_match_calls(predictor, fixtures):
+    return [predictor.predict_match(fixture["Local"], fixture["Visita"], fixture["Liga"]) for fixture in fixtures]
+
+
+def setup_parse(ctx):
+    return render_page(read_calendar(next(iter(ctx["archivos"].values()))))
+
+
+def setup_predict_match(ctx):
+    predictor = PoissonPredictor(ctx["frame"])
+    fixtures = ctx["frame"].select(pl.col("Liga", "Local", "Visita").cast(pl.Utf8)).tail(PREDICT_MATCH_CALLS).to_dicts()
+    return predictor, fixtures
+
+
+def setup_predict_matches(ctx):
+    return PoissonPredictor(ctx["frame"]), ctx["frame"].select("Liga", "Local", "Visita")
+
+
+# nombre -> (escala máxima o None, preparación no medida (ctx) -> argumento, operación medida (argumento))
+OPERATIONS = {
+    "load_csv": (None, lambda ctx: ctx["archivos"], lambda archivos: league_frame(
+        {nombre: to_columnar(read_calendar(archivo)) for nombre, archivo in archivos.items()}
+    )),
+    "load_arrow": (None, lambda ctx: ctx["archivos"], load_leagues),
+    "parse_lxml": (100, setup_parse, lambda page: parse_page(page, "lxml")),
+    "parse_html.parser": (10, setup_parse, lambda page: parse_page(page, "html.parser")),
+    "statistics_summary": (None, lambda ctx: ctx["frame"], lambda frame: StatisticsCalculator(frame).summary()),
+    "team_summary": (None, lambda ctx: ctx["frame"], lambda frame: StatisticsCalculator(frame).team_summary()),
+    "predictor_build": (None, lambda ctx: ctx["frame"], PoissonPredictor),
+    "predict_match": (None, setup_predict_match, lambda arg: predict_match_calls(*arg)),
+    "predict_matches": (100, setup_predict_matches, lambda arg: arg[0].predict_matches(arg[1])),
+    "calculate_accuracy": (100, lambda ctx: ctx["frame"], lambda frame: PoissonPredictor(frame).calculate_accuracy()),
+    "dixon_coles_build": (None, lambda ctx: ctx["frame"], DixonColesPredictor),
+}
+
+
+def memory_status():
+    """(RSS actual, pico de RSS) del proceso en bytes según /proc/self/status; None fuera de Linux"""
+    try:
+        with open("/proc/self/status") as f:
+            fields = dict(line.split(":", 1) for line in f if line.startswith(("VmRSS", "VmHWM")))
+        return int(fields["VmRSS"].split()[0]) * 1024, int(fields["VmHWM"].split()[0]) * 1024
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def reset_peak_rss():
+    """Reinicia el pico de RSS del proceso (Linux 4.0+); False si no se puede"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def probe_memory(name, workdir):
+    """
+    Memoria pico (bytes) de una ejecución de `name` sobre los calendarios de `workdir`.
+    Se llama en un proceso nuevo para que la memoria que el asignador retiene de
+    operaciones anteriores no oculte el crecimiento; mide el pico de RSS (incluye
+    la memoria de polars, que tracemalloc no ve) o, si no hay /proc, tracemalloc.
+    """
+    _, setup, function = OPERATIONS[name]
+    argument = setup(load_context(workdir))
+    gc.collect()
+    if memory_status() is not None and reset_peak_rss():
+        rss_before, _ = memory_status()
+        function(argument)
+        _, rss_peak = memory_status()
+        return max(rss_peak - rss_before, 0)
+    tracemalloc.start()
+    try:
+        function(argument)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def peak_memory(name, workdir):
+    """Ejecuta probe_memory en un subproceso y devuelve su resultado en bytes"""
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--memory-probe", name, workdir],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return int(output.split()[-1])
+
+
+def measure(name, argument, workdir, repeat):
+    """Mediana y mejor tiempo (s) de `repeat` ejecuciones y memoria pico (bytes) de una ejecución aislada"""
+    function = OPERATIONS[name][2]
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(argument)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)), min(times), peak_memory(name, workdir)
+
+
+def run(scales, names, repeat, seed=0):
+    results = []
+    for scale in scales:
+        with tempfile.TemporaryDirectory(prefix="benchmark_") as workdir:
+            ctx = prepare_scale(scale, workdir, seed)
+            print(f"Escala {scale}x: {len(ctx['frame'])} partidos", file=sys.stderr)
+            for name in names:
+                max_scale, setup, _ = OPERATIONS[name]
+                if max_scale is not None and scale > max_scale:
+                    continue
+                seconds, best, peak = measure(name, setup(ctx), workdir, repeat)
+                results.append({
+                    "op": name,
+                    "scale": scale,
+                    "matches": len(ctx["frame"]),
+                    "ms": round(seconds * 1000, 3),
+                    "best_ms": round(best * 1000, 3),
+                    "peak_mb": round(peak / 2 ** 20, 2),
+                })
+                print(f"  {name:<20} {seconds * 1000:>12.2f} ms {peak / 2 ** 20:>10.1f} MB", file=sys.stderr)
+            del ctx
+    return results
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "polars": pl.__version__,
+        "numpy": np.__version__,
+        "lxml": extract_calendar.lxml is not None,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def environment_mismatches(baseline, current):
+    """Claves del entorno en las que la referencia y la ejecución actual difieren: {clave: (referencia, actual)}"""
+    recorded = baseline.get("environment", {})
+    return {
+        key: (recorded.get(key), value)
+        for key, value in current.items()
+        if recorded.get(key) != value
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Filas de comparación con la referencia; `regression` indica si el tiempo o la memoria empeoraron más de `tolerance`"""
+    reference = {(row["op"], row["scale"]): row for row in baseline["results"]}
+    rows = []
+    for row in results:
+        base = reference.get((row["op"], row["scale"]))
+        if base is None:
+            rows.append({**row, "base_ms": None, "base_peak_mb": None, "regression": []})
+            continue
+        regression = []
+        noise_floor_ms = NOISE_FLOORS_MS.get(row["op"], NOISE_FLOOR_MS)
+        if row["ms"] > base["ms"] * (1 + tolerance) and row["ms"] - base["ms"] > noise_floor_ms:
+            regression.append("tiempo")
+        if row["peak_mb"] > base["peak_mb"] * (1 + tolerance) and row["peak_mb"] - base["peak_mb"] > NOISE_FLOOR_MB:
+            regression.append("memoria")
+        rows.append({**row, "base_ms": base["ms"], "base_peak_mb": base["peak_mb"], "regression": regression})
+    return rows
+
+
+def print_comparison(rows):
+    print(f"{'Operación':<20} {'Escala':>7} {'ms':>12} {'ref. ms':>12} {'x':>6} {'MB':>9} {'ref. MB':>9}  Regresión")
+    for row in rows:
+        if row["base_ms"] is None:
+            print(f"{row['op']:<20} {row['scale']:>7} {row['ms']:>12.2f} {'-':>12} {'-':>6} {row['peak_mb']:>9.1f} {'-':>9}  (sin referencia)")
+            continue
+        ratio = row["ms"] / row["base_ms"] if row["base_ms"] else float("inf")
+        flag = ", ".join(row["regression"]) or "-"
+        print(f"{row['op']:<20} {row['scale']:>7} {row['ms']:>12.2f} {row['base_ms']:>12.2f} {ratio:>6.2f} "
+              f"{row['peak_mb']:>9.1f} {row['base_peak_mb']:>9.1f}  {flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100], help="Multiplicadores del tamaño de los calendarios")
+    parser.add_argument("--ops", nargs="+", choices=list(OPERATIONS), default=list(OPERATIONS), help="Operaciones a medir")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por operación (se compara la mediana)")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla de las temporadas sintéticas")
+    parser.add_argument("--save-baseline", help="Guarda los resultados como referencia en este archivo JSON")
+    parser.add_argument("--compare", help="Referencia JSON con la que comparar")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Empeoramiento relativo a partir del cual hay regresión")
+    parser.add_argument("--ignore-environment", action="store_true",
+                        help="Compara aunque la referencia se grabara en otro entorno (solo avisa)")
+    parser.add_argument("--history", help="Archivo JSON Lines al que añadir los resultados")
+    parser.add_argument("--memory-probe", nargs=2, metavar=("OP", "DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.memory_probe:
+        print(probe_memory(*args.memory_probe))
+        return 0
+    if (args.compare or args.save_baseline) and args.repeat < MIN_REPEAT:
+        parser.error(f"--compare y --save-baseline necesitan --repeat {MIN_REPEAT} o más")
+
+    # El entorno se comprueba antes de medir: una referencia de otra máquina no dice nada de esta
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        mismatches = environment_mismatches(baseline, environment())
+        if mismatches:
+            details = ", ".join(f"{key}: {recorded} -> {current}" for key, (recorded, current) in mismatches.items())
+            if not args.ignore_environment:
+                parser.error(f"{args.compare} se grabó en otro entorno ({details}); "
+                             "graba una referencia local con --save-baseline o usa --ignore-environment")
+            print(f"Aviso: {args.compare} se grabó en otro entorno ({details}); los tiempos pueden no ser comparables")
+
+    results = run(args.scales, args.ops, args.repeat, args.seed)
+    timestamp = datetime.now().isoformat(timespec="seconds")
+
+    status = 0
+    if baseline is not None:
+        rows = compare(results, baseline, args.tolerance)
+        print_comparison(rows)
+        regressions = [row for row in rows if row["regression"]]
+        if regressions:
+            print(f"{len(regressions)} regresiones (tolerancia {args.tolerance:.0%}) respecto a {args.compare} ({baseline['timestamp']})")
+            status = 1
+        else:
+            print(f"Sin regresiones respecto a {args.compare} ({baseline['timestamp']})")
+    else:
+        print(f"{'Operación':<20} {'Escala':>7} {'Partidos':>10} {'ms':>12} {'MB':>9}")
+        for row in results:
+            print(f"{row['op']:<20} {row['scale']:>7} {row['matches']:>10} {row['ms']:>12.2f} {row['peak_mb']:>9.1f}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"timestamp": timestamp, "environment": environment(), "repeat": args.repeat,
+                       "seed": args.seed, "results": results}, f, indent=2)
+            f.write("\n")
+        print(f"Referencia guardada en {args.save_baseline}")
+
+    if args.history:
+        with open(args.history, "a", encoding="utf-8") as f:
+            for row in results:
+                f.write(json.dumps({"timestamp": timestamp, **row}) + "\n")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
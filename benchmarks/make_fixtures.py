@@ -0,0 +1,113 @@
+"""
+Genera las páginas HTML de prueba (benchmarks/fixtures/*.html) a partir de los calendarios del repositorio.
+
+Cada página reproduce el marcado de livefutbol que lee CalendarExtractor
+(module-gameplan, round-head, match con data-datetime, escudos, enlaces y
+elementos de navegación alrededor) recortado a FIXTURE_ROUNDS jornadas en torno
+a la última jugada (con resultados y partidos por jugar), para que el benchmark
+de parseo y las pruebas del extractor usen siempre la misma entrada sin
+depender de la red.
+
+    python benchmarks/make_fixtures.py
+"""
+import argparse
+import html
+import os
+import sys
+
+import polars as pl
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extract_calendar import LIGAS, league_filename, read_calendar
+
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+# Jornadas por página y cuántas de ellas son posteriores a la última jugada
+FIXTURE_ROUNDS = 10
+UPCOMING_ROUNDS = 3
+
+
+def fixture_filename(nombre_liga):
+    return f"{os.path.splitext(league_filename(nombre_liga))[0]}.html"
+
+
+def trim_calendar(calendar, rounds=FIXTURE_ROUNDS, upcoming=UPCOMING_ROUNDS):
+    """Partidos de `rounds` jornadas consecutivas que terminan `upcoming` jornadas después de la última jugada"""
+    order = calendar["Jornada"].unique(maintain_order=True).to_list()
+    played = set(calendar.filter(pl.col("GA").is_not_null())["Jornada"].to_list())
+    last_played = max((i for i, jornada in enumerate(order) if jornada in played), default=0)
+    end = min(len(order), last_played + 1 + upcoming)
+    selected = order[max(0, end - rounds):end]
+    return calendar.filter(pl.col("Jornada").is_in(selected))
+
+
+def slug(text):
+    return "-".join(text.lower().replace(".", "").split())
+
+
+def render_match(row):
+    score = "-:-" if row["GA"] is None else f"{row['GA']}:{row['GC']}"
+    teams = []
+    for side, team in (("home", row["Local"]), ("away", row["Visita"])):
+        teams.append(
+            f'      <div class="team team-{side}">\n'
+            f'        <img class="team-logo" src="/images/teams/{slug(team)}.png" alt="" width="20" height="20">\n'
+            f'        <div class="team-name team-name-{side}"><a href="/teams/{slug(team)}/">{html.escape(team)}</a></div>\n'
+            f'      </div>\n'
+        )
+    return (
+        f'    <div class="match" data-datetime="{row["Fecha"]}T{row["Hora"]}:00Z">\n'
+        f'      <div class="match-time">{row["Hora"]}</div>\n'
+        f'{teams[0]}'
+        f'      <div class="match-result"><a href="/match-report/{slug(row["Local"])}-{slug(row["Visita"])}/">{score}</a></div>\n'
+        f'{teams[1]}'
+        f'    </div>\n'
+    )
+
+
+def render_page(nombre_liga, calendar):
+    """Página de todos los partidos de una liga con el marcado de livefutbol"""
+    title = html.escape(nombre_liga)
+    parts = [
+        '<!DOCTYPE html>\n<html lang="es">\n<head>\n<meta charset="utf-8">\n'
+        f'<title>{title} - Todos los partidos</title>\n'
+        '<link rel="stylesheet" href="/css/main.css">\n</head>\n<body>\n'
+        '<header class="page-header"><nav class="main-nav"><ul>'
+        '<li><a href="/">Inicio</a></li><li><a href="/live/">En directo</a></li>'
+        '<li><a href="/competitions/">Competiciones</a></li></ul></nav></header>\n'
+        f'<main>\n<h1 class="module-title">{title} &raquo; Todos los partidos</h1>\n'
+        '<div class="module-gameplan">\n  <div>\n'
+    ]
+    current_round = None
+    for row in calendar.iter_rows(named=True):
+        if row["Jornada"] != current_round:
+            current_round = row["Jornada"]
+            parts.append(f'    <div class="round-head">{html.escape(current_round)}</div>\n')
+        parts.append(render_match(row))
+    parts.append(
+        '  </div>\n</div>\n</main>\n'
+        '<footer class="page-footer"><p>&copy; livefutbol</p></footer>\n</body>\n</html>\n'
+    )
+    return "".join(parts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=FIXTURES_DIR, help="Carpeta donde escribir las páginas")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output, exist_ok=True)
+    for nombre in LIGAS:
+        source = os.path.join(DATA_DIR, league_filename(nombre))
+        if not os.path.exists(source):
+            continue
+        path = os.path.join(args.output, fixture_filename(nombre))
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(render_page(nombre, trim_calendar(read_calendar(source))))
+        print(f"Escrita {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Benchmark de parseo de páginas de calendario por backend (lxml vs html.parser).
+
+Por defecto usa las páginas de prueba versionadas en benchmarks/fixtures
+(generadas con make_fixtures.py), de modo que cada ejecución y cada entrada de
+--history miden la misma entrada. También acepta rutas a archivos o carpetas
+con HTML, por ejemplo la caché HTTP de extract_calendar (.cache/http).
+Con --history los resultados se añaden a un archivo JSON Lines para seguir
+la evolución del tiempo de parseo por página.
+
+    python benchmarks/parser_benchmark.py --repeat 5 --history benchmarks/parser_history.jsonl
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import extract_calendar
+from extract_calendar import CalendarExtractor, PARSER_BACKENDS
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def collect_pages(paths):
+    pages = []
+    for path in paths:
+        if os.path.isdir(path):
+            pages.extend(sorted(glob.glob(os.path.join(path, "*.html"))))
+        else:
+            pages.append(path)
+    return pages
+
+
+def available_backends():
+    if extract_calendar.lxml is None:
+        return [backend for backend in PARSER_BACKENDS if backend != "lxml"]
+    return list(PARSER_BACKENDS)
+
+
+def time_parse(content, backend, repeat):
+    """Mejor tiempo (s) de `repeat` parseos y los registros extraídos"""
+    best = float("inf")
+    data = None
+    for _ in range(repeat):
+        extractor = CalendarExtractor("file://benchmark", parser=backend)
+        start = time.perf_counter()
+        extractor.parse(content)
+        best = min(best, time.perf_counter() - start)
+        data = extractor.data
+    return best, data
+
+
+def run(pages, repeat):
+    backends = available_backends()
+    results = []
+    for page in pages:
+        with open(page, "rb") as f:
+            content = f.read()
+        
+        reference = None
+        for backend in backends:
+            seconds, data = time_parse(content, backend, repeat)
+            if reference is None:
+                reference = data
+            elif data != reference:
+                raise AssertionError(f"{backend} extrae datos distintos en {page}")
+            results.append({
+                "page": os.path.basename(page),
+                "backend": backend,
+                "matches": len(data),
+                "bytes": len(content),
+                "ms": round(seconds * 1000, 3),
+            })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", default=[FIXTURES_DIR], help="Archivos HTML o carpetas que los contienen")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por página (se toma el mejor tiempo)")
+    parser.add_argument("--history", help="Archivo JSON Lines al que añadir los resultados")
+    args = parser.parse_args(argv)
+
+    pages = collect_pages(args.paths)
+    if not pages:
+        print("No se encontraron páginas HTML. Ejecuta benchmarks/make_fixtures.py para generar las de prueba.")
+        return 1
+
+    results = run(pages, args.repeat)
+
+    print(f"{'Página':<50} {'Backend':<12} {'Partidos':>8} {'ms':>10}")
+    for row in results:
+        print(f"{row['page']:<50} {row['backend']:<12} {row['matches']:>8} {row['ms']:>10.2f}")
+    
+    for backend in {row["backend"] for row in results}:
+        times = [row["ms"] for row in results if row["backend"] == backend]
+        print(f"Media {backend}: {sum(times) / len(times):.2f} ms/página")
+
+    if args.history:
+        timestamp = datetime.now().isoformat(timespec="seconds")
+        with open(args.history, "a", encoding="utf-8") as f:
+            for row in results:
+                f.write(json.dumps({"timestamp": timestamp, **row}) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+Prueba de carga del servicio HTTP de pronósticos (prediction_service.py).
+
+Lanza --clients clientes concurrentes con conexiones keep-alive que envían
+--requests peticiones POST /predict de --batch-size partidos (tomados de los
+partidos pendientes de los calendarios) e informa de la latencia p50/p90/p99,
+el rendimiento y el tamaño medio de los lotes que agrupó el servicio.
+Sin --url el servicio se arranca dentro del proceso en un puerto libre.
+
+    python benchmarks/service_load_test.py --clients 16 --requests 4000
+    python benchmarks/service_load_test.py --url http://127.0.0.1:8765 --batch-size 20
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+
+import numpy as np
+import polars as pl
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calendar_store import LIGAS, league_filename, load_leagues
+from prediction_service import BATCH_WINDOW, PredictionService, make_server
+
+
+def sample_fixtures(data_dir):
+    """Partidos pendientes de todas las ligas como dicts {"liga", "local", "visita"}"""
+    archivos = {
+        nombre: os.path.join(data_dir, league_filename(nombre))
+        for nombre in LIGAS
+        if os.path.exists(os.path.join(data_dir, league_filename(nombre)))
+    }
+    upcoming = load_leagues(archivos).filter(pl.col("GA").is_null())
+    return upcoming.select(
+        pl.col("Liga").cast(pl.Utf8).alias("liga"),
+        pl.col("Local").cast(pl.Utf8).alias("local"),
+        pl.col("Visita").cast(pl.Utf8).alias("visita"),
+    ).to_dicts()
+
+
+def request_json(connection, method, path, payload=None):
+    body = json.dumps(payload).encode("utf-8") if payload is not None else None
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    connection.request(method, path, body=body, headers=headers)
+    response = connection.getresponse()
+    data = response.read()
+    if response.status != 200:
+        raise RuntimeError(f"HTTP {response.status}: {data[:200]!r}")
+    return json.loads(data)
+
+
+def run_client(host, port, fixtures, n_requests, batch_size, seed, latencies, errors):
+    """Un cliente: `n_requests` peticiones secuenciales sobre una conexión keep-alive"""
+    rng = random.Random(seed)
+    connection = http.client.HTTPConnection(host, port, timeout=60)
+    try:
+        for _ in range(n_requests):
+            payload = {"fixtures": rng.sample(fixtures, min(batch_size, len(fixtures)))}
+            start = time.perf_counter()
+            try:
+                request_json(connection, "POST", "/predict", payload)
+            except (OSError, RuntimeError, http.client.HTTPException) as e:
+                errors.append(str(e))
+                connection.close()
+                connection = http.client.HTTPConnection(host, port, timeout=60)
+                continue
+            latencies.append(time.perf_counter() - start)
+    finally:
+        connection.close()
+
+
+def run(host, port, fixtures, clients, n_requests, batch_size):
+    latencies = []
+    errors = []
+    per_client = [n_requests // clients + (1 if index < n_requests % clients else 0) for index in range(clients)]
+    threads = [
+        threading.Thread(target=run_client, args=(host, port, fixtures, count, batch_size, index, latencies, errors))
+        for index, count in enumerate(per_client)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    completed = len(latencies)
+    return {
+        "clients": clients,
+        "batch_size": batch_size,
+        "requests": completed,
+        "errors": len(errors),
+        "seconds": round(elapsed, 3),
+        "requests_per_s": round(completed / elapsed, 1),
+        "fixtures_per_s": round(completed * batch_size / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 3) if completed else None,
+        "p90_ms": round(float(np.percentile(latencies_ms, 90)), 3) if completed else None,
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 3) if completed else None,
+        "max_ms": round(float(latencies_ms.max()), 3) if completed else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Servicio ya en marcha (por defecto se arranca uno dentro del proceso)")
+    parser.add_argument("--clients", type=int, default=8, help="Clientes concurrentes")
+    parser.add_argument("--requests", type=int, default=2000, help="Peticiones en total")
+    parser.add_argument("--batch-size", type=int, default=1, help="Partidos por petición")
+    parser.add_argument("--batch-window", type=float, default=BATCH_WINDOW, help="Espera de agrupación del servicio local (s)")
+    parser.add_argument("--data-dir", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser.add_argument("--history", help="Archivo JSON Lines al que añadir los resultados")
+    args = parser.parse_args(argv)
+
+    fixtures = sample_fixtures(args.data_dir)
+    if not fixtures:
+        print("No hay partidos pendientes en los calendarios.")
+        return 1
+
+    server = service = None
+    if args.url:
+        url = urlparse(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        service = PredictionService(args.data_dir, batch_window=args.batch_window)
+        server = make_server(service, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = "127.0.0.1", server.server_port
+
+    # Calentamiento (conexión y primer lote) fuera de la medición
+    connection = http.client.HTTPConnection(host, port, timeout=60)
+    request_json(connection, "POST", "/predict", {"fixtures": fixtures[:1]})
+    before = request_json(connection, "GET", "/health")
+
+    result = run(host, port, fixtures, args.clients, args.requests, args.batch_size)
+
+    after = request_json(connection, "GET", "/health")
+    connection.close()
+    batches = after["batches"] - before["batches"]
+    result["server_batches"] = batches
+    result["avg_coalesced_fixtures"] = round((after["batched_fixtures"] - before["batched_fixtures"]) / batches, 1) if batches else None
+
+    print(f"Clientes: {result['clients']}  Partidos/petición: {result['batch_size']}  "
+          f"Peticiones: {result['requests']} ({result['errors']} errores) en {result['seconds']:.2f} s")
+    print(f"Rendimiento: {result['requests_per_s']:.1f} peticiones/s, {result['fixtures_per_s']:.1f} partidos/s")
+    print(f"Latencia: p50 {result['p50_ms']:.2f} ms  p90 {result['p90_ms']:.2f} ms  "
+          f"p99 {result['p99_ms']:.2f} ms  máx {result['max_ms']:.2f} ms")
+    print(f"Lotes del servicio: {batches} (media {result['avg_coalesced_fixtures']} partidos por lote)")
+
+    if args.history:
+        with open(args.history, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"timestamp": datetime.now().isoformat(timespec="seconds"), **result}) + "\n")
+
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
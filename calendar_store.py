@@ -0,0 +1,149 @@
+import os
+
+import polars as pl
+
+# Esquemas, ligas y E/S de calendarios: solo depende de polars, para que los modelos, la CLI y el
+# servicio de pronósticos no carguen la pila de descarga (requests, BeautifulSoup, lxml) de extract_calendar
+
+# Fecha y Hora de los calendarios están en UTC: el extractor normaliza a UTC el data-datetime de cada partido
+CALENDAR_SCHEMA = {
+    "Jornada": pl.Utf8,
+    "Fecha": pl.Utf8,
+    "Hora": pl.Utf8,
+    "Local": pl.Utf8,
+    "Visita": pl.Utf8,
+    "GA": pl.Int64,
+    "GC": pl.Int64,
+}
+# Tipos compactos del archivo columnar (Arrow IPC) que acompaña a cada CSV
+COLUMNAR_SCHEMA = {
+    "Jornada": pl.Utf8,
+    "Fecha": pl.Date,
+    "Hora": pl.Time,
+    "Local": pl.Categorical,
+    "Visita": pl.Categorical,
+    "GA": pl.Int8,
+    "GC": pl.Int8,
+}
+# Un partido se identifica por jornada y equipos; el resto de campos puede cambiar
+MATCH_KEY = ["Jornada", "Local", "Visita"]
+MATCH_FIELDS = ["Fecha", "Hora", "GA", "GC"]
+
+LIGAS = {
+    "Premier League": "https://www.livefutbol.com/competition/co91/inglaterra-premier-league/all-matches/",
+    "La Liga": "https://www.livefutbol.com/competition/co97/espana-primera-division/all-matches/",
+    "La Liga 2": "https://www.livefutbol.com/competition/co110/espana-segunda-division/all-matches/",
+    "Serie A": "https://www.livefutbol.com/competition/co111/italia-serie-a/all-matches/",
+    "Bundesliga": "https://www.livefutbol.com/competition/co12/alemania-bundesliga/all-matches/",
+    "Ligue 1": "https://www.livefutbol.com/competition/co71/francia-ligue-1/all-matches/"
+}
+
+# Tipo de la columna Liga de los frames multi-liga (orden de LIGAS)
+LIGA_DTYPE = pl.Enum(list(LIGAS))
+
+def league_filename(nombre_liga):
+    return f"calendario_{nombre_liga.lower().replace(' ', '_')}.csv"
+
+def read_calendar(path):
+    """Lee un calendario CSV con los tipos de CALENDAR_SCHEMA"""
+    return pl.read_csv(path, schema_overrides=CALENDAR_SCHEMA)
+
+def write_calendar(df, path):
+    """Escribe el CSV de forma atómica (archivo temporal + rename) para que un lector concurrente nunca lo vea a medias"""
+    tmp_path = f"{path}.tmp"
+    df.write_csv(tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+def columnar_path(csv_path):
+    return f"{os.path.splitext(csv_path)[0]}.arrow"
+
+def to_columnar(df):
+    """Convierte un calendario a COLUMNAR_SCHEMA (equipos categóricos, goles Int8, Fecha/Hora tipadas)"""
+    df = _as_calendar(df)
+    return df.with_columns(
+        pl.col("Fecha").str.to_date("%Y-%m-%d", strict=False),
+        pl.col("Hora").str.to_time("%H:%M", strict=False),
+        pl.col("Local").cast(pl.Categorical),
+        pl.col("Visita").cast(pl.Categorical),
+        pl.col("GA").cast(pl.Int8),
+        pl.col("GC").cast(pl.Int8),
+    )
+
+def write_columnar(df, csv_path):
+    """Escribe la copia Arrow IPC tipada de un calendario junto a su CSV"""
+    path = columnar_path(csv_path)
+    tmp_path = f"{path}.tmp"
+    to_columnar(df).write_ipc(tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+def columnar_is_current(csv_path):
+    path = columnar_path(csv_path)
+    return os.path.exists(path) and os.stat(path).st_mtime_ns >= os.stat(csv_path).st_mtime_ns
+
+def load_calendar(csv_path):
+    """
+    Carga un calendario tipado (COLUMNAR_SCHEMA). Usa el archivo Arrow IPC si está
+    al día con el CSV (polars lo lee memory-mapped); si no, lee el CSV, que sigue
+    siendo la exportación legible.
+    """
+    if columnar_is_current(csv_path):
+        return pl.read_ipc(columnar_path(csv_path))
+    return to_columnar(read_calendar(csv_path))
+
+def league_frame(calendars):
+    """Calendarios de varias ligas ({nombre: frame}) en un único frame con columna Liga"""
+    frames = [df.with_columns(pl.lit(nombre, dtype=LIGA_DTYPE).alias("Liga")) for nombre, df in calendars.items()]
+    if not frames:
+        return pl.DataFrame(schema={"Liga": LIGA_DTYPE})
+    return pl.concat(frames, how="vertical_relaxed")
+
+def load_leagues(archivos):
+    """Carga los calendarios de varias ligas ({nombre: archivo}) en un único frame con columna Liga"""
+    return league_frame({nombre: load_calendar(archivo) for nombre, archivo in archivos.items()})
+
+def _as_calendar(df):
+    if df.is_empty() and not df.columns:
+        return pl.DataFrame(schema=CALENDAR_SCHEMA)
+    return df.select(list(CALENDAR_SCHEMA)).cast(CALENDAR_SCHEMA)
+
+def diff_matches(existing, fresh):
+    """
+    Compara un calendario recién extraído con el existente por (Jornada, Local, Visita).
+    Devuelve los partidos nuevos o modificados con una columna `change`:
+    'insert' (partido nuevo), 'result' (ganó resultado) o 'update' (cambió fecha/hora/marcador).
+    """
+    existing = _as_calendar(existing).with_columns(pl.lit(True).alias("_exists"))
+    fresh = _as_calendar(fresh)
+    
+    joined = fresh.join(existing, on=MATCH_KEY, how="left", suffix="_old")
+    field_changed = pl.any_horizontal([pl.col(field).ne_missing(pl.col(f"{field}_old")) for field in MATCH_FIELDS])
+    change = (
+        pl.when(pl.col("_exists").is_null()).then(pl.lit("insert"))
+        .when(pl.col("GA_old").is_null() & pl.col("GA").is_not_null()).then(pl.lit("result"))
+        .when(field_changed).then(pl.lit("update"))
+    )
+    return (
+        joined.with_columns(change.alias("change"))
+        .filter(pl.col("change").is_not_null())
+        .select([*CALENDAR_SCHEMA, "change"])
+    )
+
+def apply_changes(existing, changes):
+    """Aplica inserciones y actualizaciones al calendario existente conservando su orden"""
+    existing = _as_calendar(existing)
+    updates = changes.filter(pl.col("change") != "insert").select(list(CALENDAR_SCHEMA))
+    inserts = changes.filter(pl.col("change") == "insert").select(list(CALENDAR_SCHEMA))
+    
+    merged = (
+        existing.with_row_index("_row")
+        .join(updates.with_columns(pl.lit(True).alias("_updated")), on=MATCH_KEY, how="left", suffix="_new")
+        .sort("_row")
+        .select([
+            pl.when(pl.col("_updated")).then(pl.col(f"{column}_new")).otherwise(pl.col(column)).alias(column)
+            if column in MATCH_FIELDS else pl.col(column)
+            for column in CALENDAR_SCHEMA
+        ])
+    )
+    return pl.concat([merged, inserts])
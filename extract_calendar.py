@@ -1,21 +1,230 @@
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
+from bs4.dammit import UnicodeDammit
 import polars as pl
-from datetime import datetime
+import numpy as np
+from datetime import datetime, timezone
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+from calendar_store import (
+    CALENDAR_SCHEMA,
+    COLUMNAR_SCHEMA,
+    LIGA_DTYPE,
+    LIGAS,
+    MATCH_FIELDS,
+    MATCH_KEY,
+    apply_changes,
+    columnar_is_current,
+    columnar_path,
+    diff_matches,
+    league_filename,
+    league_frame,
+    load_calendar,
+    load_leagues,
+    read_calendar,
+    to_columnar,
+    write_calendar,
+    write_columnar,
+)
+
+REQUEST_TIMEOUT = 30
+MAX_CONCURRENT_REQUESTS = 4
+CACHE_DIR = os.path.join(".cache", "http")
+
+# Backends de parseo disponibles; lxml es el camino rápido y BeautifulSoup el respaldo
+PARSER_BACKENDS = ("lxml", "html.parser")
+DEFAULT_PARSER = "lxml" if lxml is not None else "html.parser"
+MATCH_FIELD_CLASSES = ("match-time", "team-name-home", "team-name-away", "match-result")
+
+def create_session(max_connections=MAX_CONCURRENT_REQUESTS):
+    """Sesión HTTP con pool de conexiones reutilizable entre ligas"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+class ResponseCache:
+    """Caché en disco de respuestas HTTP (cuerpo + ETag/Last-Modified) por URL"""
+
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.json", f"{base}.html"
+
+    def load(self, url):
+        """Devuelve los metadatos guardados de la URL, o None si no hay entrada válida"""
+        meta_path, body_path = self._paths(url)
+        if not (os.path.exists(meta_path) and os.path.exists(body_path)):
+            return None
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load_body(self, url):
+        _, body_path = self._paths(url)
+        with open(body_path, "rb") as f:
+            return f.read()
+
+    def conditional_headers(self, url):
+        meta = self.load(url)
+        headers = {}
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def store(self, url, response_headers, body):
+        meta_path, body_path = self._paths(url)
+        meta = {
+            "url": url,
+            "etag": response_headers.get("ETag"),
+            "last_modified": response_headers.get("Last-Modified"),
+            "sha256": hashlib.sha256(body).hexdigest(),
+        }
+        # Escritura atómica: nunca dejar un cuerpo a medias emparejado con metadatos nuevos
+        for path, payload, mode in ((body_path, body, "wb"), (meta_path, json.dumps(meta), "w")):
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, mode) as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+
+def _element_text(element):
+    """Equivalente lxml de BeautifulSoup get_text(strip=True)"""
+    return "".join(text.strip() for text in element.itertext())
 
 class CalendarExtractor:
-    def __init__(self, url):
+    def __init__(self, url, session=None, cache=None, parser=None):
         self.url = url
+        self.session = session or requests
+        self.cache = cache
+        self.parser = parser or DEFAULT_PARSER
+        if self.parser not in PARSER_BACKENDS:
+            raise ValueError(f"Parser desconocido: {self.parser}")
+        if self.parser == "lxml" and lxml is None:
+            raise ImportError("El parser 'lxml' requiere el paquete lxml")
         self.data = []
-
-    def fetch_and_parse(self):
+        # False cuando el servidor responde 304 o el cuerpo es idéntico al cacheado
+        self.changed = True
+        # Mensaje de error de la descarga (estado HTTP distinto de 200), None si fue bien
+        self.error = None
+        # Respuesta pendiente de guardar en la caché: solo se guarda tras procesarla con éxito (commit_cache)
+        self._pending_cache = None
+
+    def fetch(self):
         print(f"Fetching {self.url}...")
-        response = requests.get(self.url)
+        headers = self.cache.conditional_headers(self.url) if self.cache else {}
+        response = self.session.get(self.url, headers=headers, timeout=REQUEST_TIMEOUT)
+        
+        if response.status_code == 304 and self.cache:
+            print("Not modified (304), using cached page")
+            self.changed = False
+            return self.cache.load_body(self.url)
+        
         if response.status_code != 200:
             print(f"Failed to fetch URL: {response.status_code}")
+            self.error = f"HTTP {response.status_code}"
+            return None
+        
+        content = response.content
+        if self.cache:
+            cached = self.cache.load(self.url)
+            self.changed = not cached or cached.get("sha256") != hashlib.sha256(content).hexdigest()
+            if not self.changed:
+                print("Page unchanged since last fetch")
+            self._pending_cache = (dict(response.headers), content)
+        return content
+
+    def commit_cache(self):
+        """
+        Guarda en la caché la última respuesta descargada. Se llama después de parsear y
+        fusionar con éxito: si algo falla antes, la siguiente ejecución no recibe un 304
+        (ni un hash igual) y vuelve a procesar la página.
+        """
+        if self.cache and self._pending_cache is not None:
+            self.cache.store(self.url, *self._pending_cache)
+            self._pending_cache = None
+
+    def fetch_and_parse(self, force=False):
+        content = self.fetch()
+        if content is None:
+            return
+        # Sin cambios en la página no hace falta volver a parsear
+        if self.changed or force:
+            self.parse(content)
+
+    def parse(self, content):
+        if self.parser == "lxml":
+            self._parse_lxml(content)
+        else:
+            self._parse_soup(content)
+
+    def _parse_lxml(self, content):
+        """Camino rápido: un único recorrido del árbol lxml por partido"""
+        if isinstance(content, bytes):
+            # Misma detección de codificación que BeautifulSoup
+            content = UnicodeDammit(content, is_html=True).unicode_markup
+        root = lxml.html.fromstring(content)
+        
+        containers = root.xpath(
+            "//div[contains(concat(' ', normalize-space(@class), ' '), ' module-gameplan ')]"
+        )
+        if not containers:
+            print("Could not find module-gameplan container")
+            return
+
+        wrapper = next((el for el in containers[0] if el.tag == 'div'), None)
+        if wrapper is None:
+            print("Could not find wrapper div")
             return
 
-        soup = BeautifulSoup(response.content, 'html.parser')
+        current_round = None
+        
+        for child in wrapper:
+            if not isinstance(child.tag, str):
+                continue
+            classes = child.get('class', '').split()
+            
+            if 'round-head' in classes:
+                current_round = _element_text(child)
+                
+            elif 'match' in classes:
+                # Primer div de cada clase buscada, en orden de documento
+                fields = {}
+                for div in child.iterdescendants('div'):
+                    for cls in div.get('class', '').split():
+                        if cls in MATCH_FIELD_CLASSES and cls not in fields:
+                            fields[cls] = div
+                
+                texts = {cls: _element_text(div) for cls, div in fields.items()}
+                self._append_match(
+                    current_round,
+                    child.get('data-datetime'),
+                    texts.get('match-time'),
+                    texts.get('team-name-home'),
+                    texts.get('team-name-away'),
+                    texts.get('match-result'),
+                )
+
+    def _parse_soup(self, content):
+        soup = BeautifulSoup(content, 'html.parser')
         
         container = soup.find('div', class_='module-gameplan')
         if not container:
@@ -39,31 +248,39 @@ class CalendarExtractor:
                 self._process_match(child, current_round)
 
     def _process_match(self, child, current_round):
-        datetime_str = child.get('data-datetime')
+        time_div = child.find('div', class_='match-time')
+        home_div = child.find('div', class_='team-name-home')
+        away_div = child.find('div', class_='team-name-away')
+        result_div = child.find('div', class_='match-result')
+        
+        self._append_match(
+            current_round,
+            child.get('data-datetime'),
+            time_div.get_text(strip=True) if time_div else None,
+            home_div.get_text(strip=True) if home_div else None,
+            away_div.get_text(strip=True) if away_div else None,
+            result_div.get_text(strip=True) if result_div else None,
+        )
+
+    def _append_match(self, current_round, datetime_str, time_text, home_text, away_text, score_text):
         date_val = None
         time_val = None
         
         if datetime_str:
             try:
                 dt = datetime.fromisoformat(datetime_str.replace('Z', '+00:00'))
+                if dt.tzinfo is not None:
+                    dt = dt.astimezone(timezone.utc)
                 date_val = dt.strftime('%Y-%m-%d')
                 time_val = dt.strftime('%H:%M')
             except ValueError:
                 pass
         
         if not time_val:
-            time_div = child.find('div', class_='match-time')
-            if time_div:
-                time_val = time_div.get_text(strip=True)
+            time_val = time_text
 
-        home_div = child.find('div', class_='team-name-home')
-        away_div = child.find('div', class_='team-name-away')
-        
-        home_team = home_div.get_text(strip=True) if home_div else "Unknown"
-        away_team = away_div.get_text(strip=True) if away_div else "Unknown"
-        
-        result_div = child.find('div', class_='match-result')
-        score_text = result_div.get_text(strip=True) if result_div else None
+        home_team = home_text if home_text is not None else "Unknown"
+        away_team = away_text if away_text is not None else "Unknown"
         
         home_goals = None
         away_goals = None
@@ -101,24 +318,103 @@ class CalendarExtractor:
         print(f"Extracted {len(df)} matches.")
         print(df.head())
         
-        df.write_csv(output_file)
+        write_calendar(df, output_file)
+        write_columnar(df, output_file)
         print(f"Saved to {output_file}")
 
+    def merge_to_csv(self, output_file="calendario_liga.csv", changes_file=None):
+        """
+        Actualiza el CSV existente aplicando solo los partidos nuevos o modificados.
+        Los cambios se añaden a `changes_file` (por defecto <output_file>.changes.jsonl)
+        y se devuelven como DataFrame; si no hay cambios el CSV no se reescribe.
+        """
+        fresh = self.get_dataframe()
+        if fresh.is_empty():
+            print("No match data found.")
+            return None
+
+        print(f"Extracted {len(fresh)} matches.")
+        existing = read_calendar(output_file) if os.path.exists(output_file) else pl.DataFrame(schema=CALENDAR_SCHEMA)
+        changes = diff_matches(existing, fresh)
+        
+        if changes.is_empty():
+            print(f"Sin cambios en {output_file}")
+            if not columnar_is_current(output_file):
+                write_columnar(existing, output_file)
+            return changes
+        
+        merged = apply_changes(existing, changes)
+        write_calendar(merged, output_file)
+        write_columnar(merged, output_file)
+        print(f"Saved to {output_file}")
+        
+        counts = dict(changes.group_by("change").len().iter_rows())
+        print(f"Cambios: {counts.get('insert', 0)} nuevos, {counts.get('result', 0)} con resultado, "
+              f"{counts.get('update', 0)} actualizados")
+        for row in changes.filter(pl.col("change") == "result").iter_rows(named=True):
+            print(f"  ✅ {row['Local']} {row['GA']}-{row['GC']} {row['Visita']} ({row['Jornada']})")
+        
+        if changes_file is None:
+            changes_file = f"{os.path.splitext(output_file)[0]}.changes.jsonl"
+        timestamp = datetime.now().isoformat(timespec="seconds")
+        with open(changes_file, "a", encoding="utf-8") as f:
+            for row in changes.iter_rows(named=True):
+                f.write(json.dumps({"timestamp": timestamp, **row}, ensure_ascii=False) + "\n")
+        
+        return changes
+
     def run(self):
         self.fetch_and_parse()
         self.save_to_csv()
+        if self.data:
+            self.commit_cache()
+
+# Líneas de goles totales de los resúmenes (valor, sufijo de columna) y tope de la distribución exacta (5 = "5+")
+GOAL_LINES = [(0.5, "05"), (1.5, "15"), (2.5, "25"), (3.5, "35"), (4.5, "45")]
+EXACT_GOALS_MAX = 5
 
 class StatisticsCalculator:
     def __init__(self, df):
         self.df = df
+        self.played = df.filter(pl.col("GA").is_not_null())
+        self.upcoming = df.filter(pl.col("GA").is_null())
+        # Índice exacto equipo -> filas, construido una sola vez: cada consulta por equipo es una selección por posición
+        self._played_index = self._team_index(self.played)
+        self._upcoming_index = self._team_index(self.upcoming)
+
+    @staticmethod
+    def _team_index(frame):
+        """Filas (ordenadas) de cada equipo como local, como visitante y en total, agrupando por los códigos categóricos"""
+        rows = frame.select(
+            pl.int_range(pl.len(), dtype=pl.UInt32).alias("_row"),
+            pl.col("Local").cast(pl.Utf8).cast(pl.Categorical),
+            pl.col("Visita").cast(pl.Utf8).cast(pl.Categorical),
+        )
+        index = {}
+        for side, column in (("home", "Local"), ("away", "Visita")):
+            for team, team_rows in rows.group_by(column).agg("_row").iter_rows():
+                if team is not None:
+                    index.setdefault(team, {})[side] = np.array(team_rows, dtype=np.uint32)
+        empty = np.array([], dtype=np.uint32)
+        for team_rows in index.values():
+            team_rows.setdefault("home", empty)
+            team_rows.setdefault("away", empty)
+            team_rows["all"] = np.union1d(team_rows["home"], team_rows["away"])
+        return index
+
+    @staticmethod
+    def _gather(frame, index, team_name, side):
+        """Partidos de `team_name` (nombre exacto) del lado pedido; vacío si el equipo no aparece"""
+        team_rows = index.get(team_name)
+        if team_rows is None:
+            return frame.clear()
+        return frame[team_rows[side]]
 
     def count_played_matches(self):
-        played = self.df.filter(pl.col("GA").is_not_null())
-        return len(played)
+        return len(self.played)
 
     def count_upcoming_matches(self):
-        upcoming = self.df.filter(pl.col("GA").is_null())
-        return len(upcoming)
+        return len(self.upcoming)
 
     def percentage_played(self):
         total = len(self.df)
@@ -128,14 +424,14 @@ class StatisticsCalculator:
         return (played / total) * 100
 
     def average_goals_per_match(self):
-        played_matches = self.df.filter(pl.col("GA").is_not_null())
+        played_matches = self.played
         if len(played_matches) == 0:
             return 0.0
         total_goals = (played_matches["GA"] + played_matches["GC"]).sum()
         return total_goals / len(played_matches)
 
     def percentage_over_goals(self, threshold=0):
-        played_matches = self.df.filter(pl.col("GA").is_not_null())
+        played_matches = self.played
         if len(played_matches) == 0:
             return 0.0
         total_goals = played_matches["GA"] + played_matches["GC"]
@@ -143,7 +439,7 @@ class StatisticsCalculator:
         return (len(matches_over) / len(played_matches)) * 100
 
     def percentage_under_goals(self, threshold=5):
-        played_matches = self.df.filter(pl.col("GA").is_not_null())
+        played_matches = self.played
         if len(played_matches) == 0:
             return 0.0
         total_goals = played_matches["GA"] + played_matches["GC"]
@@ -151,7 +447,7 @@ class StatisticsCalculator:
         return (len(matches_under) / len(played_matches)) * 100
 
     def percentage_exact_goals(self, exact=0):
-        played_matches = self.df.filter(pl.col("GA").is_not_null())
+        played_matches = self.played
         if len(played_matches) == 0:
             return 0.0
         total_goals = played_matches["GA"] + played_matches["GC"]
@@ -159,19 +455,66 @@ class StatisticsCalculator:
         return (len(matches_exact) / len(played_matches)) * 100
 
     def percentage_both_teams_score(self):
-        played_matches = self.df.filter(pl.col("GA").is_not_null())
+        played_matches = self.played
         if len(played_matches) == 0:
             return 0.0
         both_score = played_matches.filter((pl.col("GA") > 0) & (pl.col("GC") > 0))
         return (len(both_score) / len(played_matches)) * 100
 
+    def summary(self):
+        """
+        Métricas de la liga en una sola consulta perezosa con un único filtro de partidos jugados.
+        Devuelve un dict plano: conteos enteros (over/under por línea, goles exactos, BTTS, 1X2,
+        porterías a cero), sus porcentajes con prefijo `pct_` y promedios de goles por partido.
+        """
+        total = pl.col("GA") + pl.col("GC")
+        btts = (pl.col("GA") > 0) & (pl.col("GC") > 0)
+        counts = self.df.lazy().filter(pl.col("GA").is_not_null()).select(
+            pl.len().alias("played"),
+            total.sum().alias("goals"),
+            pl.col("GA").sum().alias("home_goals"),
+            pl.col("GC").sum().alias("away_goals"),
+            *[(total > line).sum().alias(f"over_{label}") for line, label in GOAL_LINES],
+            *[(total == goals).sum().alias(f"exact_{goals}") for goals in range(EXACT_GOALS_MAX)],
+            (total >= EXACT_GOALS_MAX).sum().alias(f"exact_{EXACT_GOALS_MAX}_plus"),
+            btts.sum().alias("btts_yes"),
+            (pl.col("GA") > pl.col("GC")).sum().alias("home_wins"),
+            (pl.col("GA") == pl.col("GC")).sum().alias("draws"),
+            (pl.col("GA") < pl.col("GC")).sum().alias("away_wins"),
+            (pl.col("GC") == 0).sum().alias("home_clean_sheets"),
+            (pl.col("GA") == 0).sum().alias("away_clean_sheets"),
+            ((total > 2.5) & btts).sum().alias("over_25_btts_yes"),
+            ((total < 2.5) & ~btts).sum().alias("under_25_btts_no"),
+        ).collect().row(0, named=True)
+        
+        played = counts["played"]
+        summary = {key: int(value or 0) for key, value in counts.items()}
+        for _, label in GOAL_LINES:
+            summary[f"under_{label}"] = played - summary[f"over_{label}"]
+        summary["btts_no"] = played - summary["btts_yes"]
+        summary["double_1x"] = summary["home_wins"] + summary["draws"]
+        summary["double_12"] = summary["home_wins"] + summary["away_wins"]
+        summary["double_x2"] = summary["draws"] + summary["away_wins"]
+        
+        percentages = {
+            f"pct_{key}": (value / played * 100) if played else 0.0
+            for key, value in summary.items()
+            if key not in ("played", "goals", "home_goals", "away_goals")
+        }
+        total_matches = len(self.df)
+        return {
+            **summary,
+            **percentages,
+            "total": total_matches,
+            "upcoming": total_matches - played,
+            "progress": (played / total_matches * 100) if total_matches else 0.0,
+            "average_goals": summary["goals"] / played if played else 0.0,
+            "home_goals_avg": summary["home_goals"] / played if played else 0.0,
+            "away_goals_avg": summary["away_goals"] / played if played else 0.0,
+        }
+
     def get_team_matches(self, team_name):
-        played_matches = self.df.filter(pl.col("GA").is_not_null())
-        team_matches = played_matches.filter(
-            (pl.col("Local").str.contains(team_name)) | 
-            (pl.col("Visita").str.contains(team_name))
-        )
-        return team_matches
+        return self._gather(self.played, self._played_index, team_name, "all")
 
     def team_count_matches(self, team_name):
         team_matches = self.get_team_matches(team_name)
@@ -208,21 +551,13 @@ class StatisticsCalculator:
         return (len(both_score) / len(team_matches)) * 100
 
     def get_all_teams(self):
-        played_matches = self.df.filter(pl.col("GA").is_not_null())
-        home_teams = played_matches["Local"].unique().to_list()
-        away_teams = played_matches["Visita"].unique().to_list()
-        all_teams = sorted(list(set(home_teams + away_teams)))
-        return all_teams
+        return sorted(self._played_index)
 
     def get_team_home_matches(self, team_name):
-        played_matches = self.df.filter(pl.col("GA").is_not_null())
-        home_matches = played_matches.filter(pl.col("Local").str.contains(team_name))
-        return home_matches
+        return self._gather(self.played, self._played_index, team_name, "home")
 
     def get_team_away_matches(self, team_name):
-        played_matches = self.df.filter(pl.col("GA").is_not_null())
-        away_matches = played_matches.filter(pl.col("Visita").str.contains(team_name))
-        return away_matches
+        return self._gather(self.played, self._played_index, team_name, "away")
 
     def team_home_count_matches(self, team_name):
         return len(self.get_team_home_matches(team_name))
@@ -323,24 +658,69 @@ class StatisticsCalculator:
         return (len(losses) / len(away_matches)) * 100
 
     def get_upcoming_matches(self):
-        upcoming = self.df.filter(pl.col("GA").is_null())
-        return upcoming
+        return self.upcoming
 
     def get_team_upcoming_matches(self, team_name):
-        upcoming = self.get_upcoming_matches()
-        team_upcoming = upcoming.filter(
-            (pl.col("Local").str.contains(team_name)) | 
-            (pl.col("Visita").str.contains(team_name))
-        )
-        return team_upcoming
+        return self._gather(self.upcoming, self._upcoming_index, team_name, "all")
 
     def get_head_to_head_upcoming(self, team1, team2):
-        upcoming = self.get_upcoming_matches()
-        h2h = upcoming.filter(
-            ((pl.col("Local").str.contains(team1)) & (pl.col("Visita").str.contains(team2))) |
-            ((pl.col("Local").str.contains(team2)) & (pl.col("Visita").str.contains(team1)))
+        first = self._upcoming_index.get(team1)
+        second = self._upcoming_index.get(team2)
+        if first is None or second is None:
+            return self.upcoming.clear()
+        rows = np.union1d(
+            np.intersect1d(first["home"], second["away"]),
+            np.intersect1d(second["home"], first["away"]),
+        )
+        return self.upcoming[rows]
+
+    def team_summary(self):
+        """Estadísticas de todos los equipos en una sola agregación (una fila por equipo, partidos jugados)"""
+        perspectives = pl.concat([
+            self.played.select(
+                pl.col("Local").cast(pl.Utf8).alias("team"),
+                pl.lit(True).alias("is_home"),
+                pl.col("GA").alias("scored"),
+                pl.col("GC").alias("conceded"),
+            ),
+            self.played.select(
+                pl.col("Visita").cast(pl.Utf8).alias("team"),
+                pl.lit(False).alias("is_home"),
+                pl.col("GC").alias("scored"),
+                pl.col("GA").alias("conceded"),
+            ),
+        ]).with_columns(
+            (pl.col("scored") + pl.col("conceded")).alias("total"),
+            ((pl.col("scored") > 0) & (pl.col("conceded") > 0)).alias("btts"),
+            (pl.col("scored") > pl.col("conceded")).alias("won"),
+            (pl.col("scored") == pl.col("conceded")).alias("drawn"),
+            (pl.col("scored") < pl.col("conceded")).alias("lost"),
         )
-        return h2h
+        return perspectives.group_by("team").agg(
+            *self._side_stats("", pl.col("scored").is_not_null()),
+            *self._side_stats("home_", pl.col("is_home")),
+            *self._side_stats("away_", ~pl.col("is_home")),
+        ).sort("team")
+
+    @staticmethod
+    def _side_stats(prefix, side):
+        """Partidos, promedios de goles y porcentajes de los partidos de un lado (todos, local o visitante)"""
+        count = side.sum()
+        
+        def percentage(condition):
+            return ((condition & side).sum() / count * 100).fill_nan(0.0)
+        
+        return [
+            count.alias(f"{prefix}matches"),
+            pl.col("total").filter(side).mean().fill_null(0.0).alias(f"{prefix}average_goals"),
+            pl.col("scored").filter(side).mean().fill_null(0.0).alias(f"{prefix}goals_scored_avg"),
+            pl.col("conceded").filter(side).mean().fill_null(0.0).alias(f"{prefix}goals_conceded_avg"),
+            *[percentage(pl.col("total") > line).alias(f"{prefix}over_{label}") for line, label in GOAL_LINES],
+            percentage(pl.col("btts")).alias(f"{prefix}btts"),
+            percentage(pl.col("won")).alias(f"{prefix}wins"),
+            percentage(pl.col("drawn")).alias(f"{prefix}draws"),
+            percentage(pl.col("lost")).alias(f"{prefix}losses"),
+        ]
 
     def get_all_rounds(self):
         rounds = self.df["Jornada"].unique().to_list()
@@ -351,7 +731,170 @@ class StatisticsCalculator:
         matches = self.df.filter(pl.col("Jornada") == round_name)
         return matches
 
-def main():
+# Columnas acumuladas de la tabla (totales, como local y como visitante)
+STANDINGS_COUNTS = ["played", "won", "drawn", "lost", "goals_for", "goals_against", "points"]
+FORM_LENGTH = 5
+
+class StandingsCalculator:
+    """Tabla de posiciones a partir de sumas acumuladas por equipo, consultable a una jornada o fecha"""
+
+    def __init__(self, df):
+        self.df = df
+        played = df.filter(pl.col("GA").is_not_null()).with_columns(
+            pl.col("Jornada").str.extract(r"(\d+)").cast(pl.Int32).alias("round"),
+        )
+        self.teams = sorted(
+            set(df["Local"].drop_nulls().cast(pl.Utf8).to_list()) | set(df["Visita"].drop_nulls().cast(pl.Utf8).to_list())
+        )
+        # Una línea de tiempo acumulada por orden: cronológico (consultas por fecha) y por jornada
+        self.timeline_by_date = self._timeline(played, ["Fecha", "Hora"])
+        self.timeline_by_round = self._timeline(played, ["round", "Fecha", "Hora"])
+
+    @staticmethod
+    def _timeline(played, order):
+        """Una fila por equipo y partido con los acumulados hasta ese partido (un único paso sobre los jugados)"""
+        perspectives = pl.concat([
+            played.select(
+                "round", "Fecha", "Hora",
+                pl.col("Local").cast(pl.Utf8).alias("team"),
+                pl.lit(True).alias("is_home"),
+                pl.col("GA").cast(pl.Int64).alias("scored"),
+                pl.col("GC").cast(pl.Int64).alias("conceded"),
+            ),
+            played.select(
+                "round", "Fecha", "Hora",
+                pl.col("Visita").cast(pl.Utf8).alias("team"),
+                pl.lit(False).alias("is_home"),
+                pl.col("GC").cast(pl.Int64).alias("scored"),
+                pl.col("GA").cast(pl.Int64).alias("conceded"),
+            ),
+        ]).sort(["team", *order], nulls_last=True)
+        
+        result = (
+            pl.when(pl.col("scored") > pl.col("conceded")).then(pl.lit("V"))
+            .when(pl.col("scored") == pl.col("conceded")).then(pl.lit("E"))
+            .otherwise(pl.lit("D"))
+        )
+        perspectives = perspectives.with_columns(result.alias("result"))
+        match = {
+            "played": pl.col("scored").is_not_null().cast(pl.Int64),
+            "won": (pl.col("result") == "V").cast(pl.Int64),
+            "drawn": (pl.col("result") == "E").cast(pl.Int64),
+            "lost": (pl.col("result") == "D").cast(pl.Int64),
+            "goals_for": pl.col("scored"),
+            "goals_against": pl.col("conceded"),
+            "points": pl.col("result").replace_strict({"V": 3, "E": 1, "D": 0}, return_dtype=pl.Int64),
+        }
+        
+        def cumulative(expr, side=None):
+            if side is not None:
+                expr = pl.when(pl.col("is_home") == side).then(expr).otherwise(0)
+            return expr.cum_sum().over("team")
+        
+        # Racha: últimos resultados (el más reciente a la derecha)
+        form = pl.concat_str(
+            [pl.col("result").shift(lag).over("team") for lag in range(FORM_LENGTH - 1, -1, -1)],
+            ignore_nulls=True,
+        )
+        return perspectives.select(
+            "team", "round", "Fecha", "Hora",
+            *[cumulative(expr).alias(name) for name, expr in match.items()],
+            *[cumulative(expr, True).alias(f"home_{name}") for name, expr in match.items()],
+            *[cumulative(expr, False).alias(f"away_{name}") for name, expr in match.items()],
+            form.alias("form"),
+        )
+
+    def table(self, as_of_round=None, as_of_date=None):
+        """Clasificación actual, hasta la jornada `as_of_round` o hasta la fecha `as_of_date` (incluidas)"""
+        if as_of_round is not None:
+            timeline = self.timeline_by_round.filter(pl.col("round") <= as_of_round)
+        elif as_of_date is not None:
+            timeline = self.timeline_by_date.filter(pl.col("Fecha") <= as_of_date)
+        else:
+            timeline = self.timeline_by_date
+        
+        # La última fila de cada equipo ya contiene sus acumulados hasta ese punto
+        columns = [
+            prefix + name for prefix in ("", "home_", "away_") for name in STANDINGS_COUNTS
+        ]
+        latest = timeline.group_by("team").agg(pl.col(columns).last(), pl.col("form").last())
+        table = (
+            pl.DataFrame({"team": self.teams}, schema={"team": pl.Utf8})
+            .join(latest, on="team", how="left")
+            .with_columns(pl.col(columns).fill_null(0), pl.col("form").fill_null(""))
+            .with_columns((pl.col("goals_for") - pl.col("goals_against")).alias("goal_diff"))
+            .sort(["points", "goal_diff", "goals_for", "team"], descending=[True, True, True, False])
+        )
+        return table.select(
+            pl.int_range(1, pl.len() + 1, dtype=pl.Int32).alias("position"),
+            "team",
+            *STANDINGS_COUNTS[:-1],
+            "goal_diff",
+            "points",
+            *[f"home_{name}" for name in STANDINGS_COUNTS],
+            *[f"away_{name}" for name in STANDINGS_COUNTS],
+            "form",
+        )
+
+    def rounds(self):
+        """Números de jornada con partidos jugados"""
+        return self.timeline_by_round["round"].drop_nulls().unique().sort().to_list()
+
+def extract_league(url, session=None, cache=None, force=False):
+    """Descarga y parsea el calendario de una liga"""
+    extractor = CalendarExtractor(url, session=session, cache=cache)
+    extractor.fetch_and_parse(force=force)
+    return extractor
+
+def update_leagues(ligas=None, max_workers=MAX_CONCURRENT_REQUESTS, output_dir=".", cache_dir=CACHE_DIR):
+    """
+    Descarga las ligas en paralelo y actualiza el CSV de cada una en cuanto llega.
+    Genera un dict por liga según van terminando: liga, archivo, status
+    ("updated", "unchanged" o "error"), changes (DataFrame de cambios o None),
+    data (partidos extraídos) y error (mensaje o None).
+    """
+    if ligas is None:
+        ligas = LIGAS
+    
+    cache = ResponseCache(cache_dir) if cache_dir else None
+    session = create_session(max_workers)
+    with session, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for nombre_liga, url in ligas.items():
+            filename = os.path.join(output_dir, league_filename(nombre_liga))
+            # Si falta el CSV hay que regenerarlo aunque la página no haya cambiado
+            force = not os.path.exists(filename)
+            futures[executor.submit(extract_league, url, session, cache, force)] = (nombre_liga, filename)
+        
+        for future in as_completed(futures):
+            nombre_liga, filename = futures[future]
+            result = {"liga": nombre_liga, "archivo": filename, "status": "unchanged",
+                      "changes": None, "data": None, "error": None}
+            
+            # Un fallo de una liga (red, HTTP, marcado inesperado, esquema) no interrumpe las demás
+            try:
+                extractor = future.result()
+                if extractor.error:
+                    yield {**result, "status": "error", "error": extractor.error}
+                    continue
+                
+                if not extractor.changed and os.path.exists(filename):
+                    extractor.commit_cache()
+                    yield result
+                    continue
+                
+                # Actualizar el CSV de la liga aplicando solo los partidos que cambiaron
+                changes = extractor.merge_to_csv(filename)
+                if changes is None:
+                    yield {**result, "status": "error", "error": "No se encontraron partidos en la página"}
+                    continue
+                extractor.commit_cache()
+            except Exception as e:
+                yield {**result, "status": "error", "error": f"{type(e).__name__}: {e}"}
+                continue
+            yield {**result, "status": "updated", "changes": changes, "data": extractor.get_dataframe()}
+
+def main(ligas=None, max_workers=MAX_CONCURRENT_REQUESTS, output_dir=".", cache_dir=CACHE_DIR):
     """
     Extrae datos de las 5 ligas europeas más importantes:
     - Premier League (Inglaterra)
@@ -359,32 +902,30 @@ def main():
     - Serie A (Italia)
     - Bundesliga (Alemania)
     - Ligue 1 (Francia)
-    """
     
-    ligas = {
-        "Premier League": "https://www.livefutbol.com/competition/co91/inglaterra-premier-league/all-matches/",
-        "La Liga": "https://www.livefutbol.com/competition/co97/espana-primera-division/all-matches/",
-        "La Liga 2": "https://www.livefutbol.com/competition/co110/espana-segunda-division/all-matches/",
-        "Serie A": "https://www.livefutbol.com/competition/co111/italia-serie-a/all-matches/",
-        "Bundesliga": "https://www.livefutbol.com/competition/co12/alemania-bundesliga/all-matches/",
-        "Ligue 1": "https://www.livefutbol.com/competition/co71/francia-ligue-1/all-matches/"
-    }
+    Las ligas se descargan en paralelo (hasta max_workers a la vez) sobre una
+    sesión HTTP compartida; cada CSV se escribe en cuanto llega su liga.
+    Con cache_dir las peticiones son condicionales (ETag/Last-Modified) y las
+    ligas sin cambios no se vuelven a parsear ni a escribir.
+    """
     
-    for nombre_liga, url in ligas.items():
+    for result in update_leagues(ligas, max_workers, output_dir, cache_dir):
+        nombre_liga, filename = result["liga"], result["archivo"]
         print(f"\n{'='*60}")
         print(f"Procesando: {nombre_liga}")
         print(f"{'='*60}")
         
-        extractor = CalendarExtractor(url)
-        extractor.fetch_and_parse()
+        if result["status"] == "error":
+            print(f"Error al actualizar {nombre_liga}: {result['error']}")
+            continue
         
-        # Guardar con nombre específico de la liga
-        filename = f"calendario_{nombre_liga.lower().replace(' ', '_')}.csv"
-        extractor.save_to_csv(filename)
+        if result["status"] == "unchanged":
+            print(f"Sin cambios, se mantiene {filename}")
+            continue
         
         # Mostrar estadísticas
-        df = extractor.get_dataframe()
-        if not df.is_empty():
+        df = result["data"]
+        if df is not None and not df.is_empty():
             stats = StatisticsCalculator(df)
             print(f"\n📊 Estadísticas de {nombre_liga}:")
             print(f"  - Partidos jugados: {stats.count_played_matches()}")
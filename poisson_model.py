@@ -0,0 +1,883 @@
+import functools
+
+import numpy as np
+import polars as pl
+from scipy.optimize import minimize
+from scipy.stats import poisson
+
+from calendar_store import MATCH_KEY, diff_matches
+
+# Truncado adaptativo de la matriz de marcadores: masa mínima capturada y límites de goles por equipo
+SCORE_MASS_TOLERANCE = 1e-4
+MIN_MAX_GOALS = 3
+MAX_MAX_GOALS = 15
+
+# Líneas de handicap asiático (goles sumados al local); las de cuarto se reparten en dos medias apuestas
+ASIAN_HANDICAP_LINES = [step / 4 for step in range(-10, 11)]
+
+# Mercados que se devuelven por defecto (columnas de los pronósticos)
+DEFAULT_MARKETS = [
+    'prob_home', 'prob_draw', 'prob_away',
+    'prob_over_05', 'prob_over_15', 'prob_over_25', 'prob_over_35', 'prob_over_45',
+    'prob_under_15', 'prob_under_25', 'prob_under_35',
+    'prob_btts_yes', 'prob_btts_no',
+    'prob_1x', 'prob_12', 'prob_x2',
+    'prob_home_win_btts', 'prob_away_win_btts',
+    'prob_home_minus_15', 'prob_away_plus_15', 'prob_home_plus_15', 'prob_away_minus_15',
+]
+
+# Mercados calculados como 1 - otro mercado: conservan la masa que queda fuera de la matriz
+COMPLEMENT_MARKETS = {
+    'prob_under_15': 'prob_over_15',
+    'prob_under_25': 'prob_over_25',
+    'prob_under_35': 'prob_over_35',
+    'prob_btts_yes': 'prob_btts_no',
+    'prob_away_plus_15': 'prob_home_minus_15',
+    'prob_home_plus_15': 'prob_away_minus_15',
+}
+
+def handicap_label(line):
+    """Sufijo de nombre para una línea de handicap: -1.5 -> minus_15, 0.25 -> plus_025"""
+    return f"{'minus' if line < 0 else 'plus'}_{abs(line):g}".replace(".", "")
+
+def asian_handicap_weights(goal_diff, line):
+    """Peso de ganada y de push de cada marcador para una apuesta con handicap `line` sobre la diferencia de goles"""
+    # Las líneas de cuarto (±0.25, ±0.75...) son dos medias apuestas en las líneas vecinas
+    halves = (line - 0.25, line + 0.25) if (line * 4) % 2 else (line, line)
+    win = sum((goal_diff + half > 0).astype(float) for half in halves) / 2
+    push = sum((goal_diff + half == 0).astype(float) for half in halves) / 2
+    return win, push
+
+@functools.lru_cache(maxsize=None)
+def market_mask_library(size):
+    """Biblioteca de máscaras de todos los mercados para matrices de marcadores size x size"""
+    home_goals = np.arange(size)[:, None]
+    away_goals = np.arange(size)[None, :]
+    goal_diff = home_goals - away_goals
+    total_goals = home_goals + away_goals
+    
+    masks = {
+        # 1X2 y doble oportunidad
+        'prob_home': goal_diff > 0,
+        'prob_draw': goal_diff == 0,
+        'prob_away': goal_diff < 0,
+        'prob_1x': goal_diff >= 0,
+        'prob_12': goal_diff != 0,
+        'prob_x2': goal_diff <= 0,
+        # BTTS y gana y anota
+        'prob_btts_no': (home_goals == 0) | (away_goals == 0),
+        'prob_home_win_btts': (goal_diff > 0) & (away_goals > 0),
+        'prob_away_win_btts': (goal_diff < 0) & (home_goals > 0),
+    }
+    
+    # Over/Under de goles totales (líneas .5)
+    # (líneas y marcadores definidos hasta MAX_MAX_GOALS aunque la matriz sea menor: fuera de ella la máscara es vacía)
+    for line in range(MAX_MAX_GOALS * 2 + 1):
+        label = f"{line + 0.5:g}".replace(".", "")
+        masks[f'prob_over_{label}'] = total_goals > line + 0.5
+        masks[f'prob_under_{label}'] = total_goals < line + 0.5
+    
+    # Handicap asiático (enteras, medias y de cuarto) para local y visitante
+    for line in ASIAN_HANDICAP_LINES:
+        label = handicap_label(line) if line else 'dnb'
+        for side, diff in (('home', goal_diff), ('away', -goal_diff)):
+            win, push = asian_handicap_weights(diff, line)
+            masks[f'prob_{side}_{label}'] = win
+            if push.any():
+                masks[f'prob_{side}_{label}_push'] = push
+    
+    # Resultados exactos
+    for home in range(MAX_MAX_GOALS + 1):
+        for away in range(MAX_MAX_GOALS + 1):
+            masks[f'prob_score_{home}_{away}'] = (home_goals == home) & (away_goals == away)
+    
+    return {name: np.broadcast_to(mask, (size, size)).astype(float) for name, mask in masks.items()}
+
+def unknown_markets(markets):
+    """Nombres de `markets` que no son mercados de la biblioteca de máscaras (las claves no dependen del tamaño)"""
+    known = market_mask_library(MIN_MAX_GOALS)
+    return [name for name in markets if name not in known]
+
+@functools.lru_cache(maxsize=256)
+def market_masks(size, names):
+    """Tensor (m, size, size) con las máscaras de los mercados `names`, construido una vez por tamaño y selección"""
+    library = market_mask_library(size)
+    tensor = np.stack([library[name] for name in names]) if names else np.zeros((0, size, size))
+    tensor.setflags(write=False)
+    return tensor
+
+class PoissonPredictor:
+    STATS_COLUMNS = [
+        'goals_scored_avg', 'goals_conceded_avg',
+        'home_goals_scored_avg', 'away_goals_scored_avg',
+        'home_goals_conceded_avg', 'away_goals_conceded_avg',
+        'matches_played'
+    ]
+
+    def __init__(self, df, team_sums=None, mass_tolerance=SCORE_MASS_TOLERANCE, half_life=None):
+        self.df = df
+        self.mass_tolerance = mass_tolerance
+        # Con un frame unificado (columna Liga) todo se agrupa además por liga
+        self.group_keys = ["Liga"] if "Liga" in df.columns else []
+        self.played_matches = df.filter(pl.col("GA").is_not_null())
+        # Decaimiento temporal: cada partido pesa 0.5 ** (antigüedad en días / half_life) respecto al último jugado
+        self.half_life = half_life
+        self.reference_date = self.played_matches["Fecha"].max() if half_life else None
+        self.league_avg = self._compute_league_average()
+        self.league_averages = self._compute_league_averages()
+        self.team_sums = team_sums if team_sums is not None else self.aggregate_team_sums(
+            self.played_matches, self.group_keys, half_life, self.reference_date
+        )
+        self.ratings = self.build_ratings_table()
+        self._ratings_index = {
+            self._team_key(row['team'], *[row[key] for key in self.group_keys]): row
+            for row in self.ratings.iter_rows(named=True)
+        }
+
+    def updated(self, df):
+        """Nuevo predictor para `df` recalculando solo los equipos con partidos nuevos o modificados"""
+        # Si desaparecieron partidos (o el frame es multi-liga) no hay forma incremental segura
+        options = {"mass_tolerance": self.mass_tolerance, "half_life": self.half_life}
+        if self.group_keys or not self.df.join(df, on=MATCH_KEY, how="anti").is_empty():
+            return PoissonPredictor(df, **options)
+        
+        changes = diff_matches(self.df, df)
+        played = df.filter(pl.col("GA").is_not_null())
+        reference_date = played["Fecha"].max() if self.half_life else None
+        
+        # Con decaimiento los acumulados que no cambian solo se reescalan a la nueva fecha de referencia
+        team_sums = self.team_sums
+        if self.half_life and self.reference_date is not None and reference_date is not None:
+            team_sums = self.decay_team_sums(team_sums, (reference_date - self.reference_date).days, self.half_life)
+        if changes.is_empty():
+            return PoissonPredictor(df, team_sums=team_sums, **options)
+        
+        teams = pl.concat([changes["Local"], changes["Visita"]]).unique().to_list()
+        affected = played.filter(pl.col("Local").is_in(teams) | pl.col("Visita").is_in(teams))
+        team_sums = pl.concat([
+            team_sums.filter(~pl.col("team").is_in(teams)),
+            self.aggregate_team_sums(affected, (), self.half_life, reference_date).filter(pl.col("team").is_in(teams)),
+        ])
+        return PoissonPredictor(df, team_sums=team_sums, **options)
+
+    def _compute_league_average(self):
+        total_matches = len(self.played_matches)
+        if total_matches == 0:
+            return 2.5
+        if self.half_life:
+            weight = self.decay_weight(self.half_life, self.reference_date)
+            return self.played_matches.select(
+                (weight * (pl.col("GA") + pl.col("GC"))).sum() / (weight.sum() * 2)
+            ).item()
+        total_goals = (self.played_matches["GA"] + self.played_matches["GC"]).sum()
+        return total_goals / (total_matches * 2)
+
+    def _compute_league_averages(self):
+        """Promedio de goles por equipo y partido de cada liga (una fila si no hay columna Liga)"""
+        if not self.group_keys:
+            return pl.DataFrame({"league_avg": [float(self.league_avg)]})
+        weight = self.decay_weight(self.half_life, self.reference_date)
+        return self.played_matches.with_columns(weight.alias("_weight")).group_by(self.group_keys).agg(
+            ((pl.col("_weight") * (pl.col("GA") + pl.col("GC"))).sum() / (pl.col("_weight").sum() * 2)).alias("league_avg")
+        )
+
+    @staticmethod
+    def decay_weight(half_life, reference_date):
+        """Peso exponencial de cada partido según su antigüedad (Fecha) respecto a `reference_date`; 1 sin vida media"""
+        if not half_life or reference_date is None:
+            return pl.lit(1)
+        age = (pl.lit(reference_date) - pl.col("Fecha")).dt.total_days().fill_null(0)
+        return (age * (-np.log(2) / half_life)).exp()
+
+    @staticmethod
+    def decay_team_sums(team_sums, days, half_life):
+        """Lleva los acumulados con decaimiento `days` días hacia adelante (los conteos crudos no cambian)"""
+        factor = 0.5 ** (days / half_life)
+        return team_sums.with_columns(
+            pl.col(
+                "home_matches", "away_matches",
+                "home_goals_scored", "home_goals_conceded",
+                "away_goals_scored", "away_goals_conceded",
+            ) * factor
+        )
+
+    def _team_key(self, team_name, liga=None):
+        return (liga, team_name) if self.group_keys else team_name
+
+    @staticmethod
+    def aggregate_team_sums(played, group_keys=(), half_life=None, reference_date=None):
+        """Partidos y goles acumulados (ponderados por decaimiento si hay vida media) por equipo con un único group-by"""
+        group_keys = list(group_keys)
+        played = played.with_columns(PoissonPredictor.decay_weight(half_life, reference_date).alias("_weight"))
+        # Cada partido aparece dos veces: desde la perspectiva local y la visitante
+        perspectives = pl.concat([
+            played.select(
+                *group_keys,
+                pl.col("Local").alias("team"),
+                pl.lit(True).alias("is_home"),
+                "_weight",
+                pl.col("GA").alias("scored"),
+                pl.col("GC").alias("conceded"),
+            ),
+            played.select(
+                *group_keys,
+                pl.col("Visita").alias("team"),
+                pl.lit(False).alias("is_home"),
+                "_weight",
+                pl.col("GC").alias("scored"),
+                pl.col("GA").alias("conceded"),
+            ),
+        ])
+
+        home = pl.col("is_home")
+        weight = pl.col("_weight")
+        return perspectives.group_by([*group_keys, "team"]).agg(
+            pl.len().alias("matches_played"),
+            weight.filter(home).sum().alias("home_matches"),
+            weight.filter(~home).sum().alias("away_matches"),
+            (weight * pl.col("scored")).filter(home).sum().alias("home_goals_scored"),
+            (weight * pl.col("conceded")).filter(home).sum().alias("home_goals_conceded"),
+            (weight * pl.col("scored")).filter(~home).sum().alias("away_goals_scored"),
+            (weight * pl.col("conceded")).filter(~home).sum().alias("away_goals_conceded"),
+        )
+
+    def build_ratings_table(self):
+        """Construye la tabla de ratings (promedios y fuerzas) a partir de los acumulados por equipo"""
+
+        def safe_avg(total, count):
+            return pl.when(pl.col(count) > 0).then(pl.col(total) / pl.col(count)).otherwise(0.0)
+
+        if self.group_keys:
+            ratings = self.team_sums.join(self.league_averages, on=self.group_keys, how="left")
+        else:
+            ratings = self.team_sums.with_columns(pl.lit(self.league_avg, dtype=pl.Float64).alias("league_avg"))
+        # matches_played es el conteo real; los promedios usan los partidos ponderados
+        weighted_matches = pl.col("home_matches") + pl.col("away_matches")
+        ratings = ratings.with_columns(
+            ((pl.col("home_goals_scored") + pl.col("away_goals_scored")) / weighted_matches).alias("goals_scored_avg"),
+            ((pl.col("home_goals_conceded") + pl.col("away_goals_conceded")) / weighted_matches).alias("goals_conceded_avg"),
+            safe_avg("home_goals_scored", "home_matches").alias("home_goals_scored_avg"),
+            safe_avg("away_goals_scored", "away_matches").alias("away_goals_scored_avg"),
+            safe_avg("home_goals_conceded", "home_matches").alias("home_goals_conceded_avg"),
+            safe_avg("away_goals_conceded", "away_matches").alias("away_goals_conceded_avg"),
+        )
+
+        # Fuerzas de ataque y defensa relativas al promedio de la liga
+        def strength(column):
+            return pl.when(pl.col("league_avg") > 0).then(pl.col(column) / pl.col("league_avg")).otherwise(1.0)
+
+        return ratings.with_columns(
+            strength("home_goals_scored_avg").alias("home_attack_strength"),
+            strength("home_goals_conceded_avg").alias("home_defense_strength"),
+            strength("away_goals_scored_avg").alias("away_attack_strength"),
+            strength("away_goals_conceded_avg").alias("away_defense_strength"),
+        ).sort([*self.group_keys, "team"])
+
+    def _team_rating(self, team_name, liga=None):
+        return self._ratings_index.get(self._team_key(team_name, liga))
+
+    def calculate_team_stats(self, team_name, liga=None):
+        """Calcula estadísticas ofensivas y defensivas de un equipo"""
+        rating = self._team_rating(team_name, liga)
+        if rating is None:
+            return {column: 0 for column in self.STATS_COLUMNS}
+        return {column: rating[column] for column in self.STATS_COLUMNS}
+    
+    def calculate_league_average(self):
+        """Calcula el promedio de goles de la liga"""
+        return self.league_avg
+    
+    def predict_match(self, home_team, away_team, liga=None):
+        """Predice el resultado usando distribución de Poisson"""
+        fixture = {"Local": [home_team], "Visita": [away_team]}
+        if self.group_keys:
+            fixture["Liga"] = [liga]
+        predictions = self.predict_matches(pl.DataFrame(fixture))
+        
+        # Si no hay datos suficientes
+        if predictions.is_empty():
+            return None
+        
+        prediction = predictions.row(0, named=True)
+        del prediction['Local'], prediction['Visita']
+        return prediction
+    
+    def predict_matches(self, fixtures, markets=None):
+        """Predice en bloque todos los partidos (columnas Local/Visita, y Liga si es multi-liga); `markets` elige los mercados"""
+        keys = self.group_keys
+        stats_struct = pl.struct(self.STATS_COLUMNS)
+        home_ratings = self.ratings.select(
+            *keys,
+            pl.col("team").alias("Local"),
+            stats_struct.alias("home_stats"),
+            "league_avg",
+            "home_attack_strength",
+            "home_defense_strength",
+        )
+        away_ratings = self.ratings.select(
+            *keys,
+            pl.col("team").alias("Visita"),
+            stats_struct.alias("away_stats"),
+            "away_attack_strength",
+            "away_defense_strength",
+        )
+        
+        # Solo partidos con datos suficientes (3+ partidos por equipo)
+        key_dtypes = {key: self.ratings.schema[key] for key in keys}
+        team_dtype = self.ratings.schema["team"]
+        frame = (
+            fixtures.with_columns(
+                pl.col("Local", "Visita").cast(team_dtype),
+                *[pl.col(key).cast(dtype) for key, dtype in key_dtypes.items()],
+            )
+            .with_row_index("_fixture_idx")
+            .join(home_ratings, on=[*keys, "Local"], how="inner")
+            .join(away_ratings, on=[*keys, "Visita"], how="inner")
+            .filter(
+                (pl.col("home_stats").struct.field("matches_played") >= 3) &
+                (pl.col("away_stats").struct.field("matches_played") >= 3)
+            )
+            .sort("_fixture_idx")
+        )
+        
+        frame = frame.drop("_fixture_idx")
+        home_expected_goals, away_expected_goals, rho = self.expected_goals(frame)
+        
+        return self._with_predictions(
+            frame.drop(
+                "league_avg",
+                "home_attack_strength", "home_defense_strength",
+                "away_attack_strength", "away_defense_strength",
+            ),
+            home_expected_goals,
+            away_expected_goals,
+            markets,
+            rho,
+        )
+    
+    def expected_goals(self, frame):
+        """Goles esperados (local, visitante) y corrección de marcadores bajos de cada partido del frame con ratings"""
+        home_expected_goals = (frame["home_attack_strength"] * frame["away_defense_strength"] * frame["league_avg"]).to_numpy()
+        away_expected_goals = (frame["away_attack_strength"] * frame["home_defense_strength"] * frame["league_avg"]).to_numpy()
+        return home_expected_goals, away_expected_goals, None
+    
+    def _with_predictions(self, frame, home_expected_goals, away_expected_goals, markets=None, rho=None):
+        """Añade al frame las columnas de pronóstico a partir de los goles esperados (y rho de Dixon-Coles si lo hay)"""
+        home_expected_goals = np.asarray(home_expected_goals, dtype=float)
+        away_expected_goals = np.asarray(away_expected_goals, dtype=float)
+        n = len(home_expected_goals)
+        if rho is not None:
+            rho = np.broadcast_to(np.asarray(rho, dtype=float), (n,))
+        
+        # Cada partido usa la matriz más pequeña que captura 1 - tolerancia de la masa; se calcula por bloques del mismo tamaño
+        sizes = self.matrix_sizes(home_expected_goals, away_expected_goals, self.mass_tolerance)
+        probabilities = {name: np.zeros(n) for name in (markets or DEFAULT_MARKETS)}
+        tail_mass = np.zeros(n)
+        top_scores = [None] * n
+        for max_goals in np.unique(sizes).tolist():
+            rows = np.flatnonzero(sizes == max_goals)
+            prob_matrices = self.score_matrices(
+                home_expected_goals[rows], away_expected_goals[rows], max_goals,
+                None if rho is None else rho[rows],
+            )
+            for name, values in self.market_probabilities(prob_matrices, markets).items():
+                probabilities[name][rows] = values
+            tail_mass[rows] = 1 - prob_matrices.sum(axis=(1, 2))
+            
+            # Resultado más probable y Top 5 resultados exactos
+            cols = max_goals + 1
+            flat = prob_matrices.reshape(len(rows), cols * cols)
+            order = np.argsort(-flat, axis=1, kind="stable")[:, :5]
+            top_probs = np.round(np.take_along_axis(flat, order, axis=1) * 100, 2)
+            for row, fixture_order, fixture_probs in zip(rows.tolist(), order.tolist(), top_probs.tolist()):
+                top_scores[row] = [
+                    {'score': f"{idx // cols}-{idx % cols}", 'prob': float(prob)}
+                    for idx, prob in zip(fixture_order, fixture_probs)
+                ]
+        
+        return frame.with_columns(
+            pl.col("Local").alias("home_team"),
+            pl.col("Visita").alias("away_team"),
+            pl.Series("home_expected_goals", np.round(home_expected_goals, 2), dtype=pl.Float64),
+            pl.Series("away_expected_goals", np.round(away_expected_goals, 2), dtype=pl.Float64),
+            *[
+                pl.Series(name, np.round(values * 100, 2), dtype=pl.Float64)
+                for name, values in probabilities.items()
+            ],
+            pl.Series("max_goals", sizes, dtype=pl.Int8),
+            pl.Series("tail_mass", tail_mass, dtype=pl.Float64),
+            pl.Series("most_likely_score", [score[0]['score'] for score in top_scores], dtype=pl.Utf8),
+            pl.Series(
+                "top_scores", top_scores,
+                dtype=pl.List(pl.Struct({"score": pl.Utf8, "prob": pl.Float64}))
+            ),
+        )
+    
+    @staticmethod
+    def matrix_sizes(home_expected_goals, away_expected_goals, tolerance=SCORE_MASS_TOLERANCE):
+        """Goles máximos por partido para que la matriz capture al menos 1 - tolerance de la probabilidad"""
+        goals = np.arange(MAX_MAX_GOALS + 1)
+        home_cdf = poisson.cdf(goals[None, :], np.asarray(home_expected_goals, dtype=float)[:, None])
+        away_cdf = poisson.cdf(goals[None, :], np.asarray(away_expected_goals, dtype=float)[:, None])
+        
+        # La masa de la matriz (g+1)x(g+1) es el producto de las acumuladas marginales
+        enough = home_cdf * away_cdf >= 1 - tolerance
+        sizes = np.where(enough.any(axis=1), enough.argmax(axis=1), MAX_MAX_GOALS)
+        return np.maximum(sizes, MIN_MAX_GOALS)
+    
+    @staticmethod
+    def score_matrices(home_expected_goals, away_expected_goals, max_goals=6, rho=None):
+        """Tensor (n, max_goals+1, max_goals+1) de probabilidades de cada marcador"""
+        home_expected_goals = np.asarray(home_expected_goals, dtype=float)
+        away_expected_goals = np.asarray(away_expected_goals, dtype=float)
+        goals = np.arange(max_goals + 1)
+        home_pmf = poisson.pmf(goals[None, :], home_expected_goals[:, None])
+        away_pmf = poisson.pmf(goals[None, :], away_expected_goals[:, None])
+        matrices = home_pmf[:, :, None] * away_pmf[:, None, :]
+        
+        # Corrección de Dixon-Coles en 0-0, 0-1, 1-0 y 1-1 (conserva la masa total)
+        if rho is not None:
+            rho = np.asarray(rho, dtype=float)
+            matrices[:, 0, 0] *= np.maximum(1 - home_expected_goals * away_expected_goals * rho, 0)
+            matrices[:, 0, 1] *= np.maximum(1 + home_expected_goals * rho, 0)
+            matrices[:, 1, 0] *= np.maximum(1 + away_expected_goals * rho, 0)
+            matrices[:, 1, 1] *= np.maximum(1 - rho, 0)
+        return matrices
+    
+    @staticmethod
+    def market_probabilities(prob_matrices, markets=None):
+        """Probabilidades de los mercados pedidos (por defecto DEFAULT_MARKETS) con un único tensordot matriz–máscaras"""
+        markets = markets or DEFAULT_MARKETS
+        names = tuple(dict.fromkeys(COMPLEMENT_MARKETS.get(name, name) for name in markets))
+        masks = market_masks(prob_matrices.shape[1], names)
+        values = dict(zip(names, np.tensordot(prob_matrices, masks, axes=([1, 2], [1, 2])).T))
+        
+        return {
+            name: 1 - values[COMPLEMENT_MARKETS[name]] if name in COMPLEMENT_MARKETS else values[name]
+            for name in markets
+        }
+    
+    def get_upcoming_matches(self):
+        """Obtiene los próximos partidos"""
+        return self.df.filter(pl.col("GA").is_null())
+    
+    def backtest(self, min_matches=3):
+        """Backtest walk-forward: cada partido jugado se predice solo con resultados anteriores a su inicio"""
+        played = self.played_matches.sort(["Fecha", "Hora"], nulls_last=True)
+        predicted_rows, home_expected_goals, away_expected_goals, rho = self.walk_forward_expected_goals(played, min_matches)
+        predictions = self._with_predictions(
+            played[predicted_rows],
+            home_expected_goals,
+            away_expected_goals,
+            rho=rho,
+        )
+        return self._score_backtest(predictions)
+    
+    def walk_forward_expected_goals(self, played, min_matches=3):
+        """Filas de `played` (ordenado por inicio) con historia suficiente y sus goles esperados con datos previos"""
+        # Acumulados por equipo: [partidos local, goles a favor local, goles en contra local,
+        #                         partidos visita, goles a favor visita, goles en contra visita,
+        #                         partidos jugados (sin ponderar), fecha del último resultado]
+        # (con frame multi-liga las claves son (liga, equipo) y los totales van por liga)
+        team_sums = {}
+        league_totals = {}
+        
+        def decay(sums, fecha, weighted):
+            # Con vida media, los acumulados se llevan a la fecha del nuevo resultado antes de sumarlo
+            if self.half_life and sums[-1] is not None and fecha is not None:
+                factor = 0.5 ** ((fecha - sums[-1]).days / self.half_life)
+                for position in range(weighted):
+                    sums[position] *= factor
+            if fecha is not None:
+                sums[-1] = fecha
+        
+        predicted_rows = []
+        home_expected_goals = []
+        away_expected_goals = []
+        pending_results = []
+        current_kickoff = None
+        
+        liga_column = pl.col(self.group_keys[0]) if self.group_keys else pl.lit(None)
+        rows = played.select("Fecha", "Hora", liga_column.alias("_liga"), "Local", "Visita", "GA", "GC").iter_rows()
+        for idx, (fecha, hora, liga, home, away, ga, gc) in enumerate(rows):
+            # Los partidos con el mismo horario no se ven entre sí
+            if (fecha, hora) != current_kickoff:
+                for result_fecha, result_liga, result_home, result_away, result_ga, result_gc in pending_results:
+                    home_sums = team_sums.setdefault(self._team_key(result_home, result_liga), [0] * 7 + [None])
+                    away_sums = team_sums.setdefault(self._team_key(result_away, result_liga), [0] * 7 + [None])
+                    totals = league_totals.setdefault(result_liga, [0, 0, None])
+                    decay(home_sums, result_fecha, 6)
+                    decay(away_sums, result_fecha, 6)
+                    decay(totals, result_fecha, 2)
+                    home_sums[0] += 1
+                    home_sums[1] += result_ga
+                    home_sums[2] += result_gc
+                    home_sums[6] += 1
+                    away_sums[3] += 1
+                    away_sums[4] += result_gc
+                    away_sums[5] += result_ga
+                    away_sums[6] += 1
+                    totals[0] += result_ga + result_gc
+                    totals[1] += 1
+                pending_results = []
+                current_kickoff = (fecha, hora)
+            
+            pending_results.append((fecha, liga, home, away, ga, gc))
+            
+            home_sums = team_sums.get(self._team_key(home, liga))
+            away_sums = team_sums.get(self._team_key(away, liga))
+            if home_sums is None or away_sums is None:
+                continue
+            if home_sums[6] < min_matches or away_sums[6] < min_matches:
+                continue
+            
+            # Mismo modelo que build_ratings_table, con los datos disponibles antes del partido
+            # (los cocientes no dependen de a qué fecha estén llevados los acumulados)
+            league_goals, league_matches, _ = league_totals[liga]
+            league_avg = league_goals / (league_matches * 2)
+            home_scored_avg = home_sums[1] / home_sums[0] if home_sums[0] > 0 else 0
+            home_conceded_avg = home_sums[2] / home_sums[0] if home_sums[0] > 0 else 0
+            away_scored_avg = away_sums[4] / away_sums[3] if away_sums[3] > 0 else 0
+            away_conceded_avg = away_sums[5] / away_sums[3] if away_sums[3] > 0 else 0
+            
+            predicted_rows.append(idx)
+            if league_avg > 0:
+                home_expected_goals.append(home_scored_avg * away_conceded_avg / league_avg)
+                away_expected_goals.append(away_scored_avg * home_conceded_avg / league_avg)
+            else:
+                home_expected_goals.append(league_avg)
+                away_expected_goals.append(league_avg)
+        
+        return (
+            predicted_rows,
+            np.array(home_expected_goals, dtype=float),
+            np.array(away_expected_goals, dtype=float),
+            None,
+        )
+    
+    @staticmethod
+    def _score_backtest(predictions):
+        """Añade a los pronósticos del backtest el resultado real y si cada mercado acertó"""
+        # Resultado real vs pronóstico
+        def pick(*options):
+            best = pl.max_horizontal(*[column for column, _ in options])
+            expr = pl.when(pl.col(options[0][0]) == best).then(pl.lit(options[0][1]))
+            for column, label in options[1:-1]:
+                expr = expr.when(pl.col(column) == best).then(pl.lit(label))
+            return expr.otherwise(pl.lit(options[-1][1]))
+        
+        real_result = (
+            pl.when(pl.col("GA") > pl.col("GC")).then(pl.lit("home"))
+            .when(pl.col("GA") < pl.col("GC")).then(pl.lit("away"))
+            .otherwise(pl.lit("draw"))
+        )
+        predicted_double_chance = pick(("prob_1x", "1x"), ("prob_12", "12"), ("prob_x2", "x2"))
+        
+        return predictions.with_columns(
+            real_result.alias("real_result"),
+            pick(("prob_home", "home"), ("prob_draw", "draw"), ("prob_away", "away")).alias("predicted_result"),
+            predicted_double_chance.alias("predicted_double_chance"),
+            (pl.col("prob_over_25") > pl.col("prob_under_25")).alias("predicted_over_25"),
+            ((pl.col("GA") + pl.col("GC")) > 2.5).alias("real_over_25"),
+            (pl.col("prob_btts_yes") > pl.col("prob_btts_no")).alias("predicted_btts"),
+            ((pl.col("GA") > 0) & (pl.col("GC") > 0)).alias("real_btts"),
+        ).with_columns(
+            (pl.col("predicted_result") == pl.col("real_result")).alias("correct_1x2"),
+            (
+                ((pl.col("predicted_double_chance") == "1x") & (pl.col("real_result") != "away")) |
+                ((pl.col("predicted_double_chance") == "12") & (pl.col("real_result") != "draw")) |
+                ((pl.col("predicted_double_chance") == "x2") & (pl.col("real_result") != "home"))
+            ).alias("correct_double_chance"),
+            (pl.col("predicted_over_25") == pl.col("real_over_25")).alias("correct_over_25"),
+            (pl.col("predicted_btts") == pl.col("real_btts")).alias("correct_btts"),
+        )
+    
+    def calculate_accuracy(self, backtest=None):
+        """Calcula el porcentaje de aciertos del modelo en partidos ya jugados (walk-forward)"""
+        if len(self.played_matches) < 10:
+            return None
+        
+        if backtest is None:
+            backtest = self.backtest()
+        
+        total = len(backtest)
+        if total == 0:
+            return None
+        
+        hits = backtest.select(
+            pl.col("correct_1x2").mean(),
+            pl.col("correct_over_25").mean(),
+            pl.col("correct_btts").mean(),
+            pl.col("correct_double_chance").mean(),
+        ).row(0, named=True)
+        
+        return {
+            'total_predictions': total,
+            'accuracy_1x2': round(hits['correct_1x2'] * 100, 2),
+            'accuracy_over_25': round(hits['correct_over_25'] * 100, 2),
+            'accuracy_btts': round(hits['correct_btts'] * 100, 2),
+            'accuracy_double_chance': round(hits['correct_double_chance'] * 100, 2)
+        }
+    
+    def accuracy_table(self, backtest=None):
+        """Precisión del modelo por liga (una fila por grupo) en una sola agregación"""
+        if backtest is None:
+            backtest = self.backtest()
+        
+        metrics = [
+            pl.len().alias("total_predictions"),
+            (pl.col("correct_1x2").mean() * 100).round(2).alias("accuracy_1x2"),
+            (pl.col("correct_over_25").mean() * 100).round(2).alias("accuracy_over_25"),
+            (pl.col("correct_btts").mean() * 100).round(2).alias("accuracy_btts"),
+            (pl.col("correct_double_chance").mean() * 100).round(2).alias("accuracy_double_chance"),
+        ]
+        keys = self.group_keys
+        if not keys:
+            if len(self.played_matches) < 10 or backtest.is_empty():
+                return backtest.select(metrics).clear()
+            return backtest.select(metrics)
+        
+        # Mismo criterio que calculate_accuracy: al menos 10 partidos jugados por liga
+        played_counts = self.played_matches.group_by(keys).len("played")
+        return (
+            backtest.group_by(keys).agg(metrics)
+            .join(played_counts, on=keys, how="inner")
+            .filter(pl.col("played") >= 10)
+            .drop("played")
+            .sort(keys)
+        )
+
+# Ajuste de Dixon-Coles: penalización ridge de ataque/defensa (estabiliza el inicio de temporada) y límites de rho
+DIXON_COLES_RIDGE = 0.5
+DIXON_COLES_RHO_BOUNDS = (-0.3, 0.3)
+
+class DixonColesPredictor(PoissonPredictor):
+    """Modelo de Maher/Dixon-Coles: ataque, defensa, ventaja local y rho ajustados por máxima verosimilitud"""
+    
+    def __init__(self, df, team_sums=None, mass_tolerance=SCORE_MASS_TOLERANCE, half_life=None, previous_fits=None):
+        super().__init__(df, team_sums=team_sums, mass_tolerance=mass_tolerance, half_life=half_life)
+        # El decaimiento de cada liga se mide desde su último partido, no desde el último del frame: con una
+        # referencia global, una liga parada tendría pesos menores y el ridge fijo pesaría más en su ajuste
+        self.fits = {
+            liga: self.fit_league(matches, (previous_fits or {}).get(liga), self._match_weights(matches, matches["Fecha"].max()))
+            for liga, matches in self._league_partitions(self.played_matches).items()
+        }
+        self.fit_table = self.build_fit_table()
+    
+    def updated(self, df):
+        """Nuevo predictor para `df` con el ajuste arrancando desde los parámetros actuales"""
+        return DixonColesPredictor(df, mass_tolerance=self.mass_tolerance, half_life=self.half_life, previous_fits=self.fits)
+    
+    def _match_weights(self, matches, reference_date):
+        """Pesos por decaimiento temporal de cada partido (None sin vida media)"""
+        if not self.half_life:
+            return None
+        return matches.select(self.decay_weight(self.half_life, reference_date)).to_series().to_numpy()
+    
+    def _league_partitions(self, played):
+        """Partidos jugados por liga (clave None si el frame es de una sola liga)"""
+        if not self.group_keys:
+            return {None: played}
+        return {
+            key[0]: matches
+            for key, matches in played.partition_by(self.group_keys, as_dict=True, maintain_order=True).items()
+        }
+    
+    @staticmethod
+    def negative_log_likelihood(params, home_idx, away_idx, home_goals, away_goals, weights, n_teams, ridge=DIXON_COLES_RIDGE):
+        """-log verosimilitud de Dixon-Coles y su gradiente analítico, vectorizados sobre todos los partidos"""
+        attack, defense = params[:n_teams], params[n_teams:2 * n_teams]
+        home_advantage, intercept, rho = params[2 * n_teams:]
+        
+        home_rate = np.exp(intercept + home_advantage + attack[home_idx] + defense[away_idx])
+        away_rate = np.exp(intercept + attack[away_idx] + defense[home_idx])
+        
+        # Corrección tau de marcadores bajos y sus derivadas respecto a log(lambda), log(mu) y rho
+        low = [
+            (home_goals == 0) & (away_goals == 0),
+            (home_goals == 0) & (away_goals == 1),
+            (home_goals == 1) & (away_goals == 0),
+            (home_goals == 1) & (away_goals == 1),
+        ]
+        both = home_rate * away_rate
+        tau = np.maximum(np.select(low, [1 - both * rho, 1 + home_rate * rho, 1 + away_rate * rho, 1 - rho], 1.0), 1e-10)
+        dtau_home = np.select(low[:2], [-both * rho, home_rate * rho], 0.0) / tau
+        dtau_away = np.select([low[0], low[2]], [-both * rho, away_rate * rho], 0.0) / tau
+        dtau_rho = np.select(low, [-both, home_rate, away_rate, -np.ones_like(both)], 0.0) / tau
+        
+        log_likelihood = weights * (
+            home_goals * np.log(home_rate) - home_rate
+            + away_goals * np.log(away_rate) - away_rate
+            + np.log(tau)
+        )
+        value = -log_likelihood.sum() + ridge * (attack @ attack + defense @ defense)
+        
+        # Gradiente: derivadas respecto a log(lambda) y log(mu) repartidas por equipo con bincount
+        grad_home = weights * (home_goals - home_rate + dtau_home)
+        grad_away = weights * (away_goals - away_rate + dtau_away)
+        gradient = np.concatenate([
+            -(np.bincount(home_idx, grad_home, n_teams) + np.bincount(away_idx, grad_away, n_teams)) + 2 * ridge * attack,
+            -(np.bincount(away_idx, grad_home, n_teams) + np.bincount(home_idx, grad_away, n_teams)) + 2 * ridge * defense,
+            [-grad_home.sum(), -(grad_home.sum() + grad_away.sum()), -(weights * dtau_rho).sum()],
+        ])
+        return value, gradient
+    
+    @classmethod
+    def fit_league(cls, matches, previous=None, weights=None):
+        """Ajusta una liga por L-BFGS-B; `previous` (ajuste anterior) sirve de punto de partida"""
+        teams = sorted(set(matches["Local"].cast(pl.Utf8).to_list()) | set(matches["Visita"].cast(pl.Utf8).to_list()))
+        n_teams = len(teams)
+        index = {team: idx for idx, team in enumerate(teams)}
+        home_idx = matches["Local"].cast(pl.Utf8).replace_strict(index, return_dtype=pl.Int64).to_numpy()
+        away_idx = matches["Visita"].cast(pl.Utf8).replace_strict(index, return_dtype=pl.Int64).to_numpy()
+        home_goals = matches["GA"].cast(pl.Float64).to_numpy()
+        away_goals = matches["GC"].cast(pl.Float64).to_numpy()
+        weights = np.ones(len(matches)) if weights is None else np.asarray(weights, dtype=float)
+        
+        # Punto de partida: ajuste previo para los equipos conocidos, promedios de la liga para el resto
+        start = np.zeros(2 * n_teams + 3)
+        if previous is not None:
+            previous_index = {team: idx for idx, team in enumerate(previous["teams"])}
+            previous_teams = len(previous["teams"])
+            for team, idx in index.items():
+                if team in previous_index:
+                    start[idx] = previous["params"][previous_index[team]]
+                    start[n_teams + idx] = previous["params"][previous_teams + previous_index[team]]
+            start[2 * n_teams:] = previous["params"][2 * previous_teams:]
+        elif len(matches):
+            mean_home = max(np.average(home_goals, weights=weights), 0.1)
+            mean_away = max(np.average(away_goals, weights=weights), 0.1)
+            start[2 * n_teams:] = [np.log(mean_home / mean_away), np.log(mean_away), 0.0]
+        
+        if not len(matches):
+            return {"teams": teams, "params": start}
+        
+        result = minimize(
+            cls.negative_log_likelihood,
+            start,
+            args=(home_idx, away_idx, home_goals, away_goals, weights, n_teams),
+            jac=True,
+            method="L-BFGS-B",
+            bounds=[(None, None)] * (2 * n_teams + 2) + [DIXON_COLES_RHO_BOUNDS],
+        )
+        return {"teams": teams, "params": result.x}
+    
+    @staticmethod
+    def fit_rates(fit, home_teams, away_teams):
+        """Goles esperados (local, visitante) y rho de un ajuste para listas de equipos"""
+        teams = fit["teams"]
+        n_teams = len(teams)
+        index = {team: idx for idx, team in enumerate(teams)}
+        attack, defense = fit["params"][:n_teams], fit["params"][n_teams:2 * n_teams]
+        home_advantage, intercept, rho = fit["params"][2 * n_teams:]
+        home_idx = np.array([index[team] for team in home_teams], dtype=int)
+        away_idx = np.array([index[team] for team in away_teams], dtype=int)
+        return (
+            np.exp(intercept + home_advantage + attack[home_idx] + defense[away_idx]),
+            np.exp(intercept + attack[away_idx] + defense[home_idx]),
+            rho,
+        )
+    
+    def build_fit_table(self):
+        """Parámetros ajustados por equipo (y liga) como DataFrame"""
+        team_dtype = self.ratings.schema["team"]
+        frames = []
+        for liga, fit in self.fits.items():
+            n_teams = len(fit["teams"])
+            home_advantage, intercept, rho = fit["params"][2 * n_teams:]
+            frame = pl.DataFrame({
+                "team": fit["teams"],
+                "attack": fit["params"][:n_teams],
+                "defense": fit["params"][n_teams:2 * n_teams],
+            }, schema={"team": pl.Utf8, "attack": pl.Float64, "defense": pl.Float64}).with_columns(
+                pl.col("team").cast(team_dtype),
+                pl.lit(float(home_advantage)).alias("home_advantage"),
+                pl.lit(float(intercept)).alias("intercept"),
+                pl.lit(float(rho)).alias("rho"),
+            )
+            if self.group_keys:
+                frame = frame.with_columns(pl.lit(liga, dtype=self.ratings.schema["Liga"]).alias("Liga"))
+            frames.append(frame)
+        
+        if not frames:
+            return pl.DataFrame(schema={"team": team_dtype, "attack": pl.Float64, "defense": pl.Float64})
+        return pl.concat(frames).select(*self.group_keys, pl.exclude(self.group_keys)).sort([*self.group_keys, "team"])
+    
+    def expected_goals(self, frame):
+        """Goles esperados y rho de cada partido a partir de los parámetros ajustados"""
+        keys = self.group_keys
+        params = self.fit_table
+        frame = (
+            frame.select(*keys, "Local", "Visita")
+            .join(
+                params.select(*keys, pl.col("team").alias("Local"), pl.col("attack").alias("home_attack"),
+                              pl.col("defense").alias("home_defense"), "home_advantage", "intercept", "rho"),
+                on=[*keys, "Local"], how="left", maintain_order="left",
+            )
+            .join(
+                params.select(*keys, pl.col("team").alias("Visita"), pl.col("attack").alias("away_attack"),
+                              pl.col("defense").alias("away_defense")),
+                on=[*keys, "Visita"], how="left", maintain_order="left",
+            )
+        )
+        home_expected_goals = np.exp(frame.select(
+            pl.col("intercept") + pl.col("home_advantage") + pl.col("home_attack") + pl.col("away_defense")
+        ).to_series().to_numpy())
+        away_expected_goals = np.exp(frame.select(
+            pl.col("intercept") + pl.col("away_attack") + pl.col("home_defense")
+        ).to_series().to_numpy())
+        return home_expected_goals, away_expected_goals, frame["rho"].to_numpy()
+    
+    def walk_forward_expected_goals(self, played, min_matches=3):
+        """Walk-forward reajustando (con arranque en caliente) antes de cada horario con los resultados previos"""
+        played = played.with_row_index("_row")
+        rows, home_expected_goals, away_expected_goals, rhos = [], [], [], []
+        
+        for liga, matches in self._league_partitions(played).items():
+            fit = None
+            fitted_until = 0
+            counts = {}
+            
+            # Los partidos con el mismo horario no se ven entre sí: se ajusta una vez por horario
+            kickoffs = matches.partition_by(["Fecha", "Hora"], maintain_order=True)
+            seen = 0
+            for kickoff in kickoffs:
+                candidates = [
+                    (row, home, away)
+                    for row, home, away in kickoff.select("_row", pl.col("Local").cast(pl.Utf8), pl.col("Visita").cast(pl.Utf8)).iter_rows()
+                    if counts.get(home, 0) >= min_matches and counts.get(away, 0) >= min_matches
+                ]
+                if candidates:
+                    if fitted_until < seen:
+                        # Mismo criterio que el ajuste completo: pesos relativos al último resultado conocido
+                        history = matches.head(seen)
+                        fit = self.fit_league(history, fit, self._match_weights(history, history["Fecha"].max()))
+                        fitted_until = seen
+                    home_rates, away_rates, rho = self.fit_rates(
+                        fit, [home for _, home, _ in candidates], [away for _, _, away in candidates]
+                    )
+                    rows.extend(row for row, _, _ in candidates)
+                    home_expected_goals.extend(home_rates.tolist())
+                    away_expected_goals.extend(away_rates.tolist())
+                    rhos.extend([rho] * len(candidates))
+                
+                for home, away in kickoff.select(pl.col("Local").cast(pl.Utf8), pl.col("Visita").cast(pl.Utf8)).iter_rows():
+                    counts[home] = counts.get(home, 0) + 1
+                    counts[away] = counts.get(away, 0) + 1
+                seen += len(kickoff)
+        
+        # Mismo orden cronológico que el backtest base
+        order = np.argsort(rows, kind="stable")
+        return (
+            np.array(rows, dtype=int)[order].tolist(),
+            np.array(home_expected_goals, dtype=float)[order],
+            np.array(away_expected_goals, dtype=float)[order],
+            np.array(rhos, dtype=float)[order],
+        )
+
+# Modelos disponibles por nombre (selector de la app y opción --modelo de la línea de comandos)
+MODELOS = {
+    "Poisson (promedios)": PoissonPredictor,
+    "Dixon-Coles (máxima verosimilitud)": DixonColesPredictor,
+}
+DEFAULT_MODELO = "Poisson (promedios)"
@@ -0,0 +1,303 @@
+import argparse
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import polars as pl
+
+from calendar_store import LIGA_DTYPE, LIGAS, league_filename, load_leagues
+from poisson_model import DEFAULT_MODELO, MODELOS, unknown_markets
+from pronosticos_cli import MODELOS_CLI
+
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+# Tras la primera petición, el agrupador espera BATCH_WINDOW segundos a otras para predecirlas juntas
+BATCH_WINDOW = 0.002
+MAX_BATCH = 4096
+# Cada cuántos segundos se comprueba si cambiaron los calendarios
+RELOAD_INTERVAL = 5.0
+REQUEST_TIMEOUT = 30.0
+RESPONSE_COLUMNS = [
+    pl.col("Liga").cast(pl.Utf8).alias("liga"),
+    pl.col("home_team").cast(pl.Utf8).alias("local"),
+    pl.col("away_team").cast(pl.Utf8).alias("visita"),
+    "home_expected_goals",
+    "away_expected_goals",
+    pl.col("^prob_.*$"),
+    "most_likely_score",
+    "top_scores",
+]
+
+class PredictionService:
+    """
+    Pronósticos en memoria para peticiones concurrentes: las peticiones que llegan
+    juntas se agrupan en un único predict_matches vectorizado, y el predictor se
+    reconstruye y se publica de una vez cuando cambian los archivos de las ligas.
+    """
+    
+    def __init__(self, data_dir=".", ligas=None, modelo=DEFAULT_MODELO, half_life=None,
+                 batch_window=BATCH_WINDOW, max_batch=MAX_BATCH, reload_interval=RELOAD_INTERVAL):
+        self.archivos = {nombre: os.path.join(data_dir, league_filename(nombre)) for nombre in (ligas or LIGAS)}
+        self.modelo = modelo
+        self.half_life = half_life
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.reload_interval = reload_interval
+        self.batches = 0
+        self.batched_fixtures = 0
+        self._state = None
+        self._reload_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self.reload()
+        self._threads = [
+            threading.Thread(target=self._batch_loop, name="agrupador-pronosticos", daemon=True),
+            threading.Thread(target=self._watch_loop, name="recarga-calendarios", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+    
+    def versions(self):
+        """Versión (mtime en ns) del archivo de cada liga disponible"""
+        return {
+            nombre: os.stat(archivo).st_mtime_ns
+            for nombre, archivo in self.archivos.items()
+            if os.path.exists(archivo)
+        }
+    
+    def reload(self, force=False):
+        """Reconstruye el predictor si cambió algún archivo; True si se publicó uno nuevo"""
+        with self._reload_lock:
+            versions = self.versions()
+            if not force and self._state is not None and self._state["versions"] == versions:
+                return False
+            frame = load_leagues({nombre: self.archivos[nombre] for nombre in versions})
+            predictor = MODELOS[self.modelo](frame, half_life=self.half_life)
+            # Un único reemplazo de referencia: cada lote usa entero el predictor anterior o el nuevo
+            self._state = {"versions": versions, "predictor": predictor, "loaded_at": datetime.now()}
+            return True
+    
+    def status(self):
+        state = self._state
+        return {
+            "modelo": self.modelo,
+            "half_life": self.half_life,
+            "loaded_at": state["loaded_at"].isoformat(timespec="seconds"),
+            "versions": state["versions"],
+            "batches": self.batches,
+            "batched_fixtures": self.batched_fixtures,
+        }
+    
+    def predict(self, fixtures, markets=None, timeout=REQUEST_TIMEOUT):
+        """
+        Pronósticos de una lista de partidos {"liga", "local", "visita"}, en el mismo orden;
+        None para los partidos sin datos suficientes. Se resuelve en el siguiente lote.
+        """
+        # Se valida antes de encolar: una petición mal formada no debe hacer fallar el lote que comparte con otras
+        if not isinstance(fixtures, list):
+            raise ValueError("'fixtures' debe ser una lista de partidos")
+        if markets is not None:
+            if not isinstance(markets, list) or not all(isinstance(name, str) for name in markets):
+                raise ValueError("'markets' debe ser una lista de nombres de mercado")
+            unknown = unknown_markets(markets)
+            if unknown:
+                raise ValueError(f"Mercados desconocidos: {', '.join(unknown)}")
+        versions = self._state["versions"]
+        for fixture in fixtures:
+            if not isinstance(fixture, dict):
+                raise ValueError("Cada partido debe ser un objeto con 'liga', 'local' y 'visita'")
+            for key in ("liga", "local", "visita"):
+                if not isinstance(fixture.get(key), str) or not fixture[key]:
+                    raise ValueError(f"Cada partido necesita '{key}' como texto no vacío")
+            if fixture["liga"] not in versions:
+                raise ValueError(f"Liga desconocida o sin datos: {fixture['liga']!r}")
+        if not fixtures:
+            return []
+        future = Future()
+        self._queue.put((fixtures, tuple(markets) if markets else None, future))
+        return future.result(timeout)
+    
+    def _batch_loop(self):
+        while not self._stop.is_set():
+            try:
+                batch = [self._queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            size = len(batch[0][0])
+            deadline = time.perf_counter() + self.batch_window
+            while size < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.perf_counter(), 0))
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+            
+            # Un predict_matches por combinación de mercados pedida en el lote
+            by_markets = {}
+            for item in batch:
+                by_markets.setdefault(item[1], []).append(item)
+            for markets, items in by_markets.items():
+                self._resolve(items, markets)
+    
+    def _resolve(self, items, markets):
+        """Predice un grupo de peticiones y resuelve sus futures; si el grupo falla se repite petición a petición"""
+        try:
+            results = self._predict_batch([item[0] for item in items], markets)
+        except Exception as e:
+            if len(items) == 1:
+                items[0][2].set_exception(e)
+                return
+            # El error llega solo a la petición que lo causó, no a las que compartían el lote
+            for item in items:
+                self._resolve([item], markets)
+            return
+        for item, result in zip(items, results):
+            item[2].set_result(result)
+    
+    def _predict_batch(self, requests, markets):
+        """Predice juntos los partidos de varias peticiones y reparte los resultados por petición"""
+        predictor = self._state["predictor"]
+        fixtures = pl.DataFrame(
+            {
+                "_request": [index for index, fixtures in enumerate(requests) for _ in fixtures],
+                "_item": [item for fixtures in requests for item in range(len(fixtures))],
+                "Liga": [fixture["liga"] for fixtures in requests for fixture in fixtures],
+                "Local": [fixture["local"] for fixtures in requests for fixture in fixtures],
+                "Visita": [fixture["visita"] for fixtures in requests for fixture in fixtures],
+            },
+            schema={"_request": pl.Int64, "_item": pl.Int64, "Liga": LIGA_DTYPE, "Local": pl.Utf8, "Visita": pl.Utf8},
+        )
+        predictions = predictor.predict_matches(fixtures, list(markets) if markets else None)
+        self.batches += 1
+        self.batched_fixtures += len(fixtures)
+        
+        results = [[None] * len(fixtures) for fixtures in requests]
+        for row in predictions.select("_request", "_item", *RESPONSE_COLUMNS).iter_rows(named=True):
+            results[row.pop("_request")][row.pop("_item")] = row
+        return results
+    
+    def _watch_loop(self):
+        while not self._stop.wait(self.reload_interval):
+            try:
+                if self.reload():
+                    print(f"Calendarios recargados ({datetime.now():%H:%M:%S})")
+            except Exception as e:
+                print(f"Error al recargar los calendarios: {e}")
+    
+    def close(self):
+        self._stop.set()
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    """
+    GET  /health                                  estado del servicio
+    GET  /predict?liga=..&local=..&visita=..      un partido
+    POST /predict {"fixtures": [...], "markets": [...]}  varios partidos (o un único partido en el cuerpo)
+    """
+    protocol_version = "HTTP/1.1"
+    service = None
+    quiet = True
+    
+    def setup(self):
+        super().setup()
+        # Cabeceras y cuerpo salen en escrituras separadas: sin TCP_NODELAY, Nagle + ACK retardado suman ~40 ms
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/health":
+            self._send_json(200, self.service.status())
+        elif url.path == "/predict":
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            markets = query.pop("markets", None)
+            self._respond_predictions([query], markets.split(",") if markets else None, single=True)
+        else:
+            self._send_json(404, {"error": "Ruta desconocida"})
+    
+    def do_POST(self):
+        if urlparse(self.path).path != "/predict":
+            self._send_json(404, {"error": "Ruta desconocida"})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": "JSON inválido"})
+            return
+        if not isinstance(body, dict):
+            self._send_json(400, {"error": "El cuerpo debe ser un objeto JSON"})
+            return
+        if "fixtures" in body:
+            fixtures = body["fixtures"]
+            if not isinstance(fixtures, list) or not all(isinstance(fixture, dict) for fixture in fixtures):
+                self._send_json(400, {"error": "'fixtures' debe ser una lista de objetos"})
+                return
+            self._respond_predictions(fixtures, body.get("markets"), single=False)
+        else:
+            self._respond_predictions([body], body.get("markets"), single=True)
+    
+    def _respond_predictions(self, fixtures, markets, single):
+        try:
+            predictions = self.service.predict(fixtures, markets)
+        except (ValueError, KeyError, pl.exceptions.PolarsError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+        self._send_json(200, predictions[0] if single else {"predictions": predictions})
+    
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+class PredictionServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Cola de conexiones pendientes amplia: con la de 5 por defecto, las ráfagas de clientes esperan el reintento de SYN (1 s)
+    request_queue_size = 128
+
+def make_server(service, host=SERVICE_HOST, port=SERVICE_PORT, quiet=True):
+    """Servidor HTTP (un hilo por conexión) que atiende con `service`; port=0 elige un puerto libre"""
+    handler = type("Handler", (PredictionHandler,), {"service": service, "quiet": quiet})
+    return PredictionServer((host, port), handler)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio HTTP/JSON local de pronósticos")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--modelo", choices=list(MODELOS_CLI), default="poisson")
+    parser.add_argument("--vida-media", type=float, help="Vida media en días del decaimiento temporal")
+    parser.add_argument("--data-dir", default=".", help="Carpeta de los calendarios")
+    parser.add_argument("--batch-window", type=float, default=BATCH_WINDOW, help="Espera (s) para agrupar peticiones")
+    parser.add_argument("--verbose", action="store_true", help="Registra cada petición")
+    args = parser.parse_args(argv)
+    
+    service = PredictionService(
+        args.data_dir, modelo=MODELOS_CLI[args.modelo], half_life=args.vida_media, batch_window=args.batch_window,
+    )
+    server = make_server(service, args.host, args.port, quiet=not args.verbose)
+    print(f"Sirviendo pronósticos en http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import os
+import re
+import unicodedata
+
+import polars as pl
+
+STORE_DIR = os.path.join(".cache", "predicciones")
+# Cambia cuando cambian las columnas guardadas; invalida los almacenes escritos con otro formato
+STORE_FORMAT = 1
+
+def data_stamp(versions, modelo, half_life):
+    """Sello de versión de datos: formato, modelo, vida media y versión del archivo de cada liga"""
+    leagues = ";".join(f"{nombre}={version}" for nombre, _, version in versions)
+    return f"{STORE_FORMAT}|{modelo}|{half_life}|{leagues}"
+
+def store_path(modelo, half_life, store_dir=STORE_DIR):
+    """Un archivo Arrow IPC por modelo y vida media"""
+    ascii_name = unicodedata.normalize("NFKD", modelo).encode("ascii", "ignore").decode().lower()
+    slug = "_".join(word for word in re.split(r"\W+", ascii_name) if word)
+    return os.path.join(store_dir, f"{slug}_{half_life or 'sin_decaimiento'}.arrow")
+
+def build_prediction_table(predictor):
+    """Pronósticos de todos los partidos pendientes del predictor (una fila por partido)"""
+    return predictor.predict_matches(predictor.get_upcoming_matches())
+
+def stamp_path(path):
+    """Archivo con el sello del almacén: existe aunque la tabla no tenga filas"""
+    return f"{path}.stamp"
+
+def write_store(predictions, path, stamp):
+    """Guarda la tabla (con su sello en la columna data_version) y el sello en stamp_path, ambos de forma atómica"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    predictions.with_columns(pl.lit(stamp).alias("data_version")).write_ipc(tmp_path)
+    os.replace(tmp_path, path)
+    # El sello se escribe después de la tabla: un lector nunca ve un sello nuevo con datos viejos
+    tmp_stamp = f"{stamp_path(path)}.tmp"
+    with open(tmp_stamp, "w", encoding="utf-8") as f:
+        f.write(stamp)
+    os.replace(tmp_stamp, stamp_path(path))
+    return path
+
+def store_stamp(path):
+    """Sello del almacén guardado en `path` (None si falta la tabla o su sello)"""
+    try:
+        if not os.path.exists(path):
+            return None
+        with open(stamp_path(path), encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+def read_store(path, stamp):
+    """Tabla de pronósticos guardada si su sello coincide con `stamp`; None si falta o quedó desactualizada"""
+    try:
+        if store_stamp(path) != stamp:
+            return None
+        predictions = pl.read_ipc(path)
+        # Entre las dos escrituras de write_store la tabla puede ser ya de otra versión que el sello leído
+        if len(predictions) and predictions["data_version"][0] != stamp:
+            return None
+        return predictions.drop("data_version")
+    except (OSError, pl.exceptions.PolarsError):
+        return None
@@ -1,12 +1,19 @@
 import streamlit as st
 import polars as pl
-import numpy as np
-from scipy.stats import poisson
-from datetime import datetime
+from datetime import datetime, timezone
 import os
-import subprocess
+import threading
 import time
 
+from extract_calendar import (
+    EXACT_GOALS_MAX, GOAL_LINES, MATCH_KEY, StandingsCalculator, StatisticsCalculator, league_frame, load_calendar,
+    load_leagues, update_leagues,
+)
+from poisson_model import DEFAULT_MODELO, MODELOS, DixonColesPredictor, PoissonPredictor
+from prediction_store import build_prediction_table, data_stamp, read_store, store_path, store_stamp, write_store
+from refresh_scheduler import RefreshScheduler
+from season_simulator import SeasonSimulator
+
 # Configuración de la página
 st.set_page_config(
     page_title="Pronósticos de Fútbol - Método Poisson",
@@ -61,315 +68,359 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-class PoissonPredictor:
-    def __init__(self, df):
-        self.df = df
-        self.played_matches = df.filter(pl.col("GA").is_not_null())
-        
-    def calculate_team_stats(self, team_name):
-        """Calcula estadísticas ofensivas y defensivas de un equipo"""
-        home_matches = self.played_matches.filter(pl.col("Local") == team_name)
-        away_matches = self.played_matches.filter(pl.col("Visita") == team_name)
-        
-        # Goles anotados
-        home_goals_scored = home_matches["GA"].sum() if len(home_matches) > 0 else 0
-        away_goals_scored = away_matches["GC"].sum() if len(away_matches) > 0 else 0
-        total_goals_scored = home_goals_scored + away_goals_scored
-        
-        # Goles recibidos
-        home_goals_conceded = home_matches["GC"].sum() if len(home_matches) > 0 else 0
-        away_goals_conceded = away_matches["GA"].sum() if len(away_matches) > 0 else 0
-        total_goals_conceded = home_goals_conceded + away_goals_conceded
-        
-        # Partidos jugados
-        total_matches = len(home_matches) + len(away_matches)
-        
-        if total_matches == 0:
+# Estado de cada liga durante una actualización (icono en la barra lateral)
+ESTADOS_ACTUALIZACION = {
+    "pending": "⏳",
+    "updated": "✅",
+    "unchanged": "➖",
+    "error": "❌",
+}
+
+class DataRefresh:
+    """Actualización de los datos desde internet en un hilo de fondo, compartida por todas las sesiones"""
+    
+    def __init__(self):
+        # Solo una actualización a la vez aunque se pulse el botón desde varios navegadores
+        self._running = threading.Lock()
+        self._state_lock = threading.Lock()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self.leagues = {}
+    
+    @property
+    def running(self):
+        return self._running.locked()
+    
+    def _begin(self, ligas):
+        """Toma el turno de actualización y reinicia el estado; False si ya había una en curso"""
+        if not self._running.acquire(blocking=False):
+            return False
+        with self._state_lock:
+            self.started_at = datetime.now()
+            self.finished_at = None
+            self.error = None
+            self.leagues = {nombre: {"status": "pending", "changes": 0, "error": None} for nombre in ligas or LIGAS}
+        return True
+    
+    def start(self, ligas=None):
+        """Lanza la actualización ({nombre: url}, por defecto todas) en segundo plano; False si ya había una en curso"""
+        if not self._begin(ligas):
+            return False
+        threading.Thread(target=self._run, args=(ligas,), name="actualizacion-ligas", daemon=True).start()
+        return True
+    
+    def run(self, ligas=None):
+        """
+        Actualización en el hilo que llama (la usa el planificador automático): devuelve las
+        ligas que fallaron, o None si ya había otra actualización en curso.
+        """
+        if not self._begin(ligas):
+            return None
+        self._run(ligas)
+        state = self.snapshot()
+        if state["error"] is not None:
+            return list(state["leagues"])
+        # Las que siguen pendientes no llegaron a procesarse
+        return [nombre for nombre, league in state["leagues"].items() if league["status"] in ("error", "pending")]
+    
+    def _run(self, ligas=None):
+        try:
+            # Cada liga escribe su archivo al terminar: sus datos quedan visibles sin esperar a las demás
+            for result in update_leagues(ligas):
+                changes = result["changes"]
+                with self._state_lock:
+                    self.leagues[result["liga"]] = {
+                        "status": result["status"],
+                        "changes": 0 if changes is None else len(changes),
+                        "error": result["error"],
+                    }
+            # Con los calendarios al día se recalculan una vez los pronósticos guardados
+            materialize_predictions(league_versions())
+        except Exception as e:
+            with self._state_lock:
+                self.error = str(e)
+        finally:
+            with self._state_lock:
+                self.finished_at = datetime.now()
+            self._running.release()
+    
+    def snapshot(self):
+        """Copia consistente del estado para pintarla sin bloquear al hilo de fondo"""
+        with self._state_lock:
             return {
-                'goals_scored_avg': 0,
-                'goals_conceded_avg': 0,
-                'home_goals_scored_avg': 0,
-                'away_goals_scored_avg': 0,
-                'matches_played': 0
+                "running": self.running,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "error": self.error,
+                "leagues": {nombre: dict(league) for nombre, league in self.leagues.items()},
             }
-        
-        return {
-            'goals_scored_avg': total_goals_scored / total_matches,
-            'goals_conceded_avg': total_goals_conceded / total_matches,
-            'home_goals_scored_avg': home_goals_scored / len(home_matches) if len(home_matches) > 0 else 0,
-            'away_goals_scored_avg': away_goals_scored / len(away_matches) if len(away_matches) > 0 else 0,
-            'home_goals_conceded_avg': home_goals_conceded / len(home_matches) if len(home_matches) > 0 else 0,
-            'away_goals_conceded_avg': away_goals_conceded / len(away_matches) if len(away_matches) > 0 else 0,
-            'matches_played': total_matches
-        }
+
+@st.cache_resource(show_spinner=False)
+def data_refresh():
+    """Única actualización de datos del proceso (el estado se comparte entre sesiones)"""
+    return DataRefresh()
+
+@st.cache_resource(show_spinner=False)
+def refresh_scheduler():
+    """Planificador de actualizaciones automáticas del proceso; comparte el turno con el botón de actualizar"""
+    return RefreshScheduler(runner=data_refresh().run)
+
+def show_refresh_progress(refresh):
+    """Progreso por liga de la actualización; vuelve a ejecutar la app cuando termina una liga"""
+    state = refresh.snapshot()
+    leagues = state["leagues"]
+    if not leagues:
+        return
+    done = sum(league["status"] != "pending" for league in leagues.values())
     
-    def calculate_league_average(self):
-        """Calcula el promedio de goles de la liga"""
-        total_goals = (self.played_matches["GA"] + self.played_matches["GC"]).sum()
-        total_matches = len(self.played_matches)
-        if total_matches == 0:
-            return 2.5
-        return total_goals / (total_matches * 2)
+    if state["running"]:
+        st.progress(done / len(leagues), text=f"🔄 Actualizando ligas ({done}/{len(leagues)})")
+    elif state["error"]:
+        st.error(f"❌ Error al actualizar datos: {state['error']}")
+    else:
+        failed = sum(league["status"] == "error" for league in leagues.values())
+        if failed:
+            st.warning(f"⚠️ Actualización terminada con errores en {failed} liga(s) ({state['finished_at']:%H:%M:%S})")
+        else:
+            st.success(f"✅ Datos actualizados ({state['finished_at']:%H:%M:%S})")
     
-    def predict_match(self, home_team, away_team):
-        """Predice el resultado usando distribución de Poisson"""
-        home_stats = self.calculate_team_stats(home_team)
-        away_stats = self.calculate_team_stats(away_team)
-        league_avg = self.calculate_league_average()
-        
-        # Si no hay datos suficientes
-        if home_stats['matches_played'] < 3 or away_stats['matches_played'] < 3:
-            return None
-        
-        # Calcular fuerza de ataque y defensa
-        home_attack_strength = home_stats['home_goals_scored_avg'] / league_avg if league_avg > 0 else 1
-        home_defense_strength = home_stats['home_goals_conceded_avg'] / league_avg if league_avg > 0 else 1
-        away_attack_strength = away_stats['away_goals_scored_avg'] / league_avg if league_avg > 0 else 1
-        away_defense_strength = away_stats['away_goals_conceded_avg'] / league_avg if league_avg > 0 else 1
-        
-        # Goles esperados
-        home_expected_goals = home_attack_strength * away_defense_strength * league_avg
-        away_expected_goals = away_attack_strength * home_defense_strength * league_avg
-        
-        # Calcular probabilidades para cada resultado
-        max_goals = 6
-        prob_matrix = np.zeros((max_goals + 1, max_goals + 1))
-        
-        for i in range(max_goals + 1):
-            for j in range(max_goals + 1):
-                prob_matrix[i][j] = poisson.pmf(i, home_expected_goals) * poisson.pmf(j, away_expected_goals)
-        
-        # Probabilidades 1X2
-        prob_home = np.sum(np.tril(prob_matrix, -1))  # Local gana
-        prob_draw = np.sum(np.diag(prob_matrix))       # Empate
-        prob_away = np.sum(np.triu(prob_matrix, 1))    # Visitante gana
-        
-        # Over/Under múltiples líneas
-        total_goals_matrix = np.arange(max_goals + 1)[:, None] + np.arange(max_goals + 1)
-        
-        prob_over_05 = np.sum(prob_matrix[np.where(total_goals_matrix > 0.5)])
-        prob_over_15 = np.sum(prob_matrix[np.where(total_goals_matrix > 1.5)])
-        prob_over_25 = np.sum(prob_matrix[np.where(total_goals_matrix > 2.5)])
-        prob_over_35 = np.sum(prob_matrix[np.where(total_goals_matrix > 3.5)])
-        prob_over_45 = np.sum(prob_matrix[np.where(total_goals_matrix > 4.5)])
-        
-        prob_under_15 = 1 - prob_over_15
-        prob_under_25 = 1 - prob_over_25
-        prob_under_35 = 1 - prob_over_35
-        
-        # BTTS (Ambos equipos anotan)
-        prob_btts_yes = 1 - prob_matrix[0, :].sum() - prob_matrix[:, 0].sum() + prob_matrix[0, 0]
-        prob_btts_no = 1 - prob_btts_yes
-        
-        # Doble Oportunidad
-        prob_1x = prob_home + prob_draw
-        prob_12 = prob_home + prob_away
-        prob_x2 = prob_draw + prob_away
-        
-        # Gana y anota (ambos equipos)
-        prob_home_win_btts = 0
-        prob_away_win_btts = 0
-        for i in range(1, max_goals + 1):
-            for j in range(1, max_goals + 1):
-                if i > j:
-                    prob_home_win_btts += prob_matrix[i, j]
-                elif j > i:
-                    prob_away_win_btts += prob_matrix[i, j]
-        
-        # Handicap Asiático
-        prob_home_minus_15 = np.sum(prob_matrix[np.where((np.arange(max_goals + 1)[:, None] - 
-                                                           np.arange(max_goals + 1)) > 1.5)])
-        prob_away_plus_15 = 1 - prob_home_minus_15
-        
-        prob_away_minus_15 = np.sum(prob_matrix[np.where((np.arange(max_goals + 1) - 
-                                                           np.arange(max_goals + 1)[:, None]) > 1.5)])
-        prob_home_plus_15 = 1 - prob_away_minus_15
-        
-        # Resultado más probable
-        most_likely_score = np.unravel_index(prob_matrix.argmax(), prob_matrix.shape)
-        
-        # Top 5 resultados más probables
-        flat_indices = np.argsort(prob_matrix.ravel())[::-1][:5]
-        top_scores = []
-        for idx in flat_indices:
-            score = np.unravel_index(idx, prob_matrix.shape)
-            prob = prob_matrix[score] * 100
-            top_scores.append({
-                'score': f"{score[0]}-{score[1]}",
-                'prob': round(prob, 2)
-            })
-        
-        return {
-            'home_team': home_team,
-            'away_team': away_team,
-            'home_expected_goals': round(home_expected_goals, 2),
-            'away_expected_goals': round(away_expected_goals, 2),
-            # 1X2
-            'prob_home': round(prob_home * 100, 2),
-            'prob_draw': round(prob_draw * 100, 2),
-            'prob_away': round(prob_away * 100, 2),
-            # Over/Under
-            'prob_over_05': round(prob_over_05 * 100, 2),
-            'prob_over_15': round(prob_over_15 * 100, 2),
-            'prob_over_25': round(prob_over_25 * 100, 2),
-            'prob_over_35': round(prob_over_35 * 100, 2),
-            'prob_over_45': round(prob_over_45 * 100, 2),
-            'prob_under_15': round(prob_under_15 * 100, 2),
-            'prob_under_25': round(prob_under_25 * 100, 2),
-            'prob_under_35': round(prob_under_35 * 100, 2),
-            # BTTS
-            'prob_btts_yes': round(prob_btts_yes * 100, 2),
-            'prob_btts_no': round(prob_btts_no * 100, 2),
-            # Doble Oportunidad
-            'prob_1x': round(prob_1x * 100, 2),
-            'prob_12': round(prob_12 * 100, 2),
-            'prob_x2': round(prob_x2 * 100, 2),
-            # Gana y anota
-            'prob_home_win_btts': round(prob_home_win_btts * 100, 2),
-            'prob_away_win_btts': round(prob_away_win_btts * 100, 2),
-            # Handicap Asiático
-            'prob_home_minus_15': round(prob_home_minus_15 * 100, 2),
-            'prob_away_plus_15': round(prob_away_plus_15 * 100, 2),
-            'prob_home_plus_15': round(prob_home_plus_15 * 100, 2),
-            'prob_away_minus_15': round(prob_away_minus_15 * 100, 2),
-            # Resultados exactos
-            'most_likely_score': f"{most_likely_score[0]}-{most_likely_score[1]}",
-            'top_scores': top_scores,
-            'home_stats': home_stats,
-            'away_stats': away_stats
-        }
+    for nombre, league in leagues.items():
+        if league["status"] == "error":
+            detail = ": error de descarga"
+        elif league["status"] == "updated":
+            detail = f": {league['changes']} cambios"
+        else:
+            detail = ""
+        st.caption(f"{ESTADOS_ACTUALIZACION[league['status']]} {nombre}{detail}", help=league["error"])
     
-    def get_upcoming_matches(self):
-        """Obtiene los próximos partidos"""
-        return self.df.filter(pl.col("GA").is_null())
+    # Los datos de una liga se releen (por versión del archivo) en cuanto termina
+    progress = (done, state["running"])
+    previous = st.session_state.get("refresh_progress")
+    st.session_state["refresh_progress"] = progress
+    if previous is not None and previous != progress:
+        st.rerun()
+
+LIGAS = {
+    "Premier League": "calendario_premier_league.csv",
+    "La Liga": "calendario_la_liga.csv",
+    "La Liga 2": "calendario_la_liga_2.csv",
+    "Serie A": "calendario_serie_a.csv",
+    "Bundesliga": "calendario_bundesliga.csv",
+    "Ligue 1": "calendario_ligue_1.csv"
+}
+
+def league_file_version(archivo):
+    """Versión del archivo de una liga (mtime en ns); cambia cada vez que se reescribe"""
+    return os.stat(archivo).st_mtime_ns
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def read_league_file(archivo, version):
+    """Lee el calendario tipado de una liga (Arrow IPC si está al día, si no el CSV); la caché se invalida cuando cambia la versión del archivo"""
+    return load_calendar(archivo)
+
+# Vidas medias (días) del decaimiento temporal seleccionables en la barra lateral
+VIDAS_MEDIAS = {
+    "Sin decaimiento": None,
+    "30 días": 30,
+    "60 días": 60,
+    "90 días": 90,
+    "180 días": 180,
+    "365 días": 365,
+}
+
+def selected_model():
+    """Modelo elegido en la barra lateral (por defecto Poisson por promedios)"""
+    return st.session_state.get("modelo", DEFAULT_MODELO)
+
+def selected_half_life():
+    """Vida media elegida en la barra lateral (None = todos los partidos pesan igual)"""
+    return VIDAS_MEDIAS[st.session_state.get("vida_media", "Sin decaimiento")]
+
+@st.cache_resource(show_spinner=False)
+def predictor_registry():
+    """Último predictor construido por archivo y modelo, base para actualizaciones incrementales"""
+    return {"lock": threading.Lock(), "predictors": {}}
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def build_predictor(archivo, version, modelo=DEFAULT_MODELO, half_life=None):
+    """Predictor (con su tabla de ratings) compartido entre sesiones para una versión del archivo, modelo y vida media"""
+    df = read_league_file(archivo, version)
+    registry = predictor_registry()
+    key = (archivo, modelo, half_life)
     
-    def calculate_accuracy(self):
-        """Calcula el porcentaje de aciertos del modelo en partidos ya jugados"""
-        if len(self.played_matches) < 10:
-            return None
-        
-        correct_1x2 = 0
-        correct_over_25 = 0
-        correct_btts = 0
-        correct_double_chance = 0
-        total = 0
-        
-        for row in self.played_matches.iter_rows(named=True):
-            home = row['Local']
-            away = row['Visita']
-            ga = row['GA']
-            gc = row['GC']
-            
-            # Verificar que ambos equipos tengan suficientes partidos previos
-            home_stats = self.calculate_team_stats(home)
-            away_stats = self.calculate_team_stats(away)
-            
-            if home_stats['matches_played'] < 3 or away_stats['matches_played'] < 3:
+    with registry["lock"]:
+        previous = registry["predictors"].get(key)
+    
+    # Tras una actualización solo se recalcula lo que cambió (o el ajuste arranca del anterior)
+    if previous is not None and previous[0] < version:
+        predictor = previous[1].updated(df)
+    else:
+        predictor = MODELOS[modelo](df, half_life=half_life)
+    
+    with registry["lock"]:
+        current = registry["predictors"].get(key)
+        if current is None or current[0] < version:
+            registry["predictors"][key] = (version, predictor)
+    return predictor
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def run_league_backtest(archivo, version, modelo=DEFAULT_MODELO, half_life=None):
+    """Backtest walk-forward de una liga, cacheado por versión del archivo, modelo y vida media"""
+    return build_predictor(archivo, version, modelo, half_life).backtest()
+
+def get_predictor(league_name):
+    archivo = LIGAS[league_name]
+    return build_predictor(archivo, league_file_version(archivo), selected_model(), selected_half_life())
+
+def get_league_backtest(league_name):
+    archivo = LIGAS[league_name]
+    return run_league_backtest(archivo, league_file_version(archivo), selected_model(), selected_half_life())
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def build_standings(archivo, version):
+    """Motor de clasificación (acumulados por equipo) de una liga, cacheado por versión del archivo"""
+    return StandingsCalculator(read_league_file(archivo, version))
+
+def get_standings(league_name):
+    archivo = LIGAS[league_name]
+    return build_standings(archivo, league_file_version(archivo))
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def build_statistics(archivo, version):
+    """Calculadora de estadísticas (índice de partidos por equipo) de una liga, cacheada por versión del archivo"""
+    return StatisticsCalculator(read_league_file(archivo, version))
+
+def get_statistics(league_name):
+    archivo = LIGAS[league_name]
+    return build_statistics(archivo, league_file_version(archivo))
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def compute_league_summary(archivo, version):
+    return build_statistics(archivo, version).summary()
+
+def get_league_summary(league_name):
+    archivo = LIGAS[league_name]
+    return compute_league_summary(archivo, league_file_version(archivo))
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def run_season_simulation(archivo, version, modelo=DEFAULT_MODELO, half_life=None, n_simulations=100_000):
+    """Simulación Monte Carlo del resto de la temporada: (resumen por equipo, probabilidades por puesto)"""
+    predictor = build_predictor(archivo, version, modelo, half_life)
+    upcoming = predictor.get_upcoming_matches()
+    
+    # Goles esperados de cada partido pendiente; sin datos suficientes se usa el promedio de la liga
+    rates = predictor.predict_matches(upcoming).select(
+        *MATCH_KEY,
+        pl.col("home_expected_goals").alias("home_rate"),
+        pl.col("away_expected_goals").alias("away_rate"),
+    )
+    fixtures = upcoming.join(rates, on=MATCH_KEY, how="left").with_columns(
+        pl.col("home_rate", "away_rate").fill_null(predictor.league_avg)
+    )
+    table = build_standings(archivo, version).table()
+    result = SeasonSimulator.from_fixtures(predictor.played_matches, fixtures, table).run(n_simulations, seed=0)
+    return result.summary(), result.position_table()
+
+def get_season_simulation(league_name, n_simulations):
+    archivo = LIGAS[league_name]
+    return run_season_simulation(
+        archivo, league_file_version(archivo), selected_model(), selected_half_life(), n_simulations
+    )
+
+def league_versions():
+    """(liga, archivo, versión) de cada liga con archivo disponible; clave de caché del frame unificado"""
+    return tuple(
+        (nombre, archivo, league_file_version(archivo))
+        for nombre, archivo in LIGAS.items()
+        if os.path.exists(archivo)
+    )
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def unified_league_frame(versions):
+    """Todas las ligas en un único frame con columna Liga (Enum en el orden de LIGAS)"""
+    return league_frame({nombre: read_league_file(archivo, version) for nombre, archivo, version in versions})
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def build_unified_predictor(versions, modelo=DEFAULT_MODELO, half_life=None):
+    """Predictor multi-liga (ratings agrupados por Liga) para un conjunto de versiones de archivo"""
+    return MODELOS[modelo](unified_league_frame(versions), half_life=half_life)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def run_unified_backtest(versions, modelo=DEFAULT_MODELO, half_life=None):
+    """Backtest walk-forward de todas las ligas a la vez"""
+    return build_unified_predictor(versions, modelo, half_life).backtest()
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def compute_accuracy_table(versions, modelo=DEFAULT_MODELO, half_life=None):
+    """Precisión por liga en un solo DataFrame"""
+    predictor = build_unified_predictor(versions, modelo, half_life)
+    return predictor.accuracy_table(backtest=run_unified_backtest(versions, modelo, half_life))
+
+def get_unified_backtest():
+    return run_unified_backtest(league_versions(), selected_model(), selected_half_life())
+
+def get_accuracy_table():
+    return compute_accuracy_table(league_versions(), selected_model(), selected_half_life())
+
+def materialize_predictions(versions):
+    """
+    Recalcula y guarda la tabla de pronósticos del modelo por defecto y de cada
+    combinación de modelo y vida media que ya tenga almacén, si su sello quedó viejo.
+    """
+    frame = None
+    for modelo in MODELOS:
+        for half_life in VIDAS_MEDIAS.values():
+            path = store_path(modelo, half_life)
+            if (modelo, half_life) != (DEFAULT_MODELO, None) and not os.path.exists(path):
                 continue
-            
-            prediction = self.predict_match(home, away)
-            if not prediction:
+            stamp = data_stamp(versions, modelo, half_life)
+            if store_stamp(path) == stamp:
                 continue
-            
-            total += 1
-            
-            # Resultado real
-            if ga > gc:
-                real_result = 'home'
-            elif ga < gc:
-                real_result = 'away'
-            else:
-                real_result = 'draw'
-            
-            # Predicción 1X2
-            max_prob = max(prediction['prob_home'], prediction['prob_draw'], prediction['prob_away'])
-            if prediction['prob_home'] == max_prob:
-                predicted_result = 'home'
-            elif prediction['prob_draw'] == max_prob:
-                predicted_result = 'draw'
-            else:
-                predicted_result = 'away'
-            
-            if predicted_result == real_result:
-                correct_1x2 += 1
-            
-            # Doble Oportunidad - tomamos la más probable
-            max_dc = max(prediction['prob_1x'], prediction['prob_12'], prediction['prob_x2'])
-            if prediction['prob_1x'] == max_dc and real_result in ['home', 'draw']:
-                correct_double_chance += 1
-            elif prediction['prob_12'] == max_dc and real_result in ['home', 'away']:
-                correct_double_chance += 1
-            elif prediction['prob_x2'] == max_dc and real_result in ['draw', 'away']:
-                correct_double_chance += 1
-            
-            # Over/Under 2.5
-            total_goals = ga + gc
-            predicted_over = prediction['prob_over_25'] > prediction['prob_under_25']
-            real_over = total_goals > 2.5
-            
-            if predicted_over == real_over:
-                correct_over_25 += 1
-            
-            # BTTS
-            predicted_btts = prediction['prob_btts_yes'] > prediction['prob_btts_no']
-            real_btts = ga > 0 and gc > 0
-            
-            if predicted_btts == real_btts:
-                correct_btts += 1
-        
-        if total == 0:
-            return None
-        
-        return {
-            'total_predictions': total,
-            'accuracy_1x2': round(correct_1x2 / total * 100, 2),
-            'accuracy_over_25': round(correct_over_25 / total * 100, 2),
-            'accuracy_btts': round(correct_btts / total * 100, 2),
-            'accuracy_double_chance': round(correct_double_chance / total * 100, 2)
-        }
+            # Lectura directa de los archivos (sin cachés de Streamlit): se ejecuta en el hilo de fondo
+            if frame is None:
+                frame = load_leagues({nombre: archivo for nombre, archivo, _ in versions})
+            write_store(build_prediction_table(MODELOS[modelo](frame, half_life=half_life)), path, stamp)
 
-def update_league_data():
-    """Actualiza los datos de las ligas desde internet"""
-    try:
-        with st.spinner("🔄 Actualizando datos de las ligas desde internet..."):
-            result = subprocess.run(
-                ["python", "extract_calendar.py"],
-                capture_output=True,
-                text=True,
-                timeout=300  # 5 minutos timeout
-            )
-            
-            if result.returncode == 0:
-                st.success("✅ Datos actualizados correctamente")
-                return True
-            else:
-                st.error(f"❌ Error al actualizar datos: {result.stderr}")
-                return False
-    except subprocess.TimeoutExpired:
-        st.error("⏱️ Timeout: La actualización tomó demasiado tiempo")
-        return False
-    except Exception as e:
-        st.error(f"❌ Error inesperado: {str(e)}")
-        return False
+@st.cache_data(show_spinner=False, max_entries=16)
+def load_predictions(versions, modelo=DEFAULT_MODELO, half_life=None):
+    """Pronósticos de todos los partidos pendientes: lectura del almacén si su sello coincide, si no se calculan y se guardan"""
+    stamp = data_stamp(versions, modelo, half_life)
+    path = store_path(modelo, half_life)
+    predictions = read_store(path, stamp)
+    if predictions is None:
+        predictions = build_prediction_table(build_unified_predictor(versions, modelo, half_life))
+        write_store(predictions, path, stamp)
+    return predictions
 
-def load_league_data():
-    """Carga los datos de todas las ligas"""
-    ligas = {
-        "Premier League": "calendario_premier_league.csv",
-        "La Liga": "calendario_la_liga.csv",
-        "La Liga 2": "calendario_la_liga_2.csv",
-        "Serie A": "calendario_serie_a.csv",
-        "Bundesliga": "calendario_bundesliga.csv",
-        "Ligue 1": "calendario_ligue_1.csv"
-    }
+def get_predictions(league_name=None):
+    """Tabla de pronósticos (todas las ligas, o solo `league_name`) del modelo y vida media elegidos"""
+    predictions = load_predictions(league_versions(), selected_model(), selected_half_life())
+    if league_name is None:
+        return predictions
+    return predictions.filter(pl.col("Liga") == league_name)
+
+def load_league_data(unified=False):
+    """Carga los datos de todas las ligas (dict por liga, o un único frame con columna Liga)"""
+    if unified:
+        return unified_league_frame(league_versions())
     
     data = {}
-    for nombre, archivo in ligas.items():
-        if os.path.exists(archivo):
-            data[nombre] = pl.read_csv(archivo)
+    for nombre, archivo, version in league_versions():
+        data[nombre] = read_league_file(archivo, version)
     
     return data
 
+def format_hora(hora):
+    """Hora del partido como HH:MM (la columna Hora puede venir tipada como Time)"""
+    if hasattr(hora, "strftime"):
+        return hora.strftime("%H:%M")
+    return hora
+
+def summary_metric(summary, label, key, suffix=""):
+    """Métrica con el conteo del resumen de liga y su porcentaje"""
+    st.metric(label, f"{summary[key]}{suffix} ({summary['pct_' + key]:.1f}%)")
+
 def get_prob_color(prob):
     """Retorna clase CSS según probabilidad"""
     if prob >= 50:
@@ -386,17 +437,31 @@ def main():
     # Sidebar
     st.sidebar.title("🎯 Configuración")
     
-    # Botón para actualizar datos
-    if st.sidebar.button("🔄 Actualizar Datos desde Internet", type="primary"):
-        if update_league_data():
-            st.rerun()
+    # Botón para actualizar datos (en segundo plano; la app sigue respondiendo mientras tanto)
+    refresh = data_refresh()
+    if st.sidebar.button("🔄 Actualizar Datos desde Internet", type="primary", disabled=refresh.running):
+        if not refresh.start():
+            st.sidebar.warning("⏳ Ya hay una actualización en curso")
+    with st.sidebar:
+        st.fragment(show_refresh_progress, run_every=1 if refresh.running else None)(refresh)
     
-    # Mostrar última actualización
-    csv_files = ["calendario_premier_league.csv", "calendario_la_liga.csv", 
-                 "calendario_la_liga_2.csv", "calendario_serie_a.csv", 
-                 "calendario_bundesliga.csv", "calendario_ligue_1.csv"]
+    # Actualización automática: solo consulta las ligas con partidos recién terminados
+    scheduler = refresh_scheduler()
+    auto_refresh = st.sidebar.toggle(
+        "⏱️ Actualización automática", value=scheduler.running,
+        help="Consulta cada liga cuando termina uno de sus partidos (inicio + 2 h) y espera en los días sin partidos"
+    )
+    if auto_refresh and not scheduler.running:
+        scheduler.start()
+    elif not auto_refresh and scheduler.running:
+        scheduler.stop()
+    if auto_refresh and scheduler.next_run is not None:
+        # next_run está en UTC; se muestra en la hora local
+        next_run = scheduler.next_run.replace(tzinfo=timezone.utc).astimezone()
+        st.sidebar.caption(f"Próxima comprobación: {next_run:%d/%m %H:%M}")
     
-    existing_files = [f for f in csv_files if os.path.exists(f)]
+    # Mostrar última actualización
+    existing_files = [f for f in LIGAS.values() if os.path.exists(f)]
     if existing_files:
         last_modified = max([os.path.getmtime(f) for f in existing_files])
         last_update = datetime.fromtimestamp(last_modified).strftime("%Y-%m-%d %H:%M:%S")
@@ -410,29 +475,33 @@ def main():
         st.info("👆 Haz clic en 'Actualizar Datos desde Internet' para descargar los datos de las ligas")
         return
     
+    # Modelo de pronóstico
+    st.sidebar.selectbox("Modelo", list(MODELOS), key="modelo")
+    st.sidebar.selectbox(
+        "Decaimiento temporal (vida media)", list(VIDAS_MEDIAS), key="vida_media",
+        help="Peso de cada partido: 0.5 ^ (días desde el último resultado / vida media)"
+    )
+    
     # Mostrar precisión de pronósticos
     st.sidebar.markdown("---")
     st.sidebar.subheader("🎯 Precisión del Modelo")
     
     with st.sidebar.expander("Ver tasas de acierto por liga"):
-        for league_name, df in league_data.items():
-            predictor = PoissonPredictor(df)
-            accuracy = predictor.calculate_accuracy()
-            
-            if accuracy:
-                st.markdown(f"**{league_name}**")
-                st.markdown(f"- 1X2: {accuracy['accuracy_1x2']}%")
-                st.markdown(f"- Over 2.5: {accuracy['accuracy_over_25']}%")
-                st.markdown(f"- BTTS: {accuracy['accuracy_btts']}%")
-                st.markdown(f"- Doble Oportunidad: {accuracy['accuracy_double_chance']}%")
-                st.markdown(f"*Basado en {accuracy['total_predictions']} predicciones*")
-                st.markdown("---")
+        for accuracy in get_accuracy_table().iter_rows(named=True):
+            st.markdown(f"**{accuracy['Liga']}**")
+            st.markdown(f"- 1X2: {accuracy['accuracy_1x2']}%")
+            st.markdown(f"- Over 2.5: {accuracy['accuracy_over_25']}%")
+            st.markdown(f"- BTTS: {accuracy['accuracy_btts']}%")
+            st.markdown(f"- Doble Oportunidad: {accuracy['accuracy_double_chance']}%")
+            st.markdown(f"*Basado en {accuracy['total_predictions']} predicciones*")
+            st.markdown("---")
     
     # Selector de vista
     view_mode = st.sidebar.radio(
         "Modo de visualización",
         ["📊 Pronósticos por Liga", "📅 Pronósticos por Fecha", "🎯 Liga + Fecha", 
-         "📈 Estadísticas por Liga", "🔍 Resultados vs Pronósticos", "📊 Precisión del Modelo"]
+         "📈 Estadísticas por Liga", "🔍 Resultados vs Pronósticos", "📊 Precisión del Modelo",
+         "📋 Tabla de Posiciones", "🏆 Simulación de Temporada"]
     )
     
     if view_mode == "📊 Pronósticos por Liga":
@@ -442,27 +511,21 @@ def main():
             list(league_data.keys())
         )
         
-        df = league_data[selected_league]
-        predictor = PoissonPredictor(df)
-        upcoming = predictor.get_upcoming_matches()
+        summary = get_league_summary(selected_league)
         
         st.header(f"🏆 {selected_league}")
         
         # Estadísticas generales
-        played = predictor.played_matches
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            st.metric("Partidos Jugados", len(played))
+            st.metric("Partidos Jugados", summary["played"])
         with col2:
-            st.metric("Partidos por Jugar", len(upcoming))
+            st.metric("Partidos por Jugar", summary["upcoming"])
         with col3:
-            avg_goals = (played["GA"] + played["GC"]).mean() if len(played) > 0 else 0
-            st.metric("Goles Promedio", f"{avg_goals:.2f}")
+            st.metric("Goles Promedio", f"{summary['average_goals']:.2f}")
         with col4:
-            total_matches = len(df)
-            progress = (len(played) / total_matches * 100) if total_matches > 0 else 0
-            st.metric("Progreso", f"{progress:.1f}%")
+            st.metric("Progreso", f"{summary['progress']:.1f}%")
         
         st.markdown("---")
         
@@ -475,26 +538,12 @@ def main():
         
         st.subheader("🔮 Próximos Partidos")
         
-        # Procesar cada partido
-        predictions = []
-        for row in upcoming.iter_rows(named=True):
-            home = row['Local']
-            away = row['Visita']
-            fecha = row['Fecha']
-            hora = row['Hora']
-            
-            prediction = predictor.predict_match(home, away)
-            if prediction:
-                prediction['fecha'] = fecha
-                prediction['hora'] = hora
-                predictions.append(prediction)
-        
-        # Ordenar por fecha
-        predictions.sort(key=lambda x: (x['fecha'] or '9999', x['hora'] or '99:99'))
+        # Pronósticos precalculados de la liga, ordenados por fecha
+        predictions = get_predictions(selected_league).sort(["Fecha", "Hora"], nulls_last=True)
         
         # Mostrar predicciones
         count = 0
-        for pred in predictions:
+        for pred in predictions.iter_rows(named=True):
             max_prob = max(pred['prob_home'], pred['prob_draw'], pred['prob_away'])
             
             if not show_all and max_prob < min_prob:
@@ -505,7 +554,7 @@ def main():
             with st.container():
                 st.markdown(f"""
                 <div class="match-card">
-                    <h4>📅 {pred['fecha']} - ⏰ {pred['hora']}</h4>
+                    <h4>📅 {pred['Fecha']} - ⏰ {format_hora(pred['Hora'])}</h4>
                     <h3>{pred['home_team']} 🆚 {pred['away_team']}</h3>
                 </div>
                 """, unsafe_allow_html=True)
@@ -575,6 +624,7 @@ def main():
                         with cols[idx]:
                             st.markdown(f"**{score_data['score']}**")
                             st.markdown(f"<span class='{get_prob_color(score_data['prob'])}'>{score_data['prob']}%</span>", unsafe_allow_html=True)
+                    st.caption(f"Marcadores hasta {pred['max_goals']} goles por equipo; probabilidad fuera de la matriz: {pred['tail_mass'] * 100:.4f}%")
                 
                 # Expandir para ver estadísticas
                 with st.expander("📈 Ver estadísticas de equipos"):
@@ -604,14 +654,9 @@ def main():
     elif view_mode == "📅 Pronósticos por Fecha":
         st.header("📅 Pronósticos por Fecha")
         
-        # Recopilar todas las fechas
-        all_dates = set()
-        for df in league_data.values():
-            upcoming = df.filter(pl.col("GA").is_null())
-            dates = upcoming["Fecha"].unique().to_list()
-            all_dates.update([d for d in dates if d])
-        
-        all_dates = sorted(list(all_dates))
+        # Recopilar todas las fechas (frame unificado de todas las ligas)
+        upcoming = load_league_data(unified=True).filter(pl.col("GA").is_null())
+        all_dates = upcoming["Fecha"].drop_nulls().unique().sort().to_list()
         
         if not all_dates:
             st.warning("No hay fechas futuras disponibles.")
@@ -622,47 +667,25 @@ def main():
         
         st.subheader(f"🗓️ Partidos del {selected_date}")
         
-        # Recopilar todos los partidos de esa fecha
-        all_predictions = []
-        
-        for league_name, df in league_data.items():
-            predictor = PoissonPredictor(df)
-            upcoming = predictor.get_upcoming_matches()
-            date_matches = upcoming.filter(pl.col("Fecha") == selected_date)
-            
-            for row in date_matches.iter_rows(named=True):
-                home = row['Local']
-                away = row['Visita']
-                hora = row['Hora']
-                
-                prediction = predictor.predict_match(home, away)
-                if prediction:
-                    prediction['liga'] = league_name
-                    prediction['hora'] = hora
-                    all_predictions.append(prediction)
-        
-        # Ordenar por hora
-        all_predictions.sort(key=lambda x: x['hora'] or '99:99')
+        # Todos los partidos de esa fecha con probabilidad 1X2 suficiente: una sola consulta multi-liga
+        date_predictions = (
+            get_predictions()
+            .lazy()
+            .filter(pl.col("Fecha") == selected_date)
+            .filter(pl.max_horizontal("prob_home", "prob_draw", "prob_away") >= min_prob)
+            .sort(["Liga", "Hora"], nulls_last=True)
+            .collect()
+        )
         
         # Mostrar por liga
-        for league_name in league_data.keys():
-            league_preds = [p for p in all_predictions if p['liga'] == league_name]
-            
-            if not league_preds:
-                continue
-            
+        for (league_name,), league_preds in date_predictions.group_by("Liga", maintain_order=True):
             st.markdown(f"### 🏆 {league_name}")
             
-            for pred in league_preds:
-                max_prob = max(pred['prob_home'], pred['prob_draw'], pred['prob_away'])
-                
-                if max_prob < min_prob:
-                    continue
-                
+            for pred in league_preds.iter_rows(named=True):
                 with st.container():
                     st.markdown(f"""
                     <div class="match-card">
-                        <h4>⏰ {pred['hora']}</h4>
+                        <h4>⏰ {format_hora(pred['Hora'])}</h4>
                         <h3>{pred['home_team']} 🆚 {pred['away_team']}</h3>
                     </div>
                     """, unsafe_allow_html=True)
@@ -737,8 +760,8 @@ def main():
         )
         
         df = league_data[selected_league]
-        predictor = PoissonPredictor(df)
-        upcoming = predictor.get_upcoming_matches()
+        summary = get_league_summary(selected_league)
+        upcoming = df.filter(pl.col("GA").is_null())
         
         # Obtener fechas disponibles de esta liga
         available_dates = upcoming["Fecha"].unique().to_list()
@@ -754,73 +777,54 @@ def main():
         st.subheader(f"🏆 {selected_league} - 📅 {selected_date}")
         
         # Estadísticas de la liga
-        played = predictor.played_matches
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            st.metric("Partidos Jugados", len(played))
+            st.metric("Partidos Jugados", summary["played"])
         with col2:
-            st.metric("Por Jugar", len(upcoming))
+            st.metric("Por Jugar", summary["upcoming"])
         with col3:
-            avg_goals = (played["GA"] + played["GC"]).mean() if len(played) > 0 else 0
-            st.metric("Goles Promedio", f"{avg_goals:.2f}")
+            st.metric("Goles Promedio", f"{summary['average_goals']:.2f}")
         with col4:
             date_matches = upcoming.filter(pl.col("Fecha") == selected_date)
             st.metric("Partidos en esta fecha", len(date_matches))
         
         st.markdown("---")
         
-        # Filtrar partidos de la fecha seleccionada
-        date_matches = upcoming.filter(pl.col("Fecha") == selected_date)
-        
-        # Procesar predicciones
-        predictions = []
-        for row in date_matches.iter_rows(named=True):
-            home = row['Local']
-            away = row['Visita']
-            hora = row['Hora']
-            jornada = row['Jornada']
-            
-            prediction = predictor.predict_match(home, away)
-            if prediction:
-                prediction['hora'] = hora
-                prediction['jornada'] = jornada
-                predictions.append(prediction)
-        
-        # Ordenar por hora
-        predictions.sort(key=lambda x: x['hora'] or '99:99')
+        # Pronósticos precalculados de la fecha seleccionada, ordenados por hora
+        max_prob = pl.max_horizontal("prob_home", "prob_draw", "prob_away")
+        date_predictions = get_predictions(selected_league).filter(pl.col("Fecha") == selected_date)
+        predictions = date_predictions.sort("Hora", nulls_last=True).with_columns(
+            max_prob.alias("max_prob"),
+            pl.when(pl.col("prob_home") == max_prob).then(pl.lit("Local"))
+            .when(pl.col("prob_draw") == max_prob).then(pl.lit("Empate"))
+            .otherwise(pl.lit("Visitante"))
+            .alias("best_outcome"),
+        )
         
-        if not predictions:
+        if predictions.is_empty():
             st.info("No hay partidos con suficientes datos históricos para esta fecha.")
             return
         
         # Mostrar jornada si existe
-        if predictions and predictions[0].get('jornada'):
-            st.markdown(f"### 📋 {predictions[0]['jornada']}")
+        if predictions["Jornada"][0]:
+            st.markdown(f"### 📋 {predictions['Jornada'][0]}")
         
         # Resumen de mejores oportunidades
         st.markdown("### ⭐ Mejores Oportunidades del Día")
         
-        best_predictions = []
-        for pred in predictions:
-            max_prob = max(pred['prob_home'], pred['prob_draw'], pred['prob_away'])
-            pred['max_prob'] = max_prob
-            pred['best_outcome'] = 'Local' if pred['prob_home'] == max_prob else ('Empate' if pred['prob_draw'] == max_prob else 'Visitante')
-            if max_prob >= min_prob:
-                best_predictions.append(pred)
-        
-        best_predictions.sort(key=lambda x: x['max_prob'], reverse=True)
+        best_predictions = predictions.filter(pl.col("max_prob") >= min_prob).sort("max_prob", descending=True).head(3)
         
-        if best_predictions[:3]:
+        if not best_predictions.is_empty():
             col1, col2, col3 = st.columns(3)
             
-            for idx, (col, pred) in enumerate(zip([col1, col2, col3], best_predictions[:3])):
+            for idx, (col, pred) in enumerate(zip([col1, col2, col3], best_predictions.iter_rows(named=True))):
                 with col:
                     st.markdown(f"""
                     <div class="match-card" style="background: linear-gradient(135deg, #0f766e 0%, #115e59 100%);">
                         <h4>🥇 TOP {idx + 1}</h4>
                         <h5>{pred['home_team']} vs {pred['away_team']}</h5>
-                        <p>⏰ {pred['hora']}</p>
+                        <p>⏰ {format_hora(pred['Hora'])}</p>
                         <h3>{pred['best_outcome']}: {pred['max_prob']:.1f}%</h3>
                         <p>Resultado probable: {pred['most_likely_score']}</p>
                     </div>
@@ -831,7 +835,7 @@ def main():
         
         # Mostrar todas las predicciones
         count = 0
-        for pred in predictions:
+        for pred in predictions.iter_rows(named=True):
             if pred['max_prob'] < min_prob:
                 continue
             
@@ -840,7 +844,7 @@ def main():
             with st.container():
                 st.markdown(f"""
                 <div class="match-card">
-                    <h4>⏰ {pred['hora']}</h4>
+                    <h4>⏰ {format_hora(pred['Hora'])}</h4>
                     <h3>{pred['home_team']} 🆚 {pred['away_team']}</h3>
                 </div>
                 """, unsafe_allow_html=True)
@@ -938,10 +942,10 @@ def main():
             list(league_data.keys())
         )
         
-        df = league_data[selected_league]
-        predictor = PoissonPredictor(df)
-        played = predictor.played_matches
-        upcoming = predictor.get_upcoming_matches()
+        predictor = get_predictor(selected_league)
+        statistics = get_statistics(selected_league)
+        summary = get_league_summary(selected_league)
+        played_count = summary["played"]
         
         st.markdown(f"## 🏆 {selected_league}")
         
@@ -949,16 +953,13 @@ def main():
         col1, col2, col3, col4, col5 = st.columns(5)
         
         with col1:
-            st.metric("📊 Partidos Jugados", len(played))
+            st.metric("📊 Partidos Jugados", played_count)
         with col2:
-            st.metric("🔮 Por Jugar", len(upcoming))
+            st.metric("🔮 Por Jugar", summary["upcoming"])
         with col3:
-            total = len(df)
-            progress = (len(played) / total * 100) if total > 0 else 0
-            st.metric("📈 Progreso", f"{progress:.1f}%")
+            st.metric("📈 Progreso", f"{summary['progress']:.1f}%")
         with col4:
-            avg_goals = (played["GA"] + played["GC"]).mean() if len(played) > 0 else 0
-            st.metric("⚽ Goles/Partido", f"{avg_goals:.2f}")
+            st.metric("⚽ Goles/Partido", f"{summary['average_goals']:.2f}")
         with col5:
             league_avg = predictor.calculate_league_average()
             st.metric("🎯 Promedio Liga", f"{league_avg:.2f}")
@@ -971,171 +972,93 @@ def main():
         with tab1:
             st.subheader("Análisis Local vs Visitante")
             
-            home_matches = played.filter(pl.col("GA").is_not_null())
-            
-            if len(home_matches) > 0:
+            if played_count > 0:
                 col1, col2 = st.columns(2)
                 
                 with col1:
                     st.markdown("### 🏠 Equipos Locales")
-                    home_wins = len(home_matches.filter(pl.col("GA") > pl.col("GC")))
-                    home_draws = len(home_matches.filter(pl.col("GA") == pl.col("GC")))
-                    home_losses = len(home_matches.filter(pl.col("GA") < pl.col("GC")))
-                    
-                    st.metric("Victorias", f"{home_wins} ({home_wins/len(home_matches)*100:.1f}%)")
-                    st.metric("Empates", f"{home_draws} ({home_draws/len(home_matches)*100:.1f}%)")
-                    st.metric("Derrotas", f"{home_losses} ({home_losses/len(home_matches)*100:.1f}%)")
-                    
-                    home_goals = home_matches["GA"].sum()
-                    st.metric("Goles Anotados", f"{home_goals} ({home_goals/len(home_matches):.2f}/partido)")
+                    summary_metric(summary, "Victorias", "home_wins")
+                    summary_metric(summary, "Empates", "draws")
+                    summary_metric(summary, "Derrotas", "away_wins")
                     
-                    home_conceded = home_matches["GC"].sum()
-                    st.metric("Goles Recibidos", f"{home_conceded} ({home_conceded/len(home_matches):.2f}/partido)")
+                    st.metric("Goles Anotados", f"{summary['home_goals']} ({summary['home_goals_avg']:.2f}/partido)")
+                    st.metric("Goles Recibidos", f"{summary['away_goals']} ({summary['away_goals_avg']:.2f}/partido)")
                 
                 with col2:
                     st.markdown("### ✈️ Equipos Visitantes")
-                    away_wins = len(home_matches.filter(pl.col("GC") > pl.col("GA")))
-                    away_draws = home_draws
-                    away_losses = home_wins
-                    
-                    st.metric("Victorias", f"{away_wins} ({away_wins/len(home_matches)*100:.1f}%)")
-                    st.metric("Empates", f"{away_draws} ({away_draws/len(home_matches)*100:.1f}%)")
-                    st.metric("Derrotas", f"{away_losses} ({away_losses/len(home_matches)*100:.1f}%)")
-                    
-                    away_goals = home_matches["GC"].sum()
-                    st.metric("Goles Anotados", f"{away_goals} ({away_goals/len(home_matches):.2f}/partido)")
+                    summary_metric(summary, "Victorias", "away_wins")
+                    summary_metric(summary, "Empates", "draws")
+                    summary_metric(summary, "Derrotas", "home_wins")
                     
-                    away_conceded = home_matches["GA"].sum()
-                    st.metric("Goles Recibidos", f"{away_conceded} ({away_conceded/len(home_matches):.2f}/partido)")
+                    st.metric("Goles Anotados", f"{summary['away_goals']} ({summary['away_goals_avg']:.2f}/partido)")
+                    st.metric("Goles Recibidos", f"{summary['home_goals']} ({summary['home_goals_avg']:.2f}/partido)")
         
         with tab2:
             st.subheader("⚽ Estadísticas de Goles")
             
-            if len(played) > 0:
+            if played_count > 0:
                 col1, col2, col3 = st.columns(3)
                 
                 with col1:
                     st.markdown("### 📊 Distribución Total")
-                    total_goals = played["GA"] + played["GC"]
-                    
-                    goals_0 = len(played.filter(total_goals == 0))
-                    goals_1 = len(played.filter(total_goals == 1))
-                    goals_2 = len(played.filter(total_goals == 2))
-                    goals_3 = len(played.filter(total_goals == 3))
-                    goals_4 = len(played.filter(total_goals == 4))
-                    goals_5plus = len(played.filter(total_goals >= 5))
-                    
-                    st.metric("0 goles", f"{goals_0} ({goals_0/len(played)*100:.1f}%)")
-                    st.metric("1 gol", f"{goals_1} ({goals_1/len(played)*100:.1f}%)")
-                    st.metric("2 goles", f"{goals_2} ({goals_2/len(played)*100:.1f}%)")
-                    st.metric("3 goles", f"{goals_3} ({goals_3/len(played)*100:.1f}%)")
-                    st.metric("4 goles", f"{goals_4} ({goals_4/len(played)*100:.1f}%)")
-                    st.metric("5+ goles", f"{goals_5plus} ({goals_5plus/len(played)*100:.1f}%)")
+                    for goals in range(EXACT_GOALS_MAX):
+                        summary_metric(summary, f"{goals} {'gol' if goals == 1 else 'goles'}", f"exact_{goals}")
+                    summary_metric(summary, f"{EXACT_GOALS_MAX}+ goles", f"exact_{EXACT_GOALS_MAX}_plus")
                 
                 with col2:
                     st.markdown("### 📈 Over/Under")
                     
-                    over_05 = len(played.filter(total_goals > 0.5))
-                    over_15 = len(played.filter(total_goals > 1.5))
-                    over_25 = len(played.filter(total_goals > 2.5))
-                    over_35 = len(played.filter(total_goals > 3.5))
-                    over_45 = len(played.filter(total_goals > 4.5))
-                    
-                    under_05 = len(played) - over_05
-                    under_15 = len(played) - over_15
-                    under_25 = len(played) - over_25
-                    under_35 = len(played) - over_35
-                    under_45 = len(played) - over_45
-                    
-                    st.metric("Over 0.5", f"{over_05} partidos ({over_05/len(played)*100:.1f}%)")
-                    st.metric("Under 0.5", f"{under_05} partidos ({under_05/len(played)*100:.1f}%)")
-                    st.markdown("---")
-                    
-                    st.metric("Over 1.5", f"{over_15} partidos ({over_15/len(played)*100:.1f}%)")
-                    st.metric("Under 1.5", f"{under_15} partidos ({under_15/len(played)*100:.1f}%)")
-                    st.markdown("---")
-                    
-                    st.metric("Over 2.5", f"{over_25} partidos ({over_25/len(played)*100:.1f}%)")
-                    st.metric("Under 2.5", f"{under_25} partidos ({under_25/len(played)*100:.1f}%)")
-                    st.markdown("---")
-                    
-                    st.metric("Over 3.5", f"{over_35} partidos ({over_35/len(played)*100:.1f}%)")
-                    st.metric("Under 3.5", f"{under_35} partidos ({under_35/len(played)*100:.1f}%)")
-                    st.markdown("---")
-                    
-                    st.metric("Over 4.5", f"{over_45} partidos ({over_45/len(played)*100:.1f}%)")
-                    st.metric("Under 4.5", f"{under_45} partidos ({under_45/len(played)*100:.1f}%)")
+                    for index, (line, label) in enumerate(GOAL_LINES):
+                        if index:
+                            st.markdown("---")
+                        summary_metric(summary, f"Over {line}", f"over_{label}", " partidos")
+                        summary_metric(summary, f"Under {line}", f"under_{label}", " partidos")
                 
                 with col3:
                     st.markdown("### 🎯 BTTS & Clean Sheets")
                     
-                    btts_yes = len(played.filter((pl.col("GA") > 0) & (pl.col("GC") > 0)))
-                    btts_no = len(played) - btts_yes
-                    
-                    st.metric("BTTS Sí", f"{btts_yes} ({btts_yes/len(played)*100:.1f}%)")
-                    st.metric("BTTS No", f"{btts_no} ({btts_no/len(played)*100:.1f}%)")
-                    
-                    home_cs = len(played.filter(pl.col("GC") == 0))
-                    away_cs = len(played.filter(pl.col("GA") == 0))
+                    summary_metric(summary, "BTTS Sí", "btts_yes")
+                    summary_metric(summary, "BTTS No", "btts_no")
                     
-                    st.metric("Clean Sheets Local", f"{home_cs} ({home_cs/len(played)*100:.1f}%)")
-                    st.metric("Clean Sheets Visitante", f"{away_cs} ({away_cs/len(played)*100:.1f}%)")
+                    summary_metric(summary, "Clean Sheets Local", "home_clean_sheets")
+                    summary_metric(summary, "Clean Sheets Visitante", "away_clean_sheets")
         
         with tab3:
             st.subheader("📊 Análisis de Mercados")
             
-            if len(played) > 0:
-                total_goals = played["GA"] + played["GC"]
-                
+            if played_count > 0:
                 col1, col2 = st.columns(2)
                 
                 with col1:
                     st.markdown("### 🎲 Resultados 1X2")
                     
-                    home_wins = len(played.filter(pl.col("GA") > pl.col("GC")))
-                    draws = len(played.filter(pl.col("GA") == pl.col("GC")))
-                    away_wins = len(played.filter(pl.col("GA") < pl.col("GC")))
-                    
-                    st.markdown(f"**Victoria Local (1):** {home_wins/len(played)*100:.1f}%")
-                    st.progress(home_wins/len(played))
+                    st.markdown(f"**Victoria Local (1):** {summary['pct_home_wins']:.1f}%")
+                    st.progress(summary["pct_home_wins"] / 100)
                     
-                    st.markdown(f"**Empate (X):** {draws/len(played)*100:.1f}%")
-                    st.progress(draws/len(played))
+                    st.markdown(f"**Empate (X):** {summary['pct_draws']:.1f}%")
+                    st.progress(summary["pct_draws"] / 100)
                     
-                    st.markdown(f"**Victoria Visitante (2):** {away_wins/len(played)*100:.1f}%")
-                    st.progress(away_wins/len(played))
+                    st.markdown(f"**Victoria Visitante (2):** {summary['pct_away_wins']:.1f}%")
+                    st.progress(summary["pct_away_wins"] / 100)
                 
                 with col2:
                     st.markdown("### 📈 Tendencias de Mercado")
                     
                     # Doble Oportunidad
-                    double_1x = home_wins + draws
-                    double_12 = home_wins + away_wins
-                    double_x2 = draws + away_wins
-                    
-                    st.markdown(f"**1X (Local o Empate):** {double_1x/len(played)*100:.1f}%")
-                    st.markdown(f"**12 (Local o Visitante):** {double_12/len(played)*100:.1f}%")
-                    st.markdown(f"**X2 (Empate o Visitante):** {double_x2/len(played)*100:.1f}%")
+                    st.markdown(f"**1X (Local o Empate):** {summary['pct_double_1x']:.1f}%")
+                    st.markdown(f"**12 (Local o Visitante):** {summary['pct_double_12']:.1f}%")
+                    st.markdown(f"**X2 (Empate o Visitante):** {summary['pct_double_x2']:.1f}%")
                     
                     st.markdown("---")
                     
                     # Combinaciones populares
-                    over_25 = len(played.filter(total_goals > 2.5))
-                    btts_yes = len(played.filter((pl.col("GA") > 0) & (pl.col("GC") > 0)))
-                    
-                    st.markdown(f"**Over 2.5 + BTTS:** {len(played.filter((total_goals > 2.5) & (pl.col('GA') > 0) & (pl.col('GC') > 0)))/len(played)*100:.1f}%")
-                    st.markdown(f"**Under 2.5 + BTTS No:** {len(played.filter((total_goals < 2.5) & ((pl.col('GA') == 0) | (pl.col('GC') == 0))))/len(played)*100:.1f}%")
+                    st.markdown(f"**Over 2.5 + BTTS:** {summary['pct_over_25_btts_yes']:.1f}%")
+                    st.markdown(f"**Under 2.5 + BTTS No:** {summary['pct_under_25_btts_no']:.1f}%")
         
         with tab4:
             st.subheader("👥 Estadísticas por Equipo")
             
-            # Obtener todos los equipos
-            teams = set()
-            for row in played.iter_rows(named=True):
-                teams.add(row['Local'])
-                teams.add(row['Visita'])
-            
-            teams = sorted(list(teams))
+            teams = statistics.get_all_teams()
             
             selected_team = st.selectbox("Selecciona un equipo", teams)
             
@@ -1155,7 +1078,7 @@ def main():
                 
                 with col2:
                     st.markdown("### 🏠 Como Local")
-                    team_home = played.filter(pl.col("Local") == selected_team)
+                    team_home = statistics.get_team_home_matches(selected_team)
                     
                     if len(team_home) > 0:
                         home_w = len(team_home.filter(pl.col("GA") > pl.col("GC")))
@@ -1169,7 +1092,7 @@ def main():
                 
                 with col3:
                     st.markdown("### ✈️ Como Visitante")
-                    team_away = played.filter(pl.col("Visita") == selected_team)
+                    team_away = statistics.get_team_away_matches(selected_team)
                     
                     if len(team_away) > 0:
                         away_w = len(team_away.filter(pl.col("GC") > pl.col("GA")))
@@ -1186,9 +1109,7 @@ def main():
                 # Últimos partidos
                 st.markdown("### 📋 Últimos Partidos")
                 
-                team_matches = played.filter(
-                    (pl.col("Local") == selected_team) | (pl.col("Visita") == selected_team)
-                ).sort("Fecha", descending=True).head(10)
+                team_matches = statistics.get_team_matches(selected_team).sort("Fecha", descending=True).head(10)
                 
                 for row in team_matches.iter_rows(named=True):
                     home = row['Local']
@@ -1224,16 +1145,14 @@ def main():
                 # Próximos partidos
                 st.markdown("### 🔮 Próximos Partidos")
                 
-                team_upcoming = upcoming.filter(
-                    (pl.col("Local") == selected_team) | (pl.col("Visita") == selected_team)
-                ).sort("Fecha").head(5)
+                team_upcoming = statistics.get_team_upcoming_matches(selected_team).sort("Fecha").head(5)
                 
                 if len(team_upcoming) > 0:
                     for row in team_upcoming.iter_rows(named=True):
                         home = row['Local']
                         away = row['Visita']
                         fecha = row['Fecha']
-                        hora = row['Hora']
+                        hora = format_hora(row['Hora'])
                         
                         location = "🏠" if home == selected_team else "✈️"
                         st.markdown(f"{location} **{fecha} {hora}** - {home} vs {away}")
@@ -1251,7 +1170,7 @@ def main():
         )
         
         df = league_data[selected_league]
-        predictor = PoissonPredictor(df)
+        predictor = get_predictor(selected_league)
         played = predictor.played_matches
         
         if len(played) == 0:
@@ -1282,19 +1201,16 @@ def main():
         correct_btts = 0
         total_analyzed = 0
         
+        # Pronósticos walk-forward: cada partido se predice solo con resultados anteriores
+        date_predictions = get_league_backtest(selected_league).filter(pl.col("Fecha") == selected_date)
+        
         # Analizar cada partido
-        for row in date_matches.iter_rows(named=True):
-            home = row['Local']
-            away = row['Visita']
-            ga = row['GA']
-            gc = row['GC']
-            hora = row['Hora']
-            
-            # Calcular pronóstico
-            prediction = predictor.predict_match(home, away)
-            
-            if not prediction:
-                continue
+        for prediction in date_predictions.iter_rows(named=True):
+            home = prediction['Local']
+            away = prediction['Visita']
+            ga = prediction['GA']
+            gc = prediction['GC']
+            hora = format_hora(prediction['Hora'])
             
             total_analyzed += 1
             
@@ -1429,22 +1345,15 @@ def main():
         st.header("📊 Precisión del Modelo Poisson")
         st.markdown("### Tasa de aciertos en predicciones de partidos ya jugados")
         
-        # Calcular precisión para todas las ligas
-        accuracy_data = []
-        
-        for league_name, df in league_data.items():
-            predictor = PoissonPredictor(df)
-            accuracy = predictor.calculate_accuracy()
-            
-            if accuracy:
-                accuracy_data.append({
-                    'Liga': league_name,
-                    '1X2': accuracy['accuracy_1x2'],
-                    'Over 2.5': accuracy['accuracy_over_25'],
-                    'BTTS': accuracy['accuracy_btts'],
-                    'Doble Oportunidad': accuracy['accuracy_double_chance'],
-                    'Predicciones': accuracy['total_predictions']
-                })
+        # Precisión de todas las ligas en una sola agregación sobre el backtest unificado
+        accuracy_data = get_accuracy_table().select(
+            pl.col("Liga").cast(pl.Utf8),
+            pl.col("accuracy_1x2").alias("1X2"),
+            pl.col("accuracy_over_25").alias("Over 2.5"),
+            pl.col("accuracy_btts").alias("BTTS"),
+            pl.col("accuracy_double_chance").alias("Doble Oportunidad"),
+            pl.col("total_predictions").alias("Predicciones"),
+        ).to_dicts()
         
         if accuracy_data:
             # Mostrar tabla comparativa
@@ -1526,12 +1435,112 @@ def main():
             st.info("""
             ℹ️ **Nota sobre la precisión:**
             - Los porcentajes se calculan comparando las predicciones del modelo con los resultados reales de partidos ya jugados.
+            - Cada partido se pronostica solo con los resultados disputados antes de su inicio (backtest walk-forward, sin fuga de información).
             - Solo se consideran partidos donde ambos equipos tienen al menos 3 partidos previos para hacer predicciones confiables.
             - Una precisión alta indica que el modelo está prediciendo correctamente los resultados basándose en las estadísticas históricas.
             - La **Doble Oportunidad** generalmente tiene mayor precisión porque cubre dos de tres resultados posibles.
             """)
         else:
             st.warning("No hay suficientes datos para calcular la precisión del modelo.")
+    
+    elif view_mode == "📋 Tabla de Posiciones":
+        st.header("📋 Tabla de Posiciones")
+        
+        selected_league = st.sidebar.selectbox("Selecciona una liga", list(league_data.keys()))
+        standings = get_standings(selected_league)
+        
+        # Clasificación actual o a una jornada / fecha anterior
+        as_of = st.sidebar.radio("Clasificación", ["Actual", "Hasta la jornada", "Hasta la fecha"])
+        rounds = standings.rounds()
+        if as_of == "Hasta la jornada" and rounds:
+            as_of_round = st.sidebar.select_slider("Jornada", options=rounds, value=rounds[-1])
+            table = standings.table(as_of_round=as_of_round)
+            st.subheader(f"🗓️ {selected_league} - Jornada {as_of_round}")
+        elif as_of == "Hasta la fecha":
+            played_dates = standings.timeline_by_date["Fecha"].drop_nulls()
+            as_of_date = st.sidebar.date_input(
+                "Fecha",
+                value=played_dates.max() if len(played_dates) else datetime.now().date(),
+            )
+            table = standings.table(as_of_date=as_of_date)
+            st.subheader(f"🗓️ {selected_league} - Al {as_of_date}")
+        else:
+            table = standings.table()
+            st.subheader(f"🗓️ {selected_league} - Clasificación actual")
+        
+        general_tab, home_tab, away_tab = st.tabs(["General", "Local", "Visitante"])
+        
+        def standings_frame(prefix):
+            return table.select(
+                pl.col("position").alias("#"),
+                pl.col("team").alias("Equipo"),
+                pl.col(f"{prefix}played").alias("PJ"),
+                pl.col(f"{prefix}won").alias("G"),
+                pl.col(f"{prefix}drawn").alias("E"),
+                pl.col(f"{prefix}lost").alias("P"),
+                pl.col(f"{prefix}goals_for").alias("GF"),
+                pl.col(f"{prefix}goals_against").alias("GC"),
+                (pl.col(f"{prefix}goals_for") - pl.col(f"{prefix}goals_against")).alias("DG"),
+                pl.col(f"{prefix}points").alias("Pts"),
+            )
+        
+        with general_tab:
+            st.dataframe(
+                standings_frame("").with_columns(table["form"].alias("Racha")),
+                use_container_width=True,
+                hide_index=True,
+            )
+            st.caption("Racha: últimos 5 resultados (V = victoria, E = empate, D = derrota), el más reciente a la derecha")
+        
+        with home_tab:
+            st.dataframe(
+                standings_frame("home_").sort(["Pts", "DG", "GF"], descending=True),
+                use_container_width=True,
+                hide_index=True,
+            )
+        
+        with away_tab:
+            st.dataframe(
+                standings_frame("away_").sort(["Pts", "DG", "GF"], descending=True),
+                use_container_width=True,
+                hide_index=True,
+            )
+    
+    elif view_mode == "🏆 Simulación de Temporada":
+        st.header("🏆 Simulación de Temporada (Monte Carlo)")
+        
+        selected_league = st.sidebar.selectbox("Selecciona una liga", list(league_data.keys()))
+        n_simulations = st.sidebar.select_slider(
+            "Número de simulaciones", options=[10_000, 25_000, 50_000, 100_000], value=100_000
+        )
+        
+        with st.spinner(f"Simulando {n_simulations:,} temporadas..."):
+            summary, positions = get_season_simulation(selected_league, n_simulations)
+        
+        st.markdown(f"### 📋 {selected_league}: probabilidades de final de temporada")
+        st.dataframe(
+            summary.rename({
+                "team": "Equipo",
+                "points": "Puntos",
+                "expected_points": "Puntos esperados",
+                "expected_position": "Posición media",
+                "prob_title": "Campeón (%)",
+                "prob_top_4": "Top 4 (%)",
+                "prob_relegation": "Descenso (%)",
+            }),
+            use_container_width=True,
+            hide_index=True,
+        )
+        
+        with st.expander("📊 Probabilidad (%) de cada puesto final"):
+            st.dataframe(positions.rename({"team": "Equipo"}), use_container_width=True, hide_index=True)
+        
+        st.info("""
+        ℹ️ **Cómo se calcula:**
+        - Cada partido pendiente se simula con goles de Poisson según los goles esperados del modelo seleccionado.
+        - Desempate: puntos, diferencia de gol, goles a favor y sorteo.
+        - Top 4 y descenso (3 últimos) son zonas genéricas; cada liga tiene su propio reglamento.
+        """)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,97 @@
+import argparse
+import os
+import sys
+from datetime import date
+
+import polars as pl
+
+from calendar_store import LIGAS, league_filename, load_leagues
+from poisson_model import DEFAULT_MARKETS, DEFAULT_MODELO, MODELOS, unknown_markets
+
+# Nombres cortos de los modelos para la línea de comandos
+MODELOS_CLI = {
+    "poisson": "Poisson (promedios)",
+    "dixon-coles": "Dixon-Coles (máxima verosimilitud)",
+}
+FORMATOS = ("csv", "jsonl", "parquet")
+
+def predict_fixtures(ligas=None, desde=None, hasta=None, modelo=DEFAULT_MODELO, half_life=None, markets=None, data_dir="."):
+    """Pronósticos de los partidos pendientes de `ligas` con fecha entre `desde` y `hasta` (ambas incluidas)"""
+    archivos = {
+        nombre: os.path.join(data_dir, league_filename(nombre))
+        for nombre in (ligas or LIGAS)
+        if os.path.exists(os.path.join(data_dir, league_filename(nombre)))
+    }
+    if not archivos:
+        raise FileNotFoundError(f"No hay calendarios de las ligas pedidas en {data_dir}")
+    predictor = MODELOS[modelo](load_leagues(archivos), half_life=half_life)
+    fixtures = predictor.get_upcoming_matches()
+    if desde is not None:
+        fixtures = fixtures.filter(pl.col("Fecha") >= desde)
+    if hasta is not None:
+        fixtures = fixtures.filter(pl.col("Fecha") <= hasta)
+    return predictor.predict_matches(fixtures, markets).sort(["Fecha", "Hora", "Liga"], nulls_last=True)
+
+def flatten_predictions(predictions):
+    """Columnas planas para CSV: hora HH:MM, estadísticas de cada equipo con prefijo y marcadores más probables como texto"""
+    return predictions.with_columns(
+        pl.col("Hora").dt.strftime("%H:%M"),
+        pl.col("top_scores").list.eval(
+            pl.concat_str(pl.element().struct.field("score"), pl.lit(" ("), pl.element().struct.field("prob"), pl.lit("%)"))
+        ).list.join(", "),
+    ).unnest(
+        "home_stats", "away_stats", separator="_"
+    )
+
+def write_predictions(predictions, formato, salida="-"):
+    """Escribe los pronósticos en CSV, JSON Lines o Parquet, en un archivo o en la salida estándar ("-")"""
+    if formato == "csv":
+        predictions = flatten_predictions(predictions)
+    if salida == "-":
+        target = sys.stdout.buffer if formato == "parquet" else sys.stdout
+    else:
+        target = salida
+    if formato == "csv":
+        predictions.write_csv(target)
+    elif formato == "jsonl":
+        predictions.write_ndjson(target)
+    else:
+        predictions.write_parquet(target)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pronósticos de los partidos pendientes sin interfaz gráfica")
+    parser.add_argument("--ligas", nargs="+", choices=list(LIGAS), help="Ligas a pronosticar (por defecto todas)")
+    parser.add_argument("--desde", type=date.fromisoformat, help="Primera fecha (YYYY-MM-DD)")
+    parser.add_argument("--hasta", type=date.fromisoformat, help="Última fecha (YYYY-MM-DD)")
+    parser.add_argument("--modelo", choices=list(MODELOS_CLI), default="poisson")
+    parser.add_argument("--vida-media", type=float, help="Vida media en días del decaimiento temporal")
+    parser.add_argument("--mercados", nargs="+", help=f"Mercados a calcular (por defecto: {', '.join(DEFAULT_MARKETS)})")
+    parser.add_argument("--formato", choices=FORMATOS, help="Formato de salida (por defecto según la extensión, o csv)")
+    parser.add_argument("--salida", default="-", help="Archivo de salida ('-' para la salida estándar)")
+    parser.add_argument("--data-dir", default=".", help="Carpeta de los calendarios")
+    args = parser.parse_args(argv)
+    
+    if args.mercados:
+        unknown = unknown_markets(args.mercados)
+        if unknown:
+            parser.error(f"mercados desconocidos: {', '.join(unknown)} (ejemplos válidos: {', '.join(DEFAULT_MARKETS[:5])})")
+    
+    formato = args.formato
+    if formato is None:
+        extension = os.path.splitext(args.salida)[1].lstrip(".").lower()
+        formato = {"ndjson": "jsonl", "pq": "parquet"}.get(extension, extension)
+        if formato not in FORMATOS:
+            formato = "csv"
+    
+    try:
+        predictions = predict_fixtures(
+            args.ligas, args.desde, args.hasta, MODELOS_CLI[args.modelo], args.vida_media, args.mercados, args.data_dir,
+        )
+    except FileNotFoundError as e:
+        parser.exit(1, f"{e}\n")
+    write_predictions(predictions, formato, args.salida)
+    if args.salida != "-":
+        print(f"{len(predictions)} pronósticos guardados en {args.salida}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
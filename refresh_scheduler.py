@@ -0,0 +1,170 @@
+import argparse
+import os
+import threading
+from datetime import datetime, time, timedelta, timezone
+
+import polars as pl
+
+from extract_calendar import LIGAS, league_filename, load_calendar, update_leagues
+
+# Un partido debería tener resultado a partir de su hora de inicio + MATCH_DURATION
+MATCH_DURATION = timedelta(hours=2)
+# Mientras falte algún resultado esperado, la liga se consulta cada POLL_INTERVAL
+POLL_INTERVAL = timedelta(minutes=15)
+# Pasado este plazo sin resultado el partido se da por aplazado y deja de forzar consultas
+RESULT_WINDOW = timedelta(hours=24)
+# Todas las ligas se refrescan al menos una vez por FULL_REFRESH_INTERVAL (cambios de fecha, horarios nuevos)
+FULL_REFRESH_INTERVAL = timedelta(hours=24)
+# Espera máxima entre comprobaciones en días sin partidos
+MAX_SLEEP = timedelta(hours=12)
+# Una liga que falla se reintenta tras POLL_INTERVAL, duplicando la espera en cada fallo seguido hasta MAX_RETRY_DELAY
+MAX_RETRY_DELAY = timedelta(hours=6)
+# Hora supuesta (UTC) de los partidos sin hora publicada
+DEFAULT_KICKOFF = time(12, 0)
+
+# Fecha/Hora de los calendarios están en UTC (ver CALENDAR_SCHEMA): todos los instantes del
+# planificador son datetimes naive en UTC para compararlos sin depender de la zona del equipo
+def utc_now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def expected_finishes(df):
+    """Momento (UTC) a partir del cual se espera el resultado de cada partido pendiente (inicio + MATCH_DURATION)"""
+    return df.filter(pl.col("GA").is_null() & pl.col("Fecha").is_not_null()).select(
+        (pl.col("Fecha").dt.combine(pl.col("Hora").fill_null(DEFAULT_KICKOFF)) + MATCH_DURATION).alias("finish")
+    )["finish"]
+
+def league_schedule(df, now):
+    """(hay resultados que ya deberían estar publicados, próximo momento en que se espera uno nuevo o None)"""
+    finishes = expected_finishes(df)
+    due = ((finishes <= now) & (finishes > now - RESULT_WINDOW)).any()
+    return bool(due), finishes.filter(finishes > now).min()
+
+def download_leagues(ligas, output_dir="."):
+    """Ejecutor por defecto: descarga las ligas indicadas y devuelve las que fallaron"""
+    results = list(update_leagues(ligas, output_dir=output_dir))
+    return [result["liga"] for result in results if result["status"] == "error"]
+
+def retry_delay(failures):
+    """Espera antes de reintentar una liga tras `failures` fallos seguidos"""
+    return min(POLL_INTERVAL * 2 ** (failures - 1), MAX_RETRY_DELAY)
+
+class RefreshScheduler:
+    """
+    Actualización automática guiada por el calendario: solo consulta las ligas con
+    partidos que ya deberían haber terminado y duerme hasta el siguiente final de
+    partido (como mucho MAX_SLEEP) cuando no hay nada pendiente.
+    """
+    
+    def __init__(self, ligas=None, output_dir=".", runner=None):
+        self.ligas = dict(LIGAS if ligas is None else ligas)
+        self.output_dir = output_dir
+        # runner(ligas) descarga las ligas {nombre: url} y devuelve las que fallaron, o None si no pudo
+        # ejecutarse (otra actualización en curso)
+        self.runner = runner or (lambda ligas: download_leagues(ligas, self.output_dir))
+        self.last_full_refresh = None
+        # Ligas que fallaron: {nombre: (fallos seguidos, momento del próximo reintento)}
+        self.failures = {}
+        self.next_run = None
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def plan(self, now):
+        """(ligas a consultar ya, momento de la siguiente comprobación); `now` y el resultado en UTC naive"""
+        due = []
+        upcoming = [now + MAX_SLEEP]
+        for nombre in self.ligas:
+            path = os.path.join(self.output_dir, league_filename(nombre))
+            if not os.path.exists(path):
+                due.append(nombre)
+                continue
+            league_due, next_finish = league_schedule(load_calendar(path), now)
+            if league_due:
+                due.append(nombre)
+            if next_finish is not None:
+                upcoming.append(next_finish)
+        
+        full_refresh_at = now if self.last_full_refresh is None else self.last_full_refresh + FULL_REFRESH_INTERVAL
+        if full_refresh_at <= now:
+            due = list(self.ligas)
+        else:
+            upcoming.append(full_refresh_at)
+        
+        # Las ligas que fallaron esperan su reintento (con espera creciente) aunque les toque por otro motivo
+        for nombre, (_, retry_at) in self.failures.items():
+            if retry_at <= now:
+                if nombre not in due:
+                    due.append(nombre)
+                continue
+            if nombre in due:
+                due.remove(nombre)
+            upcoming.append(retry_at)
+        if due:
+            upcoming.append(now + POLL_INTERVAL)
+        return due, min(upcoming)
+    
+    def run_once(self, now=None):
+        """Consulta las ligas pendientes y programa la siguiente comprobación; devuelve las ligas consultadas"""
+        now = now or utc_now()
+        full_refresh = self.last_full_refresh is None or self.last_full_refresh + FULL_REFRESH_INTERVAL <= now
+        due, _ = self.plan(now)
+        if due:
+            print(f"[{now:%Y-%m-%d %H:%M} UTC] Actualizando: {', '.join(due)}")
+            failed = self.runner({nombre: self.ligas[nombre] for nombre in due})
+            if failed is not None:
+                # El intento cuenta como refresco completo aunque alguna liga falle: esas se reintentan por separado
+                if full_refresh:
+                    self.last_full_refresh = now
+                for nombre in due:
+                    if nombre in failed:
+                        count = self.failures.get(nombre, (0, None))[0] + 1
+                        self.failures[nombre] = (count, now + retry_delay(count))
+                    else:
+                        self.failures.pop(nombre, None)
+        
+        # Tras la consulta, las ligas que sigan sin resultado vuelven a consultarse en POLL_INTERVAL
+        _, next_run = self.plan(now)
+        self.next_run = max(next_run, now + timedelta(minutes=1))
+        return due
+    
+    def run_forever(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Error en la actualización automática: {e}")
+                self.next_run = utc_now() + POLL_INTERVAL
+            self._stop.wait(max((self.next_run - utc_now()).total_seconds(), 0))
+    
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self):
+        """Arranca el planificador en un hilo de fondo (no hace nada si ya está corriendo)"""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run_forever, name="actualizacion-automatica", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+
+def main():
+    parser = argparse.ArgumentParser(description="Actualiza los calendarios según las horas de los partidos")
+    parser.add_argument("--once", action="store_true", help="Una sola comprobación y salir")
+    parser.add_argument("--output-dir", default=".", help="Carpeta de los CSV de las ligas")
+    args = parser.parse_args()
+    
+    scheduler = RefreshScheduler(output_dir=args.output_dir)
+    if args.once:
+        scheduler.run_once()
+        print(f"Próxima comprobación: {scheduler.next_run:%Y-%m-%d %H:%M} UTC")
+        return
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import numpy as np
+import polars as pl
+from concurrent.futures import ProcessPoolExecutor
+
+from extract_calendar import StandingsCalculator
+
+DEFAULT_SIMULATIONS = 100_000
+CHUNK_SIZE = 20_000
+
+# Zonas de la tabla que se resumen por defecto (puestos de arriba y de descenso)
+TOP_POSITIONS = 4
+RELEGATION_POSITIONS = 3
+
+def poisson_cdf_table(rates, tail=1e-12):
+    """Acumuladas de Poisson (k, partidos) hasta que la cola de todos los partidos queda por debajo de `tail`"""
+    rates = np.asarray(rates, dtype=float)
+    pmf = np.exp(-rates)
+    cdf = [pmf.copy()]
+    k = 0
+    while (1 - cdf[-1]).max(initial=0) > tail and k < 60:
+        k += 1
+        pmf = pmf * rates / k
+        cdf.append(cdf[-1] + pmf)
+    return np.array(cdf)
+
+def sample_poisson(rng, cdf_table, n_simulations):
+    """Muestreo por inversión de la acumulada: una comparación vectorizada por número de goles"""
+    uniforms = rng.random((n_simulations, cdf_table.shape[1]))
+    goals = np.zeros(uniforms.shape, dtype=np.int16)
+    for cdf in cdf_table:
+        goals += uniforms > cdf
+    return goals
+
+def _simulate_chunk(args):
+    """Simula un bloque de temporadas y devuelve (conteo de posiciones por equipo, suma de puntos finales)"""
+    (n_simulations, seed, home_idx, away_idx, home_cdf, away_cdf,
+     base_points, base_goal_diff, base_goals_for) = args
+    rng = np.random.default_rng(seed)
+    n_teams = len(base_points)
+    n_fixtures = len(home_idx)
+    
+    # Goles de todos los partidos restantes de todas las temporadas de una vez
+    home_goals = sample_poisson(rng, home_cdf, n_simulations)
+    away_goals = sample_poisson(rng, away_cdf, n_simulations)
+    
+    # Matrices de incidencia partido -> equipo para acumular por equipo con un producto matricial
+    home_incidence = np.zeros((n_fixtures, n_teams), dtype=np.float32)
+    away_incidence = np.zeros((n_fixtures, n_teams), dtype=np.float32)
+    home_incidence[np.arange(n_fixtures), home_idx] = 1
+    away_incidence[np.arange(n_fixtures), away_idx] = 1
+    
+    # Puntos por signo de la diferencia de goles (derrota, empate, victoria)
+    goal_diff = home_goals - away_goals
+    outcome = np.sign(goal_diff) + 1
+    home_points = np.array([0, 1, 3], dtype=np.float32)[outcome]
+    away_points = np.array([3, 1, 0], dtype=np.float32)[outcome]
+    goal_diff = goal_diff.astype(np.float32)
+    
+    points = base_points + home_points @ home_incidence + away_points @ away_incidence
+    goal_diff = base_goal_diff + goal_diff @ home_incidence - goal_diff @ away_incidence
+    goals_for = base_goals_for + home_goals.astype(np.float32) @ home_incidence + away_goals.astype(np.float32) @ away_incidence
+    
+    # Desempate: puntos, diferencia de gol, goles a favor y, si persiste, sorteo
+    key = (
+        points.astype(np.int64) * 2 ** 24
+        + (goal_diff.astype(np.int64) + 2 ** 11) * 2 ** 12
+        + np.minimum(goals_for.astype(np.int64), 2 ** 12 - 1)
+    ) * 2 ** 8 + rng.integers(0, 2 ** 8, size=points.shape)
+    order = np.argsort(-key, axis=1)
+    positions = np.empty_like(order)
+    np.put_along_axis(positions, order, np.arange(n_teams)[None, :], axis=1)
+    
+    counts = np.bincount(
+        (np.arange(n_teams)[None, :] * n_teams + positions).ravel(),
+        minlength=n_teams * n_teams,
+    ).reshape(n_teams, n_teams)
+    return counts, points.sum(axis=0, dtype=np.float64)
+
+class SeasonSimulator:
+    """Simulación Monte Carlo del resto de una temporada a partir de los goles esperados de cada partido"""
+    
+    def __init__(self, teams, base_points, base_goal_diff, base_goals_for, home_idx, away_idx, home_rates, away_rates):
+        self.teams = list(teams)
+        self.base_points = np.asarray(base_points, dtype=np.float32)
+        self.base_goal_diff = np.asarray(base_goal_diff, dtype=np.float32)
+        self.base_goals_for = np.asarray(base_goals_for, dtype=np.float32)
+        self.home_idx = np.asarray(home_idx, dtype=np.int64)
+        self.away_idx = np.asarray(away_idx, dtype=np.int64)
+        self.home_rates = np.asarray(home_rates, dtype=float)
+        self.away_rates = np.asarray(away_rates, dtype=float)
+    
+    @classmethod
+    def from_fixtures(cls, played, fixtures, table=None):
+        """Construye el simulador desde los partidos jugados, los restantes (Local, Visita, home_rate, away_rate) y la tabla actual"""
+        teams = sorted(
+            set(played["Local"].cast(pl.Utf8).to_list()) | set(played["Visita"].cast(pl.Utf8).to_list())
+            | set(fixtures["Local"].cast(pl.Utf8).to_list()) | set(fixtures["Visita"].cast(pl.Utf8).to_list())
+        )
+        index = {team: idx for idx, team in enumerate(teams)}
+        if table is None:
+            table = StandingsCalculator(played).table()
+        table = pl.DataFrame({"team": teams}).join(
+            table.select(pl.col("team").cast(pl.Utf8), "points", "goal_diff", "goals_for"),
+            on="team", how="left", maintain_order="left",
+        ).fill_null(0)
+        return cls(
+            teams,
+            table["points"].to_numpy(),
+            table["goal_diff"].to_numpy(),
+            table["goals_for"].to_numpy(),
+            fixtures["Local"].cast(pl.Utf8).replace_strict(index, return_dtype=pl.Int64).to_numpy(),
+            fixtures["Visita"].cast(pl.Utf8).replace_strict(index, return_dtype=pl.Int64).to_numpy(),
+            fixtures["home_rate"].to_numpy(),
+            fixtures["away_rate"].to_numpy(),
+        )
+    
+    def run(self, n_simulations=DEFAULT_SIMULATIONS, seed=None, workers=1, chunk_size=CHUNK_SIZE):
+        """Simula `n_simulations` temporadas (en bloques, opcionalmente repartidos en `workers` procesos)"""
+        sizes = [chunk_size] * (n_simulations // chunk_size)
+        if n_simulations % chunk_size:
+            sizes.append(n_simulations % chunk_size)
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+        home_cdf = poisson_cdf_table(self.home_rates)
+        away_cdf = poisson_cdf_table(self.away_rates)
+        chunks = [
+            (size, chunk_seed, self.home_idx, self.away_idx, home_cdf, away_cdf,
+             self.base_points, self.base_goal_diff, self.base_goals_for)
+            for size, chunk_seed in zip(sizes, seeds)
+        ]
+        
+        if workers > 1 and len(chunks) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(_simulate_chunk, chunks))
+        else:
+            results = [_simulate_chunk(chunk) for chunk in chunks]
+        
+        n_teams = len(self.teams)
+        counts = sum((result[0] for result in results), np.zeros((n_teams, n_teams), dtype=np.int64))
+        points = sum((result[1] for result in results), np.zeros(n_teams))
+        return SimulationResult(self.teams, self.base_points, counts / max(n_simulations, 1), points / max(n_simulations, 1))
+
+class SimulationResult:
+    """Probabilidades de posición final por equipo de una simulación de temporada"""
+    
+    def __init__(self, teams, base_points, position_probabilities, expected_points):
+        self.teams = teams
+        self.base_points = base_points
+        self.position_probabilities = position_probabilities
+        self.expected_points = expected_points
+    
+    def summary(self, top=TOP_POSITIONS, relegation=RELEGATION_POSITIONS):
+        """Tabla por equipo: puntos actuales y esperados, posición media y probabilidades de título, top y descenso"""
+        n_teams = len(self.teams)
+        probabilities = self.position_probabilities
+        return pl.DataFrame({
+            "team": self.teams,
+            "points": self.base_points.astype(np.int64),
+            "expected_points": np.round(self.expected_points, 1),
+            "expected_position": np.round(probabilities @ np.arange(1, n_teams + 1), 2),
+            "prob_title": np.round(probabilities[:, 0] * 100, 2),
+            f"prob_top_{top}": np.round(probabilities[:, :top].sum(axis=1) * 100, 2),
+            "prob_relegation": np.round(probabilities[:, n_teams - relegation:].sum(axis=1) * 100, 2),
+        }).sort("expected_position")
+    
+    def position_table(self):
+        """Probabilidad (%) de cada equipo de terminar en cada puesto (columnas 1..n)"""
+        return pl.DataFrame(
+            {"team": self.teams} | {
+                str(position + 1): np.round(self.position_probabilities[:, position] * 100, 2)
+                for position in range(len(self.teams))
+            }
+        )
@@ -0,0 +1,264 @@
+import argparse
+import json
+import os
+from datetime import date, timedelta
+
+import numpy as np
+import polars as pl
+
+from calendar_store import CALENDAR_SCHEMA, LIGAS, league_filename, to_columnar, write_calendar, write_columnar
+from poisson_model import MODELOS, DixonColesPredictor
+
+# Verdad de base por defecto (escala log de Dixon-Coles): ~1.15 goles del visitante medio y ~1.5 del local
+BASE_GOALS = 1.15
+HOME_ADVANTAGE = 0.27
+ATTACK_SD = 0.30
+DEFENSE_SD = 0.25
+# Los equipos que más marcan suelen encajar menos: correlación entre ataque y defensa (defensa alta = encaja más)
+ATTACK_DEFENSE_CORRELATION = -0.5
+RHO = -0.05
+
+# Reparto de los partidos de cada jornada de viernes (0) a lunes (3) y horarios de inicio
+ROUND_DAYS = [0, 1, 2, 3]
+ROUND_DAY_WEIGHTS = [0.1, 0.4, 0.4, 0.1]
+KICKOFF_TIMES = ["13:30", "15:00", "16:15", "18:30", "20:00", "21:00"]
+# Cada temporada empieza el primer viernes desde esta fecha (mes, día)
+SEASON_START = (8, 8)
+
+def round_robin(n_teams):
+    """Emparejamientos (jornada, local, visita) de una doble vuelta por el método del círculo"""
+    teams = list(range(n_teams)) + ([None] if n_teams % 2 else [])
+    size = len(teams)
+    first_leg = []
+    for round_index in range(size - 1):
+        pairs = [(teams[i], teams[size - 1 - i]) for i in range(size // 2)]
+        # Alterna local y visitante para que nadie juegue siempre en casa
+        pairs = [(a, b) if (round_index + i) % 2 == 0 else (b, a) for i, (a, b) in enumerate(pairs)]
+        first_leg.append([(a, b) for a, b in pairs if a is not None and b is not None])
+        teams = [teams[0], teams[-1]] + teams[1:-1]
+    second_leg = [[(b, a) for a, b in pairs] for pairs in first_leg]
+    return np.array(
+        [(round_index, a, b) for round_index, pairs in enumerate(first_leg + second_leg) for a, b in pairs],
+        dtype=np.int64,
+    ).reshape(-1, 3)
+
+def team_names(n_teams, prefix="Equipo"):
+    return [f"{prefix} {index + 1:02d}" for index in range(n_teams)]
+
+def random_truth(teams, rng, base_goals=BASE_GOALS, home_advantage=HOME_ADVANTAGE, attack_sd=ATTACK_SD,
+                 defense_sd=DEFENSE_SD, correlation=ATTACK_DEFENSE_CORRELATION, rho=RHO):
+    """
+    Parámetros verdaderos de una liga con la misma forma que un ajuste de DixonColesPredictor
+    ({"teams", "params": ataques, defensas, ventaja local, intercepto, rho}); ataques y
+    defensas centrados en 0, de modo que exp(intercepto) son los goles del visitante medio.
+    """
+    covariance = [
+        [attack_sd ** 2, correlation * attack_sd * defense_sd],
+        [correlation * attack_sd * defense_sd, defense_sd ** 2],
+    ]
+    strengths = rng.multivariate_normal([0.0, 0.0], covariance, len(teams))
+    strengths -= strengths.mean(axis=0)
+    params = np.concatenate([strengths[:, 0], strengths[:, 1], [home_advantage, np.log(base_goals), rho]])
+    return {"teams": list(teams), "params": params}
+
+def true_rates(truth, home_idx, away_idx):
+    """Goles esperados verdaderos (local, visitante) para índices de equipo de truth["teams"]"""
+    n_teams = len(truth["teams"])
+    attack, defense = truth["params"][:n_teams], truth["params"][n_teams:2 * n_teams]
+    home_advantage, intercept, _ = truth["params"][2 * n_teams:]
+    return (
+        np.exp(intercept + home_advantage + attack[home_idx] + defense[away_idx]),
+        np.exp(intercept + attack[away_idx] + defense[home_idx]),
+    )
+
+def dixon_coles_tau(home_goals, away_goals, home_rate, away_rate, rho):
+    """Corrección tau de Dixon-Coles de cada marcador (1 salvo en 0-0, 0-1, 1-0 y 1-1)"""
+    return np.select(
+        [
+            (home_goals == 0) & (away_goals == 0),
+            (home_goals == 0) & (away_goals == 1),
+            (home_goals == 1) & (away_goals == 0),
+            (home_goals == 1) & (away_goals == 1),
+        ],
+        [1 - home_rate * away_rate * rho, 1 + home_rate * rho, 1 + away_rate * rho, np.full_like(home_rate, 1 - rho)],
+        1.0,
+    )
+
+def sample_scores(home_rate, away_rate, rho, rng):
+    """Goles (local, visitante) de cada partido: Poisson independientes con la corrección tau de marcadores bajos"""
+    home_goals = rng.poisson(home_rate)
+    away_goals = rng.poisson(away_rate)
+    if not rho:
+        return home_goals, away_goals
+    
+    # Muestreo por rechazo: cada marcador se acepta con probabilidad tau / cota de tau y si no se vuelve a sortear
+    pending = np.arange(len(home_rate))
+    while len(pending):
+        home, away = home_rate[pending], away_rate[pending]
+        tau = np.maximum(dixon_coles_tau(home_goals[pending], away_goals[pending], home, away, rho), 0.0)
+        bound = np.maximum.reduce([np.ones_like(home), 1 - home * away * rho, 1 + home * rho, 1 + away * rho, np.full_like(home, 1 - rho)])
+        pending = pending[rng.random(len(pending)) * bound >= tau]
+        home_goals[pending] = rng.poisson(home_rate[pending])
+        away_goals[pending] = rng.poisson(away_rate[pending])
+    return home_goals, away_goals
+
+def season_start(year):
+    """Primer viernes desde SEASON_START del año de inicio de la temporada"""
+    start = date(year, *SEASON_START)
+    return start + timedelta(days=(4 - start.weekday()) % 7)
+
+def generate_seasons(truth, seasons=1, first_year=2025, seed=0, upcoming_rounds=0):
+    """
+    Calendario (CALENDAR_SCHEMA) de `seasons` temporadas consecutivas a doble vuelta desde
+    `first_year`, con goles sorteados de `truth`. Las últimas `upcoming_rounds` jornadas de
+    la última temporada quedan sin resultado. Las jornadas se numeran por temporada, así que
+    MATCH_KEY solo es único dentro de cada una.
+    """
+    rng = np.random.default_rng(seed)
+    teams = truth["teams"]
+    schedule = round_robin(len(teams))
+    n_rounds = int(schedule[:, 0].max()) + 1 if len(schedule) else 0
+    
+    # Cada temporada reparte los equipos en el calendario en un orden distinto
+    order = rng.permuted(np.tile(np.arange(len(teams)), (seasons, 1)), axis=1)
+    home_idx = order[:, schedule[:, 1]].ravel()
+    away_idx = order[:, schedule[:, 2]].ravel()
+    rounds = np.tile(schedule[:, 0], seasons)
+    season = np.repeat(np.arange(seasons), len(schedule))
+    
+    starts = np.array([season_start(first_year + index) for index in range(seasons)], dtype="datetime64[D]")
+    dates = starts[season] + rounds * 7 + rng.choice(ROUND_DAYS, len(rounds), p=ROUND_DAY_WEIGHTS)
+    home_rate, away_rate = true_rates(truth, home_idx, away_idx)
+    home_goals, away_goals = sample_scores(home_rate, away_rate, truth["params"][-1], rng)
+    played = (season < seasons - 1) | (rounds < n_rounds - upcoming_rounds)
+    
+    names = np.array(teams, dtype=object)
+    return pl.DataFrame({
+        "_season": season,
+        "Jornada": rounds + 1,
+        "Fecha": dates,
+        "Hora": rng.choice(KICKOFF_TIMES, len(rounds)),
+        "Local": names[home_idx],
+        "Visita": names[away_idx],
+        "GA": np.where(played, home_goals, -1),
+        "GC": np.where(played, away_goals, -1),
+    }).with_columns(
+        pl.format("{}. Jornada", "Jornada").alias("Jornada"),
+        pl.col("Fecha").dt.strftime("%Y-%m-%d"),
+        pl.col("GA", "GC").replace(-1, None),
+    ).sort(["_season", "Fecha", "Hora"], maintain_order=True).drop("_season").cast(CALENDAR_SCHEMA)
+
+def generate_league(n_teams=20, seasons=1, first_year=2025, seed=0, upcoming_rounds=0, prefix="Equipo", **truth_options):
+    """(calendario, verdad) de una liga sintética; `truth_options` son los argumentos de random_truth"""
+    truth = random_truth(team_names(n_teams, prefix), np.random.default_rng(seed), **truth_options)
+    return generate_seasons(truth, seasons, first_year, seed + 1, upcoming_rounds), truth
+
+def truth_table(truth):
+    """Parámetros verdaderos como dict serializable a JSON"""
+    n_teams = len(truth["teams"])
+    home_advantage, intercept, rho = truth["params"][2 * n_teams:]
+    return {
+        "attack": dict(zip(truth["teams"], truth["params"][:n_teams].tolist())),
+        "defense": dict(zip(truth["teams"], truth["params"][n_teams:2 * n_teams].tolist())),
+        "home_advantage": float(home_advantage),
+        "intercept": float(intercept),
+        "rho": float(rho),
+    }
+
+def parameter_recovery(truth, fit):
+    """
+    Error de un ajuste de Dixon-Coles respecto a la verdad: RMSE y correlación de ataques y
+    defensas (centrados, solo sus diferencias son identificables) y error de ventaja local,
+    intercepto (corregido por el centrado) y rho.
+    """
+    n_true, n_fit = len(truth["teams"]), len(fit["teams"])
+    index = {team: idx for idx, team in enumerate(fit["teams"])}
+    order = np.array([index[team] for team in truth["teams"]])
+    recovery = {}
+    shift = 0.0
+    for name, offset in (("attack", 0), ("defense", 1)):
+        true_values = truth["params"][offset * n_true:(offset + 1) * n_true]
+        fitted = fit["params"][offset * n_fit:(offset + 1) * n_fit][order]
+        shift += fitted.mean() - true_values.mean()
+        true_values, fitted = true_values - true_values.mean(), fitted - fitted.mean()
+        recovery[f"{name}_rmse"] = float(np.sqrt(np.mean((fitted - true_values) ** 2)))
+        recovery[f"{name}_corr"] = float(np.corrcoef(fitted, true_values)[0, 1])
+    for position, name in enumerate(("home_advantage", "intercept", "rho")):
+        error = fit["params"][2 * n_fit + position] - truth["params"][2 * n_true + position]
+        recovery[f"{name}_error"] = float(error + shift if name == "intercept" else error)
+    return recovery
+
+def expected_goals_error(predictor, truth, fixtures):
+    """RMSE de los goles esperados del predictor frente a los verdaderos en `fixtures`"""
+    predictions = predictor.predict_matches(fixtures, markets=[])
+    index = {team: idx for idx, team in enumerate(truth["teams"])}
+    home_idx = np.array([index[team] for team in predictions["Local"].cast(pl.Utf8)], dtype=int)
+    away_idx = np.array([index[team] for team in predictions["Visita"].cast(pl.Utf8)], dtype=int)
+    home_rate, away_rate = true_rates(truth, home_idx, away_idx)
+    errors = np.concatenate([
+        predictions["home_expected_goals"].to_numpy() - home_rate,
+        predictions["away_expected_goals"].to_numpy() - away_rate,
+    ])
+    return float(np.sqrt(np.mean(errors ** 2))) if len(errors) else None
+
+def verify(calendar, truth):
+    """Ajusta los modelos sobre los partidos jugados y mide cuánto se acercan a la verdad"""
+    df = to_columnar(calendar)
+    fixtures = df.filter(pl.col("GA").is_null())
+    if fixtures.is_empty():
+        # Sin jornadas pendientes se evalúan todos los cruces posibles
+        fixtures = pl.DataFrame({
+            "Local": [home for home in truth["teams"] for away in truth["teams"] if home != away],
+            "Visita": [away for home in truth["teams"] for away in truth["teams"] if home != away],
+        })
+    report = {}
+    for modelo, model_class in MODELOS.items():
+        predictor = model_class(df)
+        report[modelo] = {"expected_goals_rmse": expected_goals_error(predictor, truth, fixtures.select("Local", "Visita"))}
+        if isinstance(predictor, DixonColesPredictor):
+            report[modelo].update(parameter_recovery(truth, predictor.fits[None]))
+    return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera calendarios sintéticos con resultados de un Poisson/Dixon-Coles conocido")
+    parser.add_argument("--ligas", nargs="+", choices=list(LIGAS), default=list(LIGAS), help="Ligas a generar (por defecto todas)")
+    parser.add_argument("--equipos", type=int, default=20, help="Equipos por liga")
+    parser.add_argument("--temporadas", type=int, default=1, help="Temporadas por liga")
+    parser.add_argument("--ultima-temporada", type=int, default=date.today().year, help="Año de inicio de la última temporada")
+    parser.add_argument("--jornadas-pendientes", type=int, default=8, help="Jornadas sin jugar al final de la última temporada")
+    parser.add_argument("--goles-base", type=float, default=BASE_GOALS, help="Goles esperados del visitante medio")
+    parser.add_argument("--ventaja-local", type=float, default=HOME_ADVANTAGE, help="Ventaja local (escala log)")
+    parser.add_argument("--dispersion-ataque", type=float, default=ATTACK_SD, help="Desviación típica de los ataques (escala log)")
+    parser.add_argument("--dispersion-defensa", type=float, default=DEFENSE_SD, help="Desviación típica de las defensas (escala log)")
+    parser.add_argument("--rho", type=float, default=RHO, help="Dependencia de marcadores bajos de Dixon-Coles (0 = Poisson independiente)")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", default="datos_sinteticos", help="Carpeta de salida")
+    parser.add_argument("--verificar", action="store_true", help="Ajusta los modelos y compara con los parámetros verdaderos")
+    args = parser.parse_args(argv)
+    
+    os.makedirs(args.salida, exist_ok=True)
+    truths = {}
+    for offset, nombre in enumerate(args.ligas):
+        calendar, truth = generate_league(
+            args.equipos, args.temporadas, args.ultima_temporada - args.temporadas + 1, args.semilla + 2 * offset,
+            args.jornadas_pendientes, prefix=f"{nombre} FC",
+            base_goals=args.goles_base, home_advantage=args.ventaja_local,
+            attack_sd=args.dispersion_ataque, defense_sd=args.dispersion_defensa, rho=args.rho,
+        )
+        path = os.path.join(args.salida, league_filename(nombre))
+        write_calendar(calendar, path)
+        write_columnar(calendar, path)
+        truths[nombre] = truth_table(truth)
+        print(f"{nombre}: {len(calendar)} partidos en {path}")
+        
+        if args.verificar:
+            for modelo, report in verify(calendar, truth).items():
+                print(f"  {modelo}: " + ", ".join(f"{key}={value:.3f}" for key, value in report.items() if value is not None))
+    
+    truth_path = os.path.join(args.salida, "parametros_verdaderos.json")
+    with open(truth_path, "w", encoding="utf-8") as f:
+        json.dump(truths, f, ensure_ascii=False, indent=2)
+    print(f"Parámetros verdaderos en {truth_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""El backtest walk-forward solo usa resultados con inicio estrictamente anterior a cada partido"""
+import os
+from datetime import time
+
+import polars as pl
+import pytest
+
+from calendar_store import league_frame, league_filename, load_calendar
+from poisson_model import PoissonPredictor
+
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIN_MATCHES = 3
+
+
+def calendar(nombre_liga):
+    return load_calendar(os.path.join(DATA_DIR, league_filename(nombre_liga)))
+
+
+def with_same_day_kickoffs(df):
+    """Mueve la 6.ª jornada a un único día: la mitad de los partidos a las 18:00 y el resto a las 21:00"""
+    jornada = df["Jornada"].unique(maintain_order=True)[5]
+    rows = df.with_row_index("_row")
+    first_rows = rows.filter(pl.col("Jornada") == jornada)["_row"]
+    late = first_rows[len(first_rows) // 2:]
+    day = rows.filter(pl.col("Jornada") == jornada)["Fecha"].min()
+    return rows.with_columns(
+        pl.when(pl.col("Jornada") == jornada).then(pl.lit(day)).otherwise(pl.col("Fecha")).alias("Fecha"),
+        pl.when(pl.col("_row").is_in(late.implode())).then(pl.lit(time(21, 0)))
+        .when(pl.col("Jornada") == jornada).then(pl.lit(time(18, 0)))
+        .otherwise(pl.col("Hora")).alias("Hora"),
+    ).drop("_row")
+
+
+def rebuilt_expected_goals(predictor, home, away, liga):
+    """Goles esperados del predictor completo (build_ratings_table) o None si algún equipo no tiene historia suficiente"""
+    home_rating = predictor._team_rating(home, liga)
+    away_rating = predictor._team_rating(away, liga)
+    if home_rating is None or away_rating is None:
+        return None
+    if home_rating["matches_played"] < MIN_MATCHES or away_rating["matches_played"] < MIN_MATCHES:
+        return None
+    return (
+        home_rating["home_attack_strength"] * away_rating["away_defense_strength"] * home_rating["league_avg"],
+        away_rating["away_attack_strength"] * home_rating["home_defense_strength"] * home_rating["league_avg"],
+    )
+
+
+def frames():
+    la_liga = with_same_day_kickoffs(calendar("La Liga"))
+    return {
+        "una liga": la_liga,
+        "multi-liga": league_frame({"La Liga": la_liga, "Serie A": with_same_day_kickoffs(calendar("Serie A"))}),
+    }
+
+
+@pytest.mark.parametrize("half_life", [None, 60])
+@pytest.mark.parametrize("frame_name", ["una liga", "multi-liga"])
+def test_walk_forward_matches_rebuild_on_earlier_kickoffs(frame_name, half_life):
+    df = frames()[frame_name]
+    predictor = PoissonPredictor(df, half_life=half_life)
+    played = predictor.played_matches.sort(["Fecha", "Hora"], nulls_last=True)
+    predicted_rows, home_expected_goals, away_expected_goals, _ = predictor.walk_forward_expected_goals(played, MIN_MATCHES)
+    walk_forward = dict(zip(predicted_rows, zip(home_expected_goals.tolist(), away_expected_goals.tolist())))
+
+    liga_column = pl.col("Liga") if "Liga" in played.columns else pl.lit(None)
+    rows = played.select("Fecha", "Hora", liga_column.alias("_liga"), "Local", "Visita").iter_rows()
+    same_kickoff_checked = 0
+    for idx, (fecha, hora, liga, home, away) in enumerate(rows):
+        earlier = played.filter((pl.col("Fecha") < fecha) | ((pl.col("Fecha") == fecha) & (pl.col("Hora") < hora)))
+        expected = rebuilt_expected_goals(PoissonPredictor(earlier, half_life=half_life), home, away, liga)
+        if expected is None:
+            assert idx not in walk_forward
+            continue
+        assert walk_forward[idx] == pytest.approx(expected, rel=1e-9)
+        if played.filter((pl.col("Fecha") == fecha) & (pl.col("Hora") == hora)).height > 1:
+            same_kickoff_checked += 1
+
+    assert len(walk_forward) > 0
+    assert same_kickoff_checked > 0
+
+
+def test_backtest_predicts_the_walk_forward_rows():
+    predictor = PoissonPredictor(with_same_day_kickoffs(calendar("La Liga")))
+    played = predictor.played_matches.sort(["Fecha", "Hora"], nulls_last=True)
+    predicted_rows, *_ = predictor.walk_forward_expected_goals(played)
+
+    backtest = predictor.backtest()
+    assert backtest.select("Fecha", "Hora", "Local", "Visita").equals(
+        played[predicted_rows].select("Fecha", "Hora", "Local", "Visita")
+    )
@@ -0,0 +1,75 @@
+"""Gradiente analítico de la verosimilitud de Dixon-Coles y reajuste con arranque en caliente"""
+import os
+
+import numpy as np
+import polars as pl
+import pytest
+from scipy.optimize import check_grad
+
+from calendar_store import league_filename, load_calendar
+from poisson_model import DixonColesPredictor
+
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def played(nombre_liga="La Liga"):
+    df = load_calendar(os.path.join(DATA_DIR, league_filename(nombre_liga)))
+    return df.filter(pl.col("GA").is_not_null()).sort(["Fecha", "Hora"])
+
+
+def likelihood_args(matches):
+    teams = sorted(set(matches["Local"].cast(pl.Utf8).to_list()) | set(matches["Visita"].cast(pl.Utf8).to_list()))
+    index = {team: idx for idx, team in enumerate(teams)}
+    return (
+        np.array([index[team] for team in matches["Local"].cast(pl.Utf8).to_list()]),
+        np.array([index[team] for team in matches["Visita"].cast(pl.Utf8).to_list()]),
+        matches["GA"].cast(pl.Float64).to_numpy(),
+        matches["GC"].cast(pl.Float64).to_numpy(),
+    ), len(teams)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+@pytest.mark.parametrize("weighted", [False, True])
+def test_gradient_matches_finite_differences(seed, weighted):
+    matches = played().head(100)
+    (home_idx, away_idx, home_goals, away_goals), n_teams = likelihood_args(matches)
+    # La muestra tiene los cuatro marcadores bajos que corrige tau
+    for home, away in [(0, 0), (0, 1), (1, 0), (1, 1)]:
+        assert ((home_goals == home) & (away_goals == away)).any()
+
+    rng = np.random.default_rng(seed)
+    weights = rng.uniform(0.2, 1.0, len(matches)) if weighted else np.ones(len(matches))
+    params = np.concatenate([rng.normal(0, 0.3, 2 * n_teams), [0.25, 0.1, rng.uniform(-0.2, 0.2)]])
+    args = (home_idx, away_idx, home_goals, away_goals, weights, n_teams)
+
+    def value(p):
+        return DixonColesPredictor.negative_log_likelihood(p, *args)[0]
+
+    def gradient(p):
+        return DixonColesPredictor.negative_log_likelihood(p, *args)[1]
+
+    error = check_grad(value, gradient, params)
+    assert error / np.linalg.norm(gradient(params)) < 1e-5
+
+
+@pytest.mark.parametrize("half_life", [None, 60])
+def test_warm_start_after_one_result_matches_cold_fit(half_life):
+    matches = played()
+    history, extended = matches.head(len(matches) - 1), matches
+    predictor = DixonColesPredictor(history, half_life=half_life)
+
+    warm = predictor.updated(extended)
+    cold = DixonColesPredictor(extended, half_life=half_life)
+
+    np.testing.assert_allclose(warm.fits[None]["params"], cold.fits[None]["params"], atol=2e-3)
+    assert warm.fits[None]["teams"] == cold.fits[None]["teams"]
+
+
+def test_fit_league_warm_start_matches_cold_fit():
+    matches = played("Serie A")
+    previous = DixonColesPredictor.fit_league(matches.head(len(matches) - 1))
+
+    warm = DixonColesPredictor.fit_league(matches, previous)
+    cold = DixonColesPredictor.fit_league(matches)
+
+    np.testing.assert_allclose(warm["params"], cold["params"], atol=2e-3)
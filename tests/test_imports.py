@@ -0,0 +1,16 @@
+"""Los modelos, la CLI y el servicio de pronósticos no cargan la pila de descarga de extract_calendar"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRAPING_MODULES = ["extract_calendar", "requests", "bs4", "lxml"]
+
+
+@pytest.mark.parametrize("module", ["calendar_store", "poisson_model", "pronosticos_cli", "prediction_service"])
+def test_module_does_not_import_scraping_stack(module):
+    code = f"import sys, {module}; print(','.join(m for m in {SCRAPING_MODULES!r} if m in sys.modules))"
+    loaded = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    assert loaded == ""
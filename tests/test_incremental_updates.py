@@ -0,0 +1,189 @@
+"""Actualización incremental de calendarios (diff_matches, apply_changes, merge_to_csv) y de ratings (PoissonPredictor.updated)"""
+import json
+import os
+
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+
+import poisson_model
+from calendar_store import (
+    CALENDAR_SCHEMA,
+    apply_changes,
+    diff_matches,
+    league_filename,
+    league_frame,
+    load_calendar,
+    read_calendar,
+)
+from extract_calendar import CalendarExtractor
+from poisson_model import PoissonPredictor
+
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def calendar(nombre_liga="La Liga"):
+    return read_calendar(os.path.join(DATA_DIR, league_filename(nombre_liga)))
+
+
+def match(jornada, fecha, hora, local, visita, ga=None, gc=None):
+    return {"Jornada": jornada, "Fecha": fecha, "Hora": hora, "Local": local, "Visita": visita, "GA": ga, "GC": gc}
+
+
+def frame(*rows):
+    return pl.DataFrame(list(rows), schema=CALENDAR_SCHEMA)
+
+
+EXISTING = frame(
+    match("1. Jornada", "2025-08-15", "17:00", "Girona FC", "Rayo Vallecano", 1, 3),
+    match("2. Jornada", "2025-08-22", "19:30", "Real Madrid", "Real Oviedo"),
+    match("2. Jornada", "2025-08-23", "21:00", "Sevilla FC", "Getafe CF"),
+)
+
+
+def test_diff_matches_classifies_each_change():
+    fresh = frame(
+        match("1. Jornada", "2025-08-15", "17:00", "Girona FC", "Rayo Vallecano", 1, 3),
+        match("2. Jornada", "2025-08-22", "19:30", "Real Madrid", "Real Oviedo", 2, 0),
+        match("2. Jornada", "2025-08-24", "18:00", "Sevilla FC", "Getafe CF"),
+        match("3. Jornada", "2025-08-30", "21:00", "Getafe CF", "Real Madrid"),
+    )
+    changes = diff_matches(EXISTING, fresh)
+
+    assert changes.columns == [*CALENDAR_SCHEMA, "change"]
+    assert {(row["Local"], row["change"]) for row in changes.iter_rows(named=True)} == {
+        ("Real Madrid", "result"),
+        ("Sevilla FC", "update"),
+        ("Getafe CF", "insert"),
+    }
+    assert diff_matches(EXISTING, EXISTING).is_empty()
+
+
+def test_diff_matches_score_correction_is_an_update():
+    fresh = EXISTING.with_columns(pl.when(pl.col("Local") == "Girona FC").then(2).otherwise(pl.col("GA")).alias("GA"))
+    changes = diff_matches(EXISTING, fresh)
+
+    assert changes.select("Local", "GA", "GC", "change").rows() == [("Girona FC", 2, 3, "update")]
+
+
+def test_apply_changes_keeps_order_and_appends_inserts():
+    fresh = frame(
+        match("3. Jornada", "2025-08-30", "21:00", "Getafe CF", "Real Madrid"),
+        match("2. Jornada", "2025-08-22", "19:30", "Real Madrid", "Real Oviedo", 2, 0),
+    )
+    merged = apply_changes(EXISTING, diff_matches(EXISTING, fresh))
+
+    assert merged.select("Local", "GA").rows() == [
+        ("Girona FC", 1), ("Real Madrid", 2), ("Sevilla FC", None), ("Getafe CF", None),
+    ]
+
+
+def test_merge_to_csv_writes_merged_calendar_and_change_log(tmp_path):
+    output = os.path.join(tmp_path, "calendario.csv")
+    EXISTING.write_csv(output)
+    fresh = frame(
+        match("1. Jornada", "2025-08-15", "17:00", "Girona FC", "Rayo Vallecano", 1, 3),
+        match("2. Jornada", "2025-08-22", "19:30", "Real Madrid", "Real Oviedo", 2, 0),
+        match("2. Jornada", "2025-08-23", "21:00", "Sevilla FC", "Getafe CF"),
+        match("3. Jornada", "2025-08-30", "21:00", "Getafe CF", "Real Madrid"),
+    )
+    extractor = CalendarExtractor("file://prueba")
+    extractor.data = fresh.to_dicts()
+
+    changes = extractor.merge_to_csv(output)
+
+    assert len(changes) == 2
+    assert_frame_equal(read_calendar(output), fresh)
+    with open(os.path.join(tmp_path, "calendario.changes.jsonl"), encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f]
+    assert [{key: value for key, value in entry.items() if key != "timestamp"} for entry in entries] == [
+        {**match("2. Jornada", "2025-08-22", "19:30", "Real Madrid", "Real Oviedo", 2, 0), "change": "result"},
+        {**match("3. Jornada", "2025-08-30", "21:00", "Getafe CF", "Real Madrid"), "change": "insert"},
+    ]
+    assert len({entry["timestamp"] for entry in entries}) == 1
+
+    # Sin cambios no se reescribe el CSV ni se añade nada al registro
+    mtime = os.stat(output).st_mtime_ns
+    assert extractor.merge_to_csv(output).is_empty()
+    assert os.stat(output).st_mtime_ns == mtime
+    with open(os.path.join(tmp_path, "calendario.changes.jsonl"), encoding="utf-8") as f:
+        assert len(f.readlines()) == 2
+
+
+def earlier_state(df, pending=8, upcoming_dropped=5):
+    """El calendario tal como se veía antes: sin los últimos `pending` resultados ni los últimos partidos por jugar"""
+    played = df.filter(pl.col("GA").is_not_null())
+    last_played = played.sort(["Fecha", "Hora"]).tail(pending).select("Jornada", "Local", "Visita")
+    before = df.join(last_played.with_columns(pl.lit(True).alias("_pending")), on=["Jornada", "Local", "Visita"], how="left")
+    before = before.with_columns(
+        pl.when(pl.col("_pending")).then(None).otherwise(pl.col("GA")).alias("GA"),
+        pl.when(pl.col("_pending")).then(None).otherwise(pl.col("GC")).alias("GC"),
+    ).drop("_pending")
+    return before.head(len(before) - upcoming_dropped)
+
+
+@pytest.fixture
+def init_spy(monkeypatch):
+    """Registra si cada PoissonPredictor se construyó con acumulados dados (incremental) o desde cero"""
+    calls = []
+    original = PoissonPredictor.__init__
+
+    def spy(self, df, team_sums=None, **kwargs):
+        calls.append(team_sums is not None)
+        original(self, df, team_sums=team_sums, **kwargs)
+
+    monkeypatch.setattr(poisson_model.PoissonPredictor, "__init__", spy)
+    return calls
+
+
+def assert_same_ratings(actual, expected):
+    assert_frame_equal(actual.ratings, expected.ratings, check_exact=False, rel_tol=1e-9, check_column_order=False)
+
+
+@pytest.mark.parametrize("half_life", [None, 60])
+def test_updated_equals_full_rebuild(half_life, init_spy):
+    df = load_calendar(os.path.join(DATA_DIR, league_filename("La Liga")))
+    previous = PoissonPredictor(earlier_state(df), half_life=half_life)
+    init_spy.clear()
+
+    updated = previous.updated(df)
+
+    assert init_spy == [True]
+    assert_same_ratings(updated, PoissonPredictor(df, half_life=half_life))
+    assert updated.league_avg == pytest.approx(PoissonPredictor(df, half_life=half_life).league_avg, rel=1e-12)
+
+
+def test_updated_without_changes_reuses_team_sums(init_spy):
+    df = load_calendar(os.path.join(DATA_DIR, league_filename("La Liga")))
+    previous = PoissonPredictor(df)
+    init_spy.clear()
+
+    updated = previous.updated(df)
+
+    assert init_spy == [True]
+    assert updated.team_sums is previous.team_sums
+    assert_same_ratings(updated, PoissonPredictor(df))
+
+
+def test_updated_rebuilds_when_matches_disappear(init_spy):
+    df = load_calendar(os.path.join(DATA_DIR, league_filename("La Liga")))
+    previous = PoissonPredictor(df)
+    shrunk = df.filter(pl.col("GA").is_not_null()).head(100)
+    init_spy.clear()
+
+    updated = previous.updated(shrunk)
+
+    assert init_spy == [False]
+    assert_same_ratings(updated, PoissonPredictor(shrunk))
+
+
+def test_updated_rebuilds_multi_league_frames(init_spy):
+    calendars = {nombre: load_calendar(os.path.join(DATA_DIR, league_filename(nombre))) for nombre in ("La Liga", "Serie A")}
+    previous = PoissonPredictor(league_frame({nombre: earlier_state(df) for nombre, df in calendars.items()}))
+    df = league_frame(calendars)
+    init_spy.clear()
+
+    updated = previous.updated(df)
+
+    assert init_spy == [False]
+    assert_same_ratings(updated, PoissonPredictor(df))
@@ -0,0 +1,77 @@
+"""Las consultas por equipo de StatisticsCalculator usan el nombre exacto (sin subcadenas ni expresiones regulares)"""
+import polars as pl
+import pytest
+
+from extract_calendar import CALENDAR_SCHEMA, StatisticsCalculator
+
+# "Real" es subcadena de "Real Madrid" y "St. Pauli (II)" tiene metacaracteres de regex que además casan con "St Pauli"
+MATCHES = [
+    ("1. Jornada", "Real", "Real Madrid", 1, 1),
+    ("1. Jornada", "St. Pauli (II)", "Betis", 2, 0),
+    ("2. Jornada", "Real Madrid", "St. Pauli (II)", 3, 1),
+    ("2. Jornada", "Betis", "Real", 0, 2),
+    ("3. Jornada", "St Pauli", "Real Madrid", 0, 0),
+    ("3. Jornada", "Real", "St. Pauli (II)", 1, 0),
+    ("4. Jornada", "Real Madrid", "Real", None, None),
+    ("4. Jornada", "Betis", "St. Pauli (II)", None, None),
+    ("5. Jornada", "Real", "Betis", None, None),
+    ("5. Jornada", "St Pauli", "Real Madrid", None, None),
+]
+
+
+def calendar(team_dtype):
+    df = pl.DataFrame(
+        [
+            {"Jornada": jornada, "Fecha": "2025-08-15", "Hora": "17:00", "Local": home, "Visita": away, "GA": ga, "GC": gc}
+            for jornada, home, away, ga, gc in MATCHES
+        ],
+        schema=CALENDAR_SCHEMA,
+    )
+    return df.with_columns(pl.col("Local", "Visita").cast(team_dtype))
+
+
+def exact(df, team):
+    return df.filter((pl.col("Local").cast(pl.Utf8) == team) | (pl.col("Visita").cast(pl.Utf8) == team))
+
+
+@pytest.fixture(params=[pl.Utf8, pl.Categorical], ids=["utf8", "categorical"])
+def stats(request):
+    return StatisticsCalculator(calendar(request.param))
+
+
+@pytest.mark.parametrize("team", ["Real", "Real Madrid", "St. Pauli (II)", "St Pauli"])
+def test_team_matches_use_exact_names(stats, team):
+    assert stats.get_team_matches(team).equals(exact(stats.played, team))
+    assert stats.get_team_upcoming_matches(team).equals(exact(stats.upcoming, team))
+    assert stats.get_team_home_matches(team).equals(stats.played.filter(pl.col("Local").cast(pl.Utf8) == team))
+    assert stats.get_team_away_matches(team).equals(stats.played.filter(pl.col("Visita").cast(pl.Utf8) == team))
+
+
+def test_unknown_or_pattern_names_match_nothing(stats):
+    for pattern in ["Rea", "Real.*", "St. Pauli", "(II)", ""]:
+        assert stats.get_team_matches(pattern).is_empty()
+        assert stats.get_team_upcoming_matches(pattern).is_empty()
+
+
+def test_head_to_head_upcoming_uses_exact_names(stats):
+    head_to_head = stats.get_head_to_head_upcoming("Real", "Real Madrid")
+    assert head_to_head.select(pl.col("Local", "Visita").cast(pl.Utf8)).rows() == [("Real Madrid", "Real")]
+    assert stats.get_head_to_head_upcoming("Real Madrid", "Real").equals(head_to_head)
+
+    head_to_head = stats.get_head_to_head_upcoming("Betis", "St. Pauli (II)")
+    assert head_to_head.select(pl.col("Local", "Visita").cast(pl.Utf8)).rows() == [("Betis", "St. Pauli (II)")]
+    assert stats.get_head_to_head_upcoming("St Pauli", "Betis").is_empty()
+
+
+def test_team_summary_has_one_exact_row_per_team(stats):
+    summary = stats.team_summary()
+    assert summary["team"].to_list() == sorted(["Real", "Real Madrid", "St. Pauli (II)", "St Pauli", "Betis"])
+
+    for team in summary["team"].to_list():
+        row = summary.filter(pl.col("team") == team).row(0, named=True)
+        played = exact(stats.played, team)
+        assert row["matches"] == len(played)
+        assert row["home_matches"] == stats.played.filter(pl.col("Local").cast(pl.Utf8) == team).height
+        assert row["matches"] == stats.team_count_matches(team)
+        assert row["average_goals"] == pytest.approx(stats.team_average_goals(team))
+        assert row["btts"] == pytest.approx(stats.team_percentage_btts(team))
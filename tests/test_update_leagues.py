@@ -0,0 +1,110 @@
+"""Descarga concurrente de update_leagues contra un servidor HTTP local que sirve las páginas de benchmarks/fixtures"""
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import polars as pl
+import pytest
+
+from extract_calendar import LIGAS, league_filename, read_calendar, update_leagues
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "fixtures")
+# Tiempo que el servidor retiene cada respuesta para que las descargas se solapen
+RESPONSE_DELAY = 0.2
+
+
+def fixture_path(nombre_liga):
+    return os.path.join(FIXTURES_DIR, f"{os.path.splitext(league_filename(nombre_liga))[0]}.html")
+
+
+class StandIn(ThreadingHTTPServer):
+    """Servidor de las páginas de prueba que cuenta las peticiones simultáneas"""
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FixtureHandler)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.paths = []
+
+    def url(self, name):
+        return f"http://127.0.0.1:{self.server_address[1]}/{name}"
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.active += 1
+            server.peak = max(server.peak, server.active)
+            server.paths.append(self.path)
+        try:
+            time.sleep(RESPONSE_DELAY)
+            path = os.path.join(FIXTURES_DIR, os.path.basename(self.path))
+            if not os.path.exists(path):
+                self.send_error(404)
+                return
+            with open(path, "rb") as f:
+                body = f.read()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in():
+    server = StandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_update_leagues_writes_every_league(stand_in, tmp_path):
+    ligas = {nombre: stand_in.url(os.path.basename(fixture_path(nombre))) for nombre in LIGAS}
+    results = {r["liga"]: r for r in update_leagues(ligas, max_workers=3, output_dir=str(tmp_path), cache_dir=None)}
+
+    assert set(results) == set(LIGAS)
+    for nombre, result in results.items():
+        assert result["status"] == "updated", result["error"]
+        with open(fixture_path(nombre), encoding="utf-8") as f:
+            expected = f.read().count('<div class="match"')
+        calendar = read_calendar(os.path.join(tmp_path, league_filename(nombre)))
+        assert len(calendar) == expected
+        assert calendar.filter(pl.col("GA").is_null()).height > 0
+        assert calendar.filter(pl.col("GA").is_not_null()).height > 0
+
+
+def test_failing_url_does_not_abort_the_others(stand_in, tmp_path):
+    ligas = {nombre: stand_in.url(os.path.basename(fixture_path(nombre))) for nombre in LIGAS}
+    ligas["Serie A"] = stand_in.url("no-existe.html")
+    results = {r["liga"]: r for r in update_leagues(ligas, max_workers=2, output_dir=str(tmp_path), cache_dir=None)}
+
+    assert results["Serie A"]["status"] == "error"
+    assert results["Serie A"]["error"] == "HTTP 404"
+    assert not os.path.exists(os.path.join(tmp_path, league_filename("Serie A")))
+    for nombre in LIGAS:
+        if nombre != "Serie A":
+            assert results[nombre]["status"] == "updated"
+            assert os.path.exists(os.path.join(tmp_path, league_filename(nombre)))
+
+
+@pytest.mark.parametrize("max_workers", [1, 2, 4])
+def test_max_workers_bounds_concurrent_requests(stand_in, tmp_path, max_workers):
+    ligas = {nombre: stand_in.url(os.path.basename(fixture_path(nombre))) for nombre in LIGAS}
+    results = list(update_leagues(ligas, max_workers=max_workers, output_dir=str(tmp_path), cache_dir=None))
+
+    assert len(results) == len(LIGAS)
+    assert len(stand_in.paths) == len(LIGAS)
+    assert stand_in.peak == max_workers